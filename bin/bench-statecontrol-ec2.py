@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+EC2 Instance State Control Benchmarks
+Measures the hot paths of statecontrol-ec2.py against a synthetic fleet,
+offline: a local stand-in answers the EC2 API at the HTTP layer
+"""
+
+import os
+import sys
+import time
+import random
+import fnmatch
+import tempfile
+import tracemalloc
+import threading
+import argparse
+import json
+import statistics
+import importlib.util
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Tuple, Callable
+from xml.sax.saxutils import escape
+
+if sys.version_info < (3, 7):
+    print(f"Error: Python {sys.version_info[0]}.{sys.version_info[1]} is too old, "
+          f"please install Python 3.7 or later", file=sys.stderr)
+    sys.exit(1)
+
+# Script under test, next to this one
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statecontrol-ec2.py')
+
+# Regions the synthetic fleet is spread over (the first --regions of them)
+REGIONS = [
+    'us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'ca-central-1', 'ca-west-1',
+    'eu-west-1', 'eu-west-2', 'eu-west-3', 'eu-central-1', 'eu-central-2', 'eu-north-1',
+    'eu-south-1', 'eu-south-2', 'ap-south-1', 'ap-south-2', 'ap-northeast-1', 'ap-northeast-2',
+    'ap-northeast-3', 'ap-southeast-1', 'ap-southeast-2', 'ap-southeast-3', 'ap-southeast-4', 'ap-east-1',
+    'sa-east-1', 'me-south-1', 'me-central-1', 'af-south-1', 'il-central-1', 'mx-central-1'
+]
+
+# Region name prefixes that get --far-latency instead of --latency
+FAR_AREAS = ('ap', 'sa', 'me', 'af', 'il', 'mx')
+
+# Fleet sizes benchmarked by default
+FLEET_SIZES = [1000, 10000, 50000]
+
+# Benchmarks run by default (see BENCHMARKS)
+DEFAULT_BENCHMARKS = ['clients', 'find-id', 'find-name', 'find-ip', 'list', 'list-filtered', 'resolve', 'health',
+                      'format']
+
+# Relative slowdown tolerated by --compare before a result counts as a regression
+TOLERANCE = 0.2
+
+# API version namespace of EC2 query protocol responses
+EC2_XMLNS = 'http://ec2.amazonaws.com/doc/2016-11-15/'
+
+# Module under test, loaded by load_statecontrol()
+sc = None
+
+
+def load_statecontrol():
+    """
+    Import statecontrol-ec2.py as a module, isolated from the user's AWS and cache configuration
+    
+    Caches go to a temporary directory, and sessions use dummy static
+    credentials so botocore never reads ~/.aws or the instance metadata.
+    """
+    global sc
+    cache_home = tempfile.mkdtemp(prefix='bench-statecontrol-ec2-')
+    os.environ.update({
+        'XDG_CACHE_HOME': cache_home,
+        'XDG_CONFIG_HOME': cache_home,
+        'AWS_CONFIG_FILE': os.devnull,
+        'AWS_SHARED_CREDENTIALS_FILE': os.devnull,
+        'AWS_ACCESS_KEY_ID': 'AKIABENCHMARK',
+        'AWS_SECRET_ACCESS_KEY': 'benchmark',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_EC2_METADATA_DISABLED': 'true'
+    })
+    os.environ.pop('AWS_PROFILE', None)
+    os.environ.pop('AWS_SESSION_TOKEN', None)
+    
+    spec = importlib.util.spec_from_file_location('statecontrol_ec2', SCRIPT_PATH)
+    sc = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sc)
+    sc.load_boto3()
+
+
+def to_xml(shape, value) -> str:
+    """Serialize a value as EC2 query protocol XML, following its botocore shape"""
+    type_name = shape.type_name
+    if type_name == 'structure':
+        parts = []
+        for name, member in shape.members.items():
+            if value.get(name) is not None:
+                tag = member.serialization.get('name', name)
+                parts.append(f"<{tag}>{to_xml(member, value[name])}</{tag}>")
+        return ''.join(parts)
+    if type_name == 'list':
+        tag = shape.member.serialization.get('name', 'member')
+        return ''.join(f"<{tag}>{to_xml(shape.member, item)}</{tag}>" for item in value)
+    if type_name == 'boolean':
+        return 'true' if value else 'false'
+    if type_name == 'timestamp':
+        return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    return escape(str(value))
+
+
+class RawBody:
+    """Minimal urllib3 response stand-in for botocore's AWSResponse"""
+    
+    def __init__(self, body: bytes):
+        self.body = body
+    
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class SyntheticFleet:
+    """
+    Instances spread over regions, and an EC2 stand-in serving them
+    
+    Regions get a skewed share of the fleet (the first regions hold most
+    instances, like real accounts). The stand-in answers every HTTP attempt
+    from botocore's before-send event with real EC2 XML, so serialization,
+    signing, response parsing, retries and the client-side rate limiter
+    all run as they would against AWS; only the network is replaced by a
+    sleep. DescribeInstances reservations are rendered to XML once, up front.
+    """
+    
+    def __init__(self, size: int, regions: List[str], latency: float = 0.03, far_latency: float = 0.12,
+                 throttle: float = 0.0, seed: int = 1):
+        """
+        Build fleet
+        
+        Args:
+            size: Number of instances
+            regions: Regions to spread them over
+            latency: Seconds per API call in near regions
+            far_latency: Seconds per API call in far regions (FAR_AREAS)
+            throttle: Probability that an API attempt is answered with RequestLimitExceeded
+            seed: Random seed for the fleet layout and throttling
+        """
+        self.regions = regions
+        self.latency = {region: far_latency if region.split('-')[0] in FAR_AREAS else latency for region in regions}
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        
+        model = sc.boto3.Session().client('ec2', region_name='us-east-1').meta.service_model
+        self.model = model
+        reservation_shape = model.operation_model('DescribeInstances').output_shape \
+            .members['Reservations'].member
+        
+        weights = [1 / (rank + 1) for rank in range(len(regions))]
+        launched = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.instances = {region: [] for region in regions}
+        for number in range(size):
+            region = self.random.choices(regions, weights)[0]
+            state = 'running' if number % 4 else 'stopped'
+            instance = {
+                'InstanceId': f"i-{number:017x}",
+                'ImageId': 'ami-0123456789abcdef0',
+                'State': {'Code': 16 if state == 'running' else 80, 'Name': state},
+                'PrivateDnsName': f"ip-10-{number >> 16 & 255}-{number >> 8 & 255}-{number & 255}.ec2.internal",
+                'PublicDnsName': '',
+                'KeyName': 'bench',
+                'AmiLaunchIndex': 0,
+                'InstanceType': ('t3.micro', 't3.large', 'c6i.xlarge', 'm6g.large')[number % 4],
+                'LaunchTime': launched,
+                'Placement': {'AvailabilityZone': f"{region}{'abc'[number % 3]}", 'Tenancy': 'default'},
+                'Monitoring': {'State': 'disabled'},
+                'SubnetId': f"subnet-{number % 16:08x}",
+                'VpcId': f"vpc-{number % 4:08x}",
+                'PrivateIpAddress': f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}",
+                'PublicIpAddress': f"198.51.{number >> 8 & 255}.{number & 255}" if number % 3 == 0 else None,
+                'Architecture': 'arm64' if number % 4 == 3 else 'x86_64',
+                'RootDeviceType': 'ebs',
+                'RootDeviceName': '/dev/xvda',
+                'BlockDeviceMappings': [{'DeviceName': '/dev/xvda',
+                                         'Ebs': {'VolumeId': f"vol-{number:017x}", 'Status': 'attached',
+                                                 'AttachTime': launched, 'DeleteOnTermination': True}}],
+                'SecurityGroups': [{'GroupId': f"sg-{number % 8:08x}", 'GroupName': 'default'}],
+                'Tags': [{'Key': 'Name', 'Value': f"bench-{number:06d}"},
+                         {'Key': 'env', 'Value': ('prod', 'staging', 'dev')[number % 3]}]
+            }
+            xml = to_xml(reservation_shape, {'ReservationId': f"r-{number:017x}", 'OwnerId': '123456789012',
+                                             'Instances': [instance]})
+            self.instances[region].append((instance, f"<item>{xml}</item>"))
+    
+    @property
+    def size(self) -> int:
+        """Number of instances"""
+        return sum(len(instances) for instances in self.instances.values())
+    
+    def sample(self, fraction: float) -> Dict:
+        """The instance at a position of the fleet, counted across regions in order"""
+        instances = [instance for region in self.regions for instance, _ in self.instances[region]]
+        return instances[min(len(instances) - 1, int(len(instances) * fraction))]
+    
+    def install(self, session):
+        """Answer every EC2 call of a boto3 session's clients from the fleet"""
+        session.events.register('before-parameter-build.ec2', self.remember_params)
+        session.events.register('before-send.ec2', self.send)
+    
+    @staticmethod
+    def remember_params(params, context, **kwargs):
+        """Keep the API parameters for send(), which only sees the encoded request"""
+        context['bench_params'] = params
+    
+    def send(self, request, event_name: str, **kwargs):
+        """Answer one HTTP attempt"""
+        operation = event_name.rsplit('.', 1)[-1]
+        region = request.context['client_region']
+        params = request.context.get('bench_params', {})
+        time.sleep(self.latency.get(region, 0))
+        with self.lock:
+            self.calls += 1
+            throttled = self.throttle and self.random.random() < self.throttle
+            self.throttled += bool(throttled)
+        
+        if throttled:
+            return self.error(request, 503, 'RequestLimitExceeded', 'Request limit exceeded.')
+        if params.get('DryRun'):
+            return self.error(request, 412, 'DryRunOperation', 'Request would have succeeded.')
+        
+        handler = getattr(self, f"op_{operation}", None)
+        if handler is None:
+            return self.error(request, 400, 'InvalidAction', f"{operation} is not simulated")
+        body = handler(region, params)
+        return xml_response(request, 200,
+                           f'<{operation}Response xmlns="{EC2_XMLNS}"><requestId>bench</requestId>'
+                           f'{body}</{operation}Response>')
+    
+    @staticmethod
+    def error(request, status: int, code: str, message: str):
+        """EC2 error response"""
+        return xml_response(request, status,
+                           f"<Response><Errors><Error><Code>{code}</Code><Message>{message}</Message></Error>"
+                           f"</Errors><RequestID>bench</RequestID></Response>")
+    
+    @staticmethod
+    def matches(instance: Dict, filters: List[Dict]) -> bool:
+        """Apply DescribeInstances filters (ANDed across filters, ORed within one)"""
+        for selector in filters:
+            name = selector['Name']
+            if name == 'instance-id':
+                values = [instance['InstanceId']]
+            elif name == 'instance-state-name':
+                values = [instance['State']['Name']]
+            elif name == 'instance-type':
+                values = [instance['InstanceType']]
+            elif name == 'availability-zone':
+                values = [instance['Placement']['AvailabilityZone']]
+            elif name == 'vpc-id':
+                values = [instance['VpcId']]
+            elif name == 'subnet-id':
+                values = [instance['SubnetId']]
+            elif name == 'private-ip-address':
+                values = [instance['PrivateIpAddress']]
+            elif name == 'ip-address':
+                values = [instance['PublicIpAddress']] if instance['PublicIpAddress'] else []
+            elif name == 'private-dns-name':
+                values = [instance['PrivateDnsName']]
+            elif name.startswith('tag:'):
+                values = [tag['Value'] for tag in instance['Tags'] if tag['Key'] == name[4:]]
+            else:
+                return False
+            if not any(fnmatch.fnmatchcase(value, pattern) for value in values for pattern in selector['Values']):
+                return False
+        return True
+    
+    @staticmethod
+    def page(items: List, params: Dict) -> Tuple[List, str]:
+        """Apply MaxResults/NextToken pagination; returns the page and the nextToken element"""
+        start = int(params.get('NextToken') or 0)
+        size = params.get('MaxResults') or 1000
+        token = f"<nextToken>{start + size}</nextToken>" if start + size < len(items) else ''
+        return items[start:start + size], token
+    
+    def op_DescribeInstances(self, region: str, params: Dict) -> str:
+        """Rendered reservations of the matching instances"""
+        ids = set(params.get('InstanceIds') or ())
+        filters = params.get('Filters', [])
+        selected = [xml for instance, xml in self.instances.get(region, ())
+                    if (not ids or instance['InstanceId'] in ids) and self.matches(instance, filters)]
+        items, token = self.page(selected, params)
+        return f"<reservationSet>{''.join(items)}</reservationSet>{token}"
+    
+    def op_DescribeInstanceStatus(self, region: str, params: Dict) -> str:
+        """Status checks: every 50th running instance is impaired"""
+        ids = set(params.get('InstanceIds') or ())
+        wanted = {selector['Name']: selector['Values'] for selector in params.get('Filters', [])}
+        statuses = []
+        for instance, _ in self.instances.get(region, ()):
+            if ids and instance['InstanceId'] not in ids:
+                continue
+            running = instance['State']['Name'] == 'running'
+            if not running and not params.get('IncludeAllInstances'):
+                continue
+            impaired = running and int(instance['InstanceId'][2:], 16) % 50 == 7
+            checks = {
+                'instance-status.status': 'impaired' if impaired else 'ok' if running else 'not-applicable',
+                'system-status.status': 'ok' if running else 'not-applicable'
+            }
+            if any(checks.get(name) not in values for name, values in wanted.items()):
+                continue
+            statuses.append(
+                f"<item><instanceId>{instance['InstanceId']}</instanceId>"
+                f"<availabilityZone>{instance['Placement']['AvailabilityZone']}</availabilityZone>"
+                f"<instanceState><code>{instance['State']['Code']}</code><name>{instance['State']['Name']}</name>"
+                f"</instanceState><instanceStatus><status>{checks['instance-status.status']}</status>"
+                f"</instanceStatus><systemStatus><status>{checks['system-status.status']}</status>"
+                f"</systemStatus></item>"
+            )
+        items, token = self.page(statuses, params)
+        return f"<instanceStatusSet>{''.join(items)}</instanceStatusSet>{token}"
+
+
+def xml_response(request, status: int, body: str):
+    """Wrap an XML body in the response object botocore expects from its HTTP layer"""
+    from botocore.awsrequest import AWSResponse
+    return AWSResponse(request.url, status, {'Content-Type': 'text/xml'}, RawBody(body.encode()))
+
+
+def make_controller(fleet: SyntheticFleet, args: argparse.Namespace) -> 'sc.EC2Controller':
+    """Create a controller whose sessions talk to the fleet, with caches and the daemon out of the way"""
+    class BenchController(sc.EC2Controller):
+        # DescribeInstances page size used by the listing benchmarks
+        page_size = args.page_size
+        
+        def _create_session(self, profile: Optional[str] = None):
+            session = super()._create_session(profile)
+            fleet.install(session)
+            return session
+    
+    return BenchController(use_cache=False, regions=fleet.regions, skip_cold_regions=False,
+                           concurrency=args.concurrency, region_concurrency=args.region_concurrency,
+                           rate_limit=args.rate_limit, retry_budget=args.retry_budget,
+                           message_file=open(os.devnull, 'w'))
+
+
+def warm_clients(controller) -> None:
+    """Create every region client ahead of a benchmark that should not pay for it"""
+    for region in controller.regions:
+        controller._client(region)
+
+
+# Benchmarks: name -> (setup(controller, fleet) -> state, run(controller, fleet, state))
+BENCHMARKS: Dict[str, Tuple[Callable, Callable]] = {
+    'clients': (lambda controller, fleet: None, lambda controller, fleet, state: warm_clients(controller)),
+    'find-id': (lambda controller, fleet: warm_clients(controller) or fleet.sample(0.9)['InstanceId'],
+                lambda controller, fleet, identifier: controller.find_instances(identifier)),
+    'find-name': (lambda controller, fleet: warm_clients(controller) or fleet.sample(0.9)['Tags'][0]['Value'],
+                  lambda controller, fleet, identifier: controller.find_instances(identifier)),
+    'find-ip': (lambda controller, fleet: warm_clients(controller) or fleet.sample(0.9)['PrivateIpAddress'],
+                lambda controller, fleet, identifier: controller.find_instances(identifier)),
+    'list': (lambda controller, fleet: warm_clients(controller),
+             lambda controller, fleet, state: controller.list_instances(page_size=controller.page_size)),
+    'list-filtered': (lambda controller, fleet: warm_clients(controller),
+                      lambda controller, fleet, state: controller.list_instances(
+                          state_filter='running', page_size=controller.page_size,
+                          filters=sc.instance_filters(names=['bench-00*']))),
+    'resolve': (lambda controller, fleet: warm_clients(controller),
+                lambda controller, fleet, state: controller.resolve_instances(['bench-000*'], tags=[('env', 'prod')])),
+    'health': (lambda controller, fleet: warm_clients(controller),
+               lambda controller, fleet, state: list(controller.iter_instances(page_size=controller.page_size,
+                                                                               health=True))),
+    # The sorted table written by the list command, as the CLI writes it
+    'format': (lambda controller, fleet: sorted(controller.list_instances(page_size=controller.page_size),
+                                                key=lambda x: (x.account, x.region, x.instance_id)),
+               lambda controller, fleet, records: sc.write_records(records, sc.list_fields(None)))
+}
+
+
+def run_benchmark(name: str, fleet: SyntheticFleet, args: argparse.Namespace) -> Dict:
+    """
+    Time one benchmark against one fleet
+    
+    Every repetition gets a fresh controller. Wall times come from the
+    untraced runs and call counts from the last of them; peak memory from
+    one more run under tracemalloc (which slows Python down, so it is not
+    timed).
+    
+    Returns:
+        Result dict for the results file
+    """
+    setup, run = BENCHMARKS[name]
+    walls = []
+    calls = retries = throttled = 0
+    
+    for repetition in range(args.repeat + (0 if args.no_memory else 1)):
+        traced = repetition == args.repeat
+        controller = make_controller(fleet, args)
+        state = setup(controller, fleet)
+        counted = []
+        controller.add_metrics_hook(counted.append)
+        fleet_calls, fleet_throttled = fleet.calls, fleet.throttled
+        
+        if traced:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with redirect_stdout(controller.message_file):
+            run(controller, fleet, state)
+        wall = time.perf_counter() - started
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            continue
+        
+        walls.append(wall)
+        calls = len(counted)
+        retries = sum(call['retries'] for call in counted)
+        throttled = fleet.throttled - fleet_throttled
+        attempts = fleet.calls - fleet_calls
+    
+    return {
+        'benchmark': name,
+        'fleet': fleet.size,
+        'regions': len(fleet.regions),
+        'runs': args.repeat,
+        'wall_seconds': round(statistics.median(walls), 4),
+        'wall_seconds_min': round(min(walls), 4),
+        'api_calls': calls,
+        'http_attempts': attempts,
+        'retries': retries,
+        'throttled': throttled,
+        'peak_mib': None if args.no_memory else round(peak / 2 ** 20, 2)
+    }
+
+
+def compare_results(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Find regressions against an earlier results file
+    
+    A result regresses when its median wall time grew by more than
+    tolerance, or it made more API calls, than the same benchmark on the
+    same fleet size and region count in the baseline.
+    
+    Returns:
+        Descriptions of the regressions
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['fleet'], r['regions']): r for r in json.load(f)['results']}
+    
+    regressions = []
+    for result in results:
+        before = baseline.get((result['benchmark'], result['fleet'], result['regions']))
+        if not before:
+            continue
+        label = f"{result['benchmark']} ({result['fleet']} instances, {result['regions']} regions)"
+        if result['wall_seconds'] > before['wall_seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: {before['wall_seconds']:.3f}s -> {result['wall_seconds']:.3f}s")
+        if result['api_calls'] > before['api_calls']:
+            regressions.append(f"{label}: {before['api_calls']} -> {result['api_calls']} API calls")
+    return regressions
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark statecontrol-ec2.py offline against synthetic EC2 fleets',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s
+  %(prog)s --fleet 10000 --benchmark list,find-name --repeat 5
+  %(prog)s --latency 0.05 --far-latency 0.25 --throttle 0.05 -o results.json
+  %(prog)s -o new.json --compare baseline.json
+        """
+    )
+    comma_list = lambda value: [item for item in value.split(',') if item]
+    parser.add_argument('--fleet', type=lambda value: [int(size) for size in comma_list(value)],
+                        default=FLEET_SIZES, metavar='N[,N...]',
+                        help=f'Fleet sizes to benchmark (default: {",".join(map(str, FLEET_SIZES))})')
+    parser.add_argument('--regions', type=int, default=25, metavar='N',
+                        help=f'Regions to spread each fleet over, up to {len(REGIONS)} (default: 25)')
+    parser.add_argument('-b', '--benchmark', type=comma_list, default=DEFAULT_BENCHMARKS, metavar='NAME[,NAME...]',
+                        help=f'Benchmarks to run: {", ".join(BENCHMARKS)} (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N',
+                        help='Timed runs per benchmark; the median is reported (default: 3)')
+    parser.add_argument('--latency', type=float, default=0.03, metavar='SECONDS',
+                        help='Simulated API latency in near regions (default: 0.03)')
+    parser.add_argument('--far-latency', type=float, default=0.12, metavar='SECONDS',
+                        help=f'Simulated API latency in {"/".join(FAR_AREAS)} regions (default: 0.12)')
+    parser.add_argument('--throttle', type=float, default=0.0, metavar='PROBABILITY',
+                        help='Fraction of API attempts answered with RequestLimitExceeded (default: 0)')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Random seed for the fleet layout and throttling (default: 1)')
+    parser.add_argument('--page-size', type=int, default=None, metavar='N',
+                        help='Instances per DescribeInstances page in the listing benchmarks, 5-1000 '
+                             '(default: the script default)')
+    parser.add_argument('-j', '--concurrency', type=int, default=None, metavar='N',
+                        help='Controller --concurrency (default: the script default)')
+    parser.add_argument('--region-concurrency', type=int, default=None, metavar='N',
+                        help='Controller --region-concurrency (default: the script default)')
+    parser.add_argument('--rate-limit', type=float, default=None, metavar='PER_SECOND',
+                        help='Controller --rate-limit (default: the script default)')
+    parser.add_argument('--retry-budget', type=int, default=None, metavar='N',
+                        help='Controller --retry-budget (default: the script default)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the extra tracemalloc run that measures peak memory')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='Write the results as JSON to FILE')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare with an earlier results file and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, metavar='FRACTION',
+                        help=f'Wall time growth tolerated by --compare (default: {TOLERANCE})')
+    args = parser.parse_args()
+    
+    unknown = [name for name in args.benchmark if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    if not 1 <= args.regions <= len(REGIONS):
+        parser.error(f"--regions must be between 1 and {len(REGIONS)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.page_size is not None and not 5 <= args.page_size <= 1000:
+        parser.error("--page-size must be between 5 and 1000")
+    
+    load_statecontrol()
+    defaults = {'page_size': sc.PAGE_SIZE, 'concurrency': sc.CONCURRENCY, 'region_concurrency': sc.REGION_CONCURRENCY,
+                'rate_limit': sc.RATE_LIMIT, 'retry_budget': sc.RETRY_BUDGET}
+    for key, value in defaults.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    
+    results = []
+    for size in args.fleet:
+        print(f"{sc.Fore.BLUE}ℹ Building fleet of {size} instances in {args.regions} regions{sc.Style.RESET_ALL}",
+              file=sys.stderr)
+        fleet = SyntheticFleet(size, REGIONS[:args.regions], args.latency, args.far_latency, args.throttle,
+                               args.seed)
+        for name in args.benchmark:
+            result = run_benchmark(name, fleet, args)
+            results.append(result)
+            peak = 'n/a' if result['peak_mib'] is None else f"{result['peak_mib']} MiB"
+            print(f"  {name:<14} {result['wall_seconds']:8.3f}s  {result['api_calls']:5} calls  "
+                  f"{result['retries']:3} retries  {peak}", file=sys.stderr)
+    
+    rows = [[r['benchmark'], r['fleet'], r['regions'], f"{r['wall_seconds']:.3f}", f"{r['wall_seconds_min']:.3f}",
+             r['api_calls'], r['retries'], 'n/a' if r['peak_mib'] is None else r['peak_mib']] for r in results]
+    print(sc.format_table(rows, ['Benchmark', 'Fleet', 'Regions', 'Median s', 'Min s', 'API calls', 'Retries',
+                                 'Peak MiB']))
+    
+    if args.output:
+        import boto3
+        import botocore
+        with open(args.output, 'w') as f:
+            json.dump({
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': sys.version.split()[0],
+                'boto3': boto3.__version__,
+                'botocore': botocore.__version__,
+                'settings': {key: value for key, value in vars(args).items()
+                             if key not in ('output', 'compare', 'tolerance')},
+                'results': results
+            }, f, indent=1, sort_keys=True)
+            f.write('\n')
+    
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"{sc.Fore.RED}✗ Regression: {regression}{sc.Style.RESET_ALL}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"{sc.Fore.GREEN}✓ No regressions against {args.compare}{sc.Style.RESET_ALL}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nBenchmark cancelled by user", file=sys.stderr)
+        sys.exit(1)
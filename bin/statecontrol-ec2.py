@@ -4,90 +4,1750 @@ EC2 Instance State Control Script
 Manages EC2 instances by ID or name across all AWS regions
 """
 
+import os
 import sys
+import time
+import queue
+import fnmatch
+import threading
 import argparse
 import json
-from typing import Optional, Dict, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bisect import bisect_left
+from contextlib import closing
+from itertools import chain, islice
+from typing import Optional, Dict, List, Tuple, Iterable, Iterator, NamedTuple, Callable
 
-# Try to import optional packages
+if sys.version_info < (3, 7):
+    print(f"Error: Python {sys.version_info[0]}.{sys.version_info[1]} is too old, "
+          f"please install Python 3.7 or later", file=sys.stderr)
+    sys.exit(1)
+
+# boto3/botocore (and asyncio, tabulate) are imported on first use: boto3 alone
+# takes several hundred milliseconds to import, and commands answered from the
+# local cache never need it. See load_boto3().
+boto3 = Config = BotoCoreError = ClientError = NoCredentialsError = ProfileNotFound = None
+
+# Optional packages with fallbacks
 try:
-    import boto3
-    from botocore.exceptions import ClientError, NoCredentialsError, ProfileNotFound
-    HAS_BOTO3 = True
+    from colorama import init, Fore, Style
+    init(autoreset=True)
+    HAS_COLORAMA = True
 except ImportError:
-    HAS_BOTO3 = False
-    print("Warning: boto3 not installed. Please install with: pip install boto3", file=sys.stderr)
-    print("Or use the system package manager: pacman -S python-boto3", file=sys.stderr)
-    sys.exit(1)
+    HAS_COLORAMA = False
+    # Define fallback color codes using ANSI escape sequences
+    class Fore:
+        RED = '\033[91m'
+        GREEN = '\033[92m'
+        YELLOW = '\033[93m'
+        BLUE = '\033[94m'
+        RESET = '\033[0m'
+    
+    class Style:
+        RESET_ALL = '\033[0m'
+
+
+# Local cache location (instance locations, ...)
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'statecontrol-ec2'
+)
+
+# User configuration file (region pinning, ...)
+CONFIG_PATH = os.path.join(
+    os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'),
+    'statecontrol-ec2', 'config.json'
+)
+
+# How long the discovered region list is reused before calling DescribeRegions again
+REGION_CACHE_TTL = 24 * 3600
+
+# A region with no instances in this many consecutive listings is treated as cold
+COLD_AFTER_SCANS = 3
+
+# Cold regions are only listed again after this many seconds
+COLD_RESCAN_INTERVAL = 24 * 3600
+
+# Region opt-in states that can actually be queried
+ENABLED_OPT_IN_STATUSES = ('opt-in-not-required', 'opted-in')
+
+# Region name prefixes searched before the far regions when looking up an instance
+NEAR_AREAS = ('us', 'eu', 'ca')
+
+# Per-call connect/read timeout (seconds) for EC2 API clients
+API_TIMEOUT = 10
+
+# Attempts per API call, first one included (botocore adaptive retry mode)
+MAX_ATTEMPTS = 5
+
+# Client-side ceiling on API requests per second per account and region, and
+# the burst allowed above it (EC2 refills about 20 describe calls/s from 100)
+RATE_LIMIT = 20
+RATE_BURST = 100
+
+# Retries allowed per account and region per minute; once spent, throttled
+# calls fail at once and their region is reported as a partial result
+RETRY_BUDGET = 60
+
+# Error codes EC2 and botocore use for throttling
+THROTTLING_ERROR_CODES = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException', 'RequestThrottled',
+                          'TooManyRequestsException', 'RetryBudgetExhausted')
+
+# Maximum concurrent API tasks (region x operation) across the whole run
+CONCURRENCY = 10
+
+# Maximum concurrent API tasks against a single region
+REGION_CONCURRENCY = 4
+
+# HTTP connections kept per region client (should cover --concurrency)
+MAX_POOL_CONNECTIONS = 10
+
+# Overall time limit (seconds) for searching all regions for an instance
+LOOKUP_DEADLINE = 30
+
+# MaxResults for each DescribeInstances page (the API allows 5-1000)
+PAGE_SIZE = 1000
+
+# Number of pages buffered between the region workers and the consumer
+PAGE_BUFFER = 20
+
+# Maximum values in one DescribeInstances filter
+FILTER_VALUES_LIMIT = 200
+
+# Maximum instance IDs sent in one Start/Stop/RebootInstances call
+ACTION_BATCH_SIZE = 1000
+
+# Commands that can act on many instances at once
+BULK_COMMANDS = ('start', 'stop', 'force-stop', 'reboot', 'status', 'resize')
+
+# Commands that run over SSH on the selected instances (or SSH host aliases)
+FLEET_COMMANDS = ('exec', 'deploy')
+
+# Overall time limit (seconds) for --wait
+WAIT_TIMEOUT = 600
+
+# Poll interval bounds (seconds) and growth factor while waiting for instances
+WAIT_MIN_INTERVAL = 2
+WAIT_MAX_INTERVAL = 20
+WAIT_BACKOFF = 1.5
+
+# A rebooted instance is only taken as back once it was seen leaving running/status ok,
+# or after this long (seconds) for reboots too quick to be observed
+REBOOT_SETTLE_TIME = 60
+
+# Instance IDs per DescribeInstanceStatus/DescribeInstances call while waiting
+POLL_BATCH_SIZE = 100
+
+# Columns list can show (--fields): name -> (record attribute, header, width when streaming)
+LIST_FIELDS = {
+    'account': ('account', 'Account', 16),
+    'region': ('region', 'Region', 14),
+    'id': ('instance_id', 'Instance ID', 19),
+    'state': ('state', 'State', 13),
+    'name': ('name', 'Name', 24),
+    'type': ('instance_type', 'Type', 12),
+    'private-ip': ('private_ip', 'Private IP', 15),
+    'public-ip': ('public_ip', 'Public IP', 15),
+    'az': ('availability_zone', 'AZ', 15),
+    'vpc': ('vpc_id', 'VPC', 21),
+    'subnet': ('subnet_id', 'Subnet', 24),
+    'private-dns': ('private_dns', 'Private DNS', 42),
+    'launch-time': ('launch_time', 'Launch Time', 25),
+    'instance-status': ('instance_status', 'Instance Status', 15),
+    'system-status': ('system_status', 'System Status', 15),
+    'events': ('events', 'Scheduled Events', 30)
+}
+
+# Columns shown by list without --fields
+DEFAULT_LIST_FIELDS = ['region', 'id', 'state', 'name', 'type', 'private-ip', 'public-ip']
+
+# Columns shown by list --health and the health command without --fields
+HEALTH_LIST_FIELDS = ['region', 'id', 'state', 'name', 'instance-status', 'system-status', 'events']
+
+# Columns shown by status for several instances without --fields
+STATUS_LIST_FIELDS = ['region', 'id', 'state', 'name', 'type', 'private-ip', 'public-ip',
+                      'instance-status', 'system-status', 'events']
+
+# Maximum instance IDs in one DescribeInstanceStatus call
+STATUS_IDS_LIMIT = 100
+
+# Output formats for instance listings (--output)
+OUTPUT_FORMATS = ('table', 'json', 'jsonl', 'csv')
+
+# Rows buffered to size the columns of a table
+TABLE_SAMPLE_ROWS = 1000
+
+# How long a cached instance location is trusted before a full region search
+LOCATION_CACHE_TTL = 7 * 24 * 3600
+
+# How long instance type offerings and specs are reused before fetching them again
+TYPE_CACHE_TTL = 7 * 24 * 3600
+
+# Progress of the last multi-instance resize, for --resume
+RESIZE_STATE_PATH = os.path.join(CACHE_DIR, 'resize-state.json')
+
+# Maximum age of the cached inventory used by --cached
+INVENTORY_CACHE_TTL = 3600
+
+# Directory holding the daemon sockets (private to the user, see private_dir_problem)
+DAEMON_DIR = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'statecontrol-ec2') \
+    if os.environ.get('XDG_RUNTIME_DIR') else os.path.join(CACHE_DIR, 'run')
+
+# The daemon lists every region this often (seconds)...
+DAEMON_REFRESH_INTERVAL = 300
+
+# ...and regions whose instances changed within DAEMON_HOT_WINDOW this often
+DAEMON_FAST_REFRESH_INTERVAL = 30
+DAEMON_HOT_WINDOW = 600
+
+# How long the CLI waits for the daemon before querying AWS itself (seconds)
+DAEMON_TIMEOUT = 2
+
+# States an instance only passes through; watch polls these instances quickly
+TRANSITIONAL_STATES = ('pending', 'stopping', 'shutting-down')
+
+# watch polls transitional instances this often (seconds)...
+WATCH_INTERVAL = 5
+
+# ...and lists every region this often
+WATCH_REFRESH_INTERVAL = 60
+
+# How long watch keeps a changed row highlighted (seconds)
+WATCH_HIGHLIGHT = 10
+
+# OpenSSH client configuration searched for host aliases (exec/deploy)
+SSH_CONFIG_PATH = os.path.expanduser('~/.ssh/config')
+
+# Hosts exec/deploy work on at once
+SSH_PARALLEL = 10
+
+# Seconds an idle multiplexed SSH connection is kept open, and the connect timeout
+SSH_CONTROL_PERSIST = 60
+SSH_CONNECT_TIMEOUT = 10
+
+# How long the deploy health gate retries a host (seconds), and how often
+HEALTH_TIMEOUT = 120
+HEALTH_INTERVAL = 5
+
+# SQLite store of inventory changes, written by complete listings and the daemon
+HISTORY_PATH = os.path.join(CACHE_DIR, 'history.db')
+
+# Instance attributes tracked by the history store
+HISTORY_FIELDS = ('state', 'name', 'instance_type', 'private_ip', 'public_ip', 'availability_zone',
+                  'vpc_id', 'subnet_id', 'private_dns', 'launch_time')
+
+# State recorded for instances that are no longer listed
+HISTORY_GONE_STATE = 'gone'
+
+# Older history is compacted to the version in effect at the cutoff (days)...
+HISTORY_RETENTION_DAYS = 90
+
+# ...at most this often while recording (seconds)
+HISTORY_COMPACT_INTERVAL = 24 * 3600
+
+
+def load_boto3():
+    """Import boto3 and botocore on first use, exiting with install hints if missing"""
+    global boto3, Config, BotoCoreError, ClientError, NoCredentialsError, ProfileNotFound
+    if boto3 is not None:
+        return
+    try:
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError, ProfileNotFound
+    except ImportError:
+        print(f"{Fore.RED}Error: boto3 Python package is not installed{Style.RESET_ALL}", file=sys.stderr)
+        print("Please install boto3 using one of these methods:", file=sys.stderr)
+        print("  1. System package manager: pacman -S python-boto3", file=sys.stderr)
+        print("  2. Using pipx: pipx install boto3", file=sys.stderr)
+        print("  3. In a virtual environment: python3 -m venv venv && venv/bin/pip install boto3", file=sys.stderr)
+        print("  4. User install (may require --break-system-packages): pip3 install --user boto3",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+def load_json_file(path: str, default):
+    """Load a JSON file, returning default if it is missing or unreadable"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json_file(path: str, data) -> bool:
+    """Atomically write data as JSON (best effort, returns False on failure)"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def instance_filters(names: Optional[List[str]] = None, tags: Optional[List[Tuple[str, str]]] = None,
+                     instance_types: Optional[List[str]] = None, vpc_ids: Optional[List[str]] = None,
+                     subnet_ids: Optional[List[str]] = None, zones: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Build DescribeInstances filters so EC2 does the selecting server-side
+    
+    Values of one selector are ORed, different selectors are ANDed; names,
+    tag values and the other values may contain the wildcards * and ?.
+    """
+    filters = []
+    for filter_name, values in (('tag:Name', names), ('instance-type', instance_types),
+                                ('vpc-id', vpc_ids), ('subnet-id', subnet_ids),
+                                ('availability-zone', zones)):
+        if values:
+            filters.append({'Name': filter_name, 'Values': list(values)})
+    for key, value in tags or []:
+        filters.append({'Name': f'tag:{key}', 'Values': [value]})
+    return filters
+
+
+def error_summary(error: BaseException) -> Tuple[str, str]:
+    """
+    Classify an API error for partial result reports
+    
+    Returns:
+        ('throttled' or 'failed', error code or message)
+    """
+    code = None
+    if ClientError is not None and isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code')
+    if code in THROTTLING_ERROR_CODES:
+        return 'throttled', code
+    if isinstance(error, TimeoutError):
+        return 'failed', 'deadline reached'
+    return 'failed', code or str(error) or type(error).__name__
+
+
+def identifier_kind(identifier: str) -> str:
+    """
+    Tell what an instance identifier refers to
+    
+    Returns:
+        'id' (i-...), 'private-ip', 'public-ip', 'dns' (private DNS name,
+        ...internal) or 'name' (Name tag, possibly a glob)
+    """
+    if identifier.startswith('i-'):
+        return 'id'
+    if identifier.endswith('.internal'):
+        return 'dns'
+    if identifier[:1].isdigit() or ':' in identifier:
+        import ipaddress
+        try:
+            return 'private-ip' if ipaddress.ip_address(identifier).is_private else 'public-ip'
+        except ValueError:
+            pass
+    return 'name'
+
+
+# DescribeInstances filter for each identifier kind
+IDENTIFIER_FILTERS = {
+    'id': 'instance-id',
+    'private-ip': 'private-ip-address',
+    'public-ip': 'ip-address',
+    'dns': 'private-dns-name',
+    'name': 'tag:Name'
+}
+
+
+def load_config(profile: Optional[str] = None) -> Dict:
+    """
+    Load user configuration, applying per-profile overrides
+    
+    The file is JSON, for example:
+        {"regions": ["eu-west-1", "us-east-1"],
+         "profiles": {"prod-account": {"regions": ["ap-northeast-1"]}}}
+    """
+    config = load_json_file(CONFIG_PATH, {})
+    if not isinstance(config, dict):
+        return {}
+    overrides = config.pop('profiles', {})
+    if isinstance(overrides, dict) and isinstance(overrides.get(profile or 'default'), dict):
+        config.update(overrides[profile or 'default'])
+    return config
+
+
+class LocationCache:
+    """On-disk cache mapping instance IDs and Name tags to (region, instance ID)"""
+    
+    def __init__(self, profile: Optional[str] = None, ttl: int = LOCATION_CACHE_TTL):
+        """
+        Initialize location cache
+        
+        Args:
+            profile: AWS profile name the cache belongs to
+            ttl: Seconds after which an entry is considered stale
+        """
+        self.path = os.path.join(CACHE_DIR, f"locations-{profile or 'default'}.json")
+        self.ttl = ttl
+        entries = load_json_file(self.path, {})
+        self.entries = entries if isinstance(entries, dict) else {}
+    
+    def get(self, identifier: str) -> Optional[Tuple[str, str]]:
+        """Return (region, instance_id) for a fresh entry, or None"""
+        entry = self.entries.get(identifier)
+        if not isinstance(entry, dict):
+            return None
+        if time.time() - entry.get('cached_at', 0) > self.ttl:
+            return None
+        try:
+            return entry['region'], entry['instance_id']
+        except KeyError:
+            return None
+    
+    def put(self, instance_info: Dict):
+        """Record where an instance lives, keyed by both its ID and Name tag"""
+        entry = {
+            'region': instance_info['region'],
+            'instance_id': instance_info['instance_id'],
+            'cached_at': time.time()
+        }
+        self.entries[instance_info['instance_id']] = entry
+        if instance_info.get('name'):
+            self.entries[instance_info['name']] = dict(entry)
+        self.save()
+    
+    def invalidate(self, identifier: str):
+        """Drop a stale or wrong entry"""
+        if self.entries.pop(identifier, None) is not None:
+            self.save()
+    
+    def save(self):
+        """Write the cache to disk, dropping expired entries"""
+        now = time.time()
+        self.entries = {
+            key: entry for key, entry in self.entries.items()
+            if isinstance(entry, dict) and now - entry.get('cached_at', 0) <= self.ttl
+        }
+        save_json_file(self.path, self.entries)
+
+
+def _tag_value(instance: Dict, key: str) -> str:
+    """Return the value of a tag of a DescribeInstances instance structure, or 'N/A'"""
+    for tag in instance.get('Tags', ()):
+        if tag['Key'] == key:
+            return tag['Value']
+    return 'N/A'
+
+
+class InstanceRecord:
+    """Compact instance row used for listings"""
+    
+    __slots__ = ('region', 'instance_id', 'state', 'name', 'instance_type', 'private_ip', 'public_ip',
+                 'account', 'availability_zone', 'vpc_id', 'subnet_id', 'private_dns', 'launch_time',
+                 'instance_status', 'system_status', 'events')
+    
+    # How each attribute is read from a DescribeInstances instance structure
+    EXTRACTORS = {
+        'state': lambda instance: instance['State']['Name'],
+        'name': lambda instance: _tag_value(instance, 'Name'),
+        'instance_type': lambda instance: instance.get('InstanceType', 'N/A'),
+        'private_ip': lambda instance: instance.get('PrivateIpAddress', 'N/A'),
+        'public_ip': lambda instance: instance.get('PublicIpAddress', 'N/A'),
+        'availability_zone': lambda instance: instance.get('Placement', {}).get('AvailabilityZone', 'N/A'),
+        'vpc_id': lambda instance: instance.get('VpcId', 'N/A'),
+        'subnet_id': lambda instance: instance.get('SubnetId', 'N/A'),
+        'private_dns': lambda instance: instance.get('PrivateDnsName') or 'N/A',
+        'launch_time': lambda instance: str(instance.get('LaunchTime', 'N/A'))
+    }
+    
+    def __init__(self, region: str, instance_id: str, state: str = 'N/A', name: str = 'N/A',
+                 instance_type: str = 'N/A', private_ip: str = 'N/A', public_ip: str = 'N/A',
+                 account: str = 'default', availability_zone: str = 'N/A', vpc_id: str = 'N/A',
+                 subnet_id: str = 'N/A', private_dns: str = 'N/A', launch_time: str = 'N/A',
+                 instance_status: str = 'N/A', system_status: str = 'N/A', events: str = 'N/A'):
+        self.region = region
+        self.instance_id = instance_id
+        self.state = state
+        self.name = name
+        self.instance_type = instance_type
+        self.private_ip = private_ip
+        self.public_ip = public_ip
+        self.account = account
+        self.availability_zone = availability_zone
+        self.vpc_id = vpc_id
+        self.subnet_id = subnet_id
+        self.private_dns = private_dns
+        self.launch_time = launch_time
+        self.instance_status = instance_status
+        self.system_status = system_status
+        self.events = events
+    
+    @classmethod
+    def from_instance(cls, region: str, instance: Dict, account: str = 'default',
+                      fields: Optional[Tuple[str, ...]] = None) -> 'InstanceRecord':
+        """
+        Build a record from a DescribeInstances instance structure
+        
+        Args:
+            region: Region the instance lives in
+            instance: Instance structure from DescribeInstances
+            account: Account (profile) name the instance belongs to
+            fields: Attributes to extract (all by default); the others are
+                left as 'N/A'
+        """
+        record = cls(region, instance['InstanceId'], account=account)
+        extractors = cls.EXTRACTORS
+        for field in fields or extractors:
+            if field in extractors:
+                setattr(record, field, extractors[field](instance))
+        return record
+    
+    def as_row(self, with_account: bool = False) -> List[str]:
+        """Return the record as a table row, optionally prefixed with the account"""
+        row = [self.region, self.instance_id, self.state, self.name,
+               self.instance_type, self.private_ip, self.public_ip]
+        return [self.account] + row if with_account else row
+    
+    def project(self, fields: List[str]) -> List[str]:
+        """Return the given attributes as a table row"""
+        return [getattr(self, field) for field in fields]
+    
+    def to_list(self) -> List[str]:
+        """Return every attribute in slot order (the inverse of InstanceRecord(*values))"""
+        return [getattr(self, slot) for slot in self.__slots__]
+
+
+class RegionCache:
+    """
+    On-disk per-profile cache of enabled regions and per-region scan history
+    
+    The scan history counts consecutive full listings that found no
+    instances in a region; such "cold" regions are only rescanned every
+    COLD_RESCAN_INTERVAL seconds.
+    """
+    
+    def __init__(self, profile: Optional[str] = None, ttl: int = REGION_CACHE_TTL):
+        """
+        Initialize region cache
+        
+        Args:
+            profile: AWS profile name the cache belongs to
+            ttl: Seconds after which the region list is fetched again
+        """
+        self.path = os.path.join(CACHE_DIR, f"regions-{profile or 'default'}.json")
+        self.ttl = ttl
+        data = load_json_file(self.path, {})
+        self.data = data if isinstance(data, dict) else {}
+        self.data.setdefault('scans', {})
+        self._lock = threading.Lock()
+    
+    def get_regions(self) -> Optional[List[str]]:
+        """Return the cached region list if it is still fresh"""
+        regions = self.data.get('regions')
+        if not isinstance(regions, list) or not regions:
+            return None
+        if time.time() - self.data.get('cached_at', 0) > self.ttl:
+            return None
+        return regions
+    
+    def put_regions(self, regions: List[str]):
+        """Store a freshly discovered region list"""
+        self.data['regions'] = regions
+        self.data['cached_at'] = time.time()
+        self.save()
+    
+    def is_cold(self, region: str) -> bool:
+        """Whether a region has been empty long enough to skip it for now"""
+        scan = self.data['scans'].get(region)
+        if not isinstance(scan, dict) or scan.get('empty_scans', 0) < COLD_AFTER_SCANS:
+            return False
+        return time.time() - scan.get('last_scan', 0) < COLD_RESCAN_INTERVAL
+    
+    def record_scan(self, region: str, instance_count: int):
+        """Record the result of a complete, unfiltered listing of a region"""
+        with self._lock:
+            scan = self.data['scans'].setdefault(region, {})
+            scan['empty_scans'] = 0 if instance_count else scan.get('empty_scans', 0) + 1
+            scan['last_scan'] = time.time()
+    
+    def save(self):
+        """Write the cache to disk"""
+        with self._lock:
+            save_json_file(self.path, self.data)
+
+
+class InventoryCache:
+    """
+    On-disk snapshot of the last complete instance listing of one profile
+    
+    Written after every unfiltered listing and read by --cached, so list and
+    status can be answered without importing boto3 or calling AWS.
+    """
+    
+    def __init__(self, profile: Optional[str] = None, ttl: int = INVENTORY_CACHE_TTL):
+        """
+        Initialize inventory cache
+        
+        Args:
+            profile: AWS profile name the cache belongs to
+            ttl: Seconds after which the snapshot is considered stale
+        """
+        self.profile = profile or 'default'
+        self.path = os.path.join(CACHE_DIR, f"inventory-{self.profile}.json")
+        self.ttl = ttl
+        self.saved_at = 0
+        self.regions = []
+    
+    @staticmethod
+    def cached_profiles() -> List[str]:
+        """Profiles that have an inventory snapshot on disk"""
+        prefix, suffix = 'inventory-', '.json'
+        try:
+            names = os.listdir(CACHE_DIR)
+        except OSError:
+            return []
+        return sorted(name[len(prefix):-len(suffix)] for name in names
+                      if name.startswith(prefix) and name.endswith(suffix))
+    
+    def load(self) -> Optional[List[InstanceRecord]]:
+        """Return the records of a fresh snapshot, or None"""
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or time.time() - data.get('saved_at', 0) > self.ttl:
+            return None
+        self.saved_at = data['saved_at']
+        self.regions = data.get('regions', [])
+        try:
+            return [InstanceRecord(*row) for row in data.get('instances', [])]
+        except TypeError:
+            return None
+    
+    def save(self, records: List[InstanceRecord], regions: List[str]):
+        """Replace the snapshot with a complete listing of these regions"""
+        self.saved_at = time.time()
+        self.regions = sorted(regions)
+        save_json_file(self.path, {
+            'saved_at': self.saved_at,
+            'regions': self.regions,
+            'instances': [record.to_list() for record in records]
+        })
+
+
+class InventoryIndex:
+    """
+    In-memory index over inventory records for instant local lookups
+    
+    Instance IDs, private/public IPs and private DNS names are hashed; Name
+    tags are kept sorted, so a name glob only scans the names that share
+    its literal prefix ("web-*" bisects to the "web-" range).
+    """
+    
+    def __init__(self, records: Iterable[InstanceRecord]):
+        """Build the index"""
+        self.by_id = {}
+        self.by_address = {}
+        names = []
+        for record in records:
+            self.by_id[record.instance_id] = record
+            for address in (record.private_ip, record.public_ip, record.private_dns):
+                if address and address != 'N/A':
+                    self.by_address.setdefault(address, []).append(record)
+            if record.name and record.name != 'N/A':
+                names.append((record.name, record.instance_id))
+        names.sort()
+        self.names = [name for name, _ in names]
+        self.name_ids = [instance_id for _, instance_id in names]
+    
+    def __len__(self) -> int:
+        return len(self.by_id)
+    
+    def lookup(self, identifier: str) -> List[InstanceRecord]:
+        """
+        Find instances by ID, private/public IP, private DNS name, Name tag or Name glob
+        
+        Returns:
+            Matching records (empty if none)
+        """
+        kind = identifier_kind(identifier)
+        if kind == 'id':
+            record = self.by_id.get(identifier)
+            return [record] if record else []
+        if kind != 'name':
+            return list(self.by_address.get(identifier, []))
+        
+        # Only names starting with the literal part of the pattern can match
+        prefix = identifier
+        for i, c in enumerate(identifier):
+            if c in '*?[':
+                prefix = identifier[:i]
+                break
+        matches = []
+        for i in range(bisect_left(self.names, prefix), len(self.names)):
+            name = self.names[i]
+            if not name.startswith(prefix):
+                break
+            if name == identifier or (prefix != identifier and fnmatch.fnmatchcase(name, identifier)):
+                matches.append(self.by_id[self.name_ids[i]])
+        return matches
+    
+    @staticmethod
+    def identifies(instance: Dict, identifier: str) -> bool:
+        """Whether live instance information (see EC2Controller._search_region) still carries an identifier"""
+        kind = identifier_kind(identifier)
+        if kind == 'id':
+            return instance['instance_id'] == identifier
+        if kind == 'name':
+            return fnmatch.fnmatchcase(instance['name'] or '', identifier)
+        return identifier in (instance['private_ip'], instance['public_ip'], instance.get('private_dns'))
+
+
+class InventoryHistory:
+    """
+    SQLite store of how every instance changed over time
+    
+    Each complete listing of a region is compared with the latest stored
+    version of its instances and only new or changed instances get a row
+    (instances no longer listed get a HISTORY_GONE_STATE row), so the store
+    grows with the churn of the fleet rather than with the number of
+    refreshes. Rows are clustered by (account, region, instance_id,
+    observed_at), which is what both recording and the time-range queries
+    walk. Versions older than the retention period are compacted to the one
+    in effect at the cutoff.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS observations (
+            account TEXT NOT NULL,
+            region TEXT NOT NULL,
+            instance_id TEXT NOT NULL,
+            observed_at REAL NOT NULL,
+            state TEXT, name TEXT, instance_type TEXT, private_ip TEXT, public_ip TEXT,
+            availability_zone TEXT, vpc_id TEXT, subnet_id TEXT, private_dns TEXT, launch_time TEXT,
+            PRIMARY KEY (account, region, instance_id, observed_at)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS observations_state ON observations (state);
+        CREATE TABLE IF NOT EXISTS scans (
+            account TEXT NOT NULL,
+            region TEXT NOT NULL,
+            first_scan REAL NOT NULL,
+            last_scan REAL NOT NULL,
+            PRIMARY KEY (account, region)
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+    """
+    
+    def __init__(self, path: str = HISTORY_PATH, retention_days: float = HISTORY_RETENTION_DAYS):
+        """
+        Initialize history store (the database is opened on first use)
+        
+        Args:
+            path: SQLite database file
+            retention_days: Days of full history kept by compaction
+        """
+        self.path = path
+        self.retention = retention_days * 24 * 3600
+        self.db = None
+    
+    def exists(self) -> bool:
+        """Whether anything has been recorded yet"""
+        return os.path.exists(self.path)
+    
+    def connect(self):
+        """Open the database, creating it if needed"""
+        import sqlite3
+        
+        if self.db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, timeout=10)
+            # auto_vacuum only takes effect on a new database
+            self.db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self.db.execute('PRAGMA journal_mode = WAL')
+            with self.db:
+                self.db.executescript(self.SCHEMA)
+        return self.db
+    
+    def close(self):
+        """Close the database"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+    
+    def record(self, listings: Dict[Tuple[str, str], List[InstanceRecord]],
+               observed_at: Optional[float] = None) -> bool:
+        """
+        Record complete listings of some regions (best effort)
+        
+        Args:
+            listings: Maps (account, region) to every instance listed there
+            observed_at: Time of the listings (now by default)
+            
+        Returns:
+            False if the store could not be written
+        """
+        import sqlite3
+        
+        if not listings:
+            return True
+        now = observed_at or time.time()
+        columns = ', '.join(HISTORY_FIELDS)
+        placeholders = ', '.join('?' * (4 + len(HISTORY_FIELDS)))
+        gone = HISTORY_FIELDS.index('state')
+        try:
+            db = self.connect()
+            with db:
+                for (account, region), records in listings.items():
+                    latest = {row[0]: row[1:-1] for row in db.execute(
+                        f"SELECT instance_id, {columns}, MAX(observed_at) FROM observations "
+                        f"WHERE account = ? AND region = ? GROUP BY instance_id", (account, region))}
+                    rows = []
+                    for record in records:
+                        values = tuple(getattr(record, field) for field in HISTORY_FIELDS)
+                        if latest.pop(record.instance_id, None) != values:
+                            rows.append((account, region, record.instance_id, now) + values)
+                    # Terminated instances drop out of DescribeInstances after a while
+                    for instance_id, values in latest.items():
+                        if values[gone] != HISTORY_GONE_STATE:
+                            values = values[:gone] + (HISTORY_GONE_STATE,) + values[gone + 1:]
+                            rows.append((account, region, instance_id, now) + values)
+                    db.executemany(f"INSERT OR REPLACE INTO observations VALUES ({placeholders})", rows)
+                    db.execute("INSERT OR IGNORE INTO scans VALUES (?, ?, ?, ?)", (account, region, now, now))
+                    db.execute("UPDATE scans SET last_scan = ? WHERE account = ? AND region = ?",
+                               (now, account, region))
+            compacted_at = db.execute("SELECT value FROM meta WHERE key = 'compacted_at'").fetchone()
+            if compacted_at is None or now - compacted_at[0] > HISTORY_COMPACT_INTERVAL:
+                self.compact(now)
+            return True
+        except (sqlite3.Error, OSError):
+            return False
+    
+    def compact(self, now: Optional[float] = None, vacuum: bool = False) -> int:
+        """
+        Apply the retention policy
+        
+        Versions older than the cutoff are dropped unless they were still in
+        effect at the cutoff, and instances gone before the cutoff are
+        forgotten entirely.
+        
+        Args:
+            now: Current time (now by default)
+            vacuum: Also rebuild the database file
+            
+        Returns:
+            Number of rows removed
+        """
+        now = now or time.time()
+        same_instance = ("newer.account = observations.account AND newer.region = observations.region "
+                         "AND newer.instance_id = observations.instance_id "
+                         "AND newer.observed_at > observations.observed_at")
+        params = {'cutoff': now - self.retention, 'gone': HISTORY_GONE_STATE}
+        db = self.connect()
+        with db:
+            removed = db.execute(
+                f"DELETE FROM observations WHERE observed_at < :cutoff AND EXISTS ("
+                f"SELECT 1 FROM observations AS newer WHERE {same_instance} AND newer.observed_at <= :cutoff)",
+                params).rowcount
+            removed += db.execute(
+                f"DELETE FROM observations WHERE state = :gone AND observed_at < :cutoff AND NOT EXISTS ("
+                f"SELECT 1 FROM observations AS newer WHERE {same_instance})", params).rowcount
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('compacted_at', ?)", (now,))
+        if vacuum:
+            db.execute('VACUUM')
+        else:
+            db.execute('PRAGMA incremental_vacuum')
+        return removed
+    
+    def coverage(self) -> Tuple[Optional[float], Optional[float]]:
+        """Return the times of the first and the last recorded listing"""
+        return self.connect().execute("SELECT MIN(first_scan), MAX(last_scan) FROM scans").fetchone()
+    
+    def versions(self, until: float, accounts: Optional[List[str]] = None, regions: Optional[List[str]] = None,
+                 state: Optional[str] = None) -> Iterator[List[Tuple]]:
+        """
+        Yield the stored versions of each instance up to a time
+        
+        Args:
+            until: Ignore versions recorded after this time
+            accounts: Only these accounts (profiles)
+            regions: Only these regions
+            state: Only instances that were in this state at some point
+            
+        Yields:
+            Per instance, its (account, region, instance_id, observed_at,
+            *HISTORY_FIELDS) rows, oldest first
+        """
+        from itertools import groupby
+        
+        where, params = ['observed_at <= ?'], [until]
+        for column, values in (('account', accounts), ('region', regions)):
+            if values:
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if state:
+            # Narrowed through the state index first
+            where.append("(account, region, instance_id) IN "
+                         "(SELECT account, region, instance_id FROM observations WHERE state = ?)")
+            params.append(state)
+        rows = self.connect().execute(
+            f"SELECT account, region, instance_id, observed_at, {', '.join(HISTORY_FIELDS)} FROM observations "
+            f"WHERE {' AND '.join(where)} ORDER BY account, region, instance_id, observed_at", params)
+        for _, versions in groupby(rows, key=lambda row: row[:3]):
+            yield list(versions)
+    
+    @staticmethod
+    def to_record(row: Tuple) -> InstanceRecord:
+        """Turn a stored version into an instance record"""
+        return InstanceRecord(row[1], row[2], account=row[0], **dict(zip(HISTORY_FIELDS, row[4:])))
+    
+    def snapshot(self, start: float, end: float, accounts: Optional[List[str]] = None,
+                 regions: Optional[List[str]] = None, state: Optional[str] = None) -> List[InstanceRecord]:
+        """
+        Return the instances that existed (or were in a state) during a time window
+        
+        Args:
+            start: Window start; for a point in time, start == end
+            end: Window end
+            accounts: Only these accounts (profiles)
+            regions: Only these regions
+            state: Only instances in this state at some point of the window
+            
+        Returns:
+            One record per instance: its last version in the window (in the
+            requested state)
+        """
+        records = []
+        for versions in self.versions(end, accounts, regions, state):
+            # The version in effect at the start of the window, and every later one
+            effective = [v for v in versions if v[3] <= start][-1:] + [v for v in versions if v[3] > start]
+            if state:
+                effective = [v for v in effective if v[4] == state]
+            else:
+                effective = [v for v in effective if v[4] != HISTORY_GONE_STATE]
+            if effective:
+                records.append(self.to_record(effective[-1]))
+        return records
+    
+    def changes(self, since: float, until: float, accounts: Optional[List[str]] = None,
+                regions: Optional[List[str]] = None, fields: Iterable[str] = HISTORY_FIELDS) -> Iterator[Tuple]:
+        """
+        Yield attribute changes recorded during a time window
+        
+        Instances first seen after their region's first recorded listing
+        are reported as a state change from "-".
+        
+        Args:
+            since: Window start
+            until: Window end
+            accounts: Only these accounts (profiles)
+            regions: Only these regions
+            fields: Only changes of these HISTORY_FIELDS
+            
+        Yields:
+            (observed_at, account, region, instance_id, name, field, old, new)
+        """
+        fields = set(fields)
+        first_scans = {row[:2]: row[2] for row in
+                       self.connect().execute("SELECT account, region, first_scan FROM scans")}
+        for versions in self.versions(until, accounts, regions):
+            previous = None
+            for version in versions:
+                if version[3] >= since:
+                    name = version[4 + HISTORY_FIELDS.index('name')]
+                    if previous is None:
+                        if 'state' in fields and version[3] > first_scans.get(version[:2], version[3]):
+                            yield (version[3],) + version[:3] + (name, 'state', '-', version[4])
+                    else:
+                        for position, field in enumerate(HISTORY_FIELDS, 4):
+                            if field in fields and previous[position] != version[position]:
+                                yield (version[3],) + version[:3] + (name, field, previous[position],
+                                                                      version[position])
+                previous = version
+
+
+class TypeCache:
+    """
+    On-disk per-profile cache of instance type offerings per region and
+    of the instance type spec index (vCPUs, memory, network, architectures)
+    """
+    
+    def __init__(self, profile: Optional[str] = None, ttl: int = TYPE_CACHE_TTL):
+        """
+        Initialize type cache
+        
+        Args:
+            profile: AWS profile name the cache belongs to
+            ttl: Seconds after which offerings and specs are fetched again
+        """
+        self.path = os.path.join(CACHE_DIR, f"types-{profile or 'default'}.json")
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict):
+            data = {}
+        self.offerings = data.get('offerings', {})
+        self.specs = data.get('specs', {})
+        self.specs_cached_at = data.get('specs_cached_at', 0)
+        self.no_specs = data.get('no_specs', {})
+    
+    def get_offerings(self, region: str, allow_stale: bool = False) -> Optional[List[str]]:
+        """Return the instance types offered in a region, or None if unknown or expired"""
+        entry = self.offerings.get(region)
+        if not isinstance(entry, dict):
+            return None
+        if not allow_stale and time.time() - entry.get('cached_at', 0) > self.ttl:
+            return None
+        return entry.get('types')
+    
+    def put_offerings(self, region: str, types: List[str]):
+        """Record the instance types offered in a region"""
+        with self.lock:
+            self.offerings[region] = {'types': types, 'cached_at': time.time()}
+    
+    def get_specs(self, allow_stale: bool = False) -> Optional[Dict[str, Dict]]:
+        """Return the spec index (type -> spec dict), or None if empty or expired"""
+        if not self.specs or (not allow_stale and time.time() - self.specs_cached_at > self.ttl):
+            return None
+        return self.specs
+    
+    def put_specs(self, specs: Dict[str, Dict], missing: Iterable[str] = (), rebuilt: bool = False):
+        """
+        Merge freshly fetched specs into the index
+        
+        Args:
+            specs: Instance type -> spec dict
+            missing: Types that were asked for but have no spec
+            rebuilt: The specs are a complete listing, restart the index TTL
+        """
+        with self.lock:
+            self.specs.update(specs)
+            now = time.time()
+            self.no_specs.update((instance_type, now) for instance_type in missing)
+            if rebuilt:
+                self.specs_cached_at = now
+    
+    def lacks_spec(self, instance_type: str) -> bool:
+        """Whether a type recently turned out to have no spec"""
+        return time.time() - self.no_specs.get(instance_type, 0) <= self.ttl
+    
+    def save(self):
+        """Write the cache to disk"""
+        with self.lock:
+            save_json_file(self.path, {
+                'offerings': self.offerings,
+                'specs': self.specs,
+                'specs_cached_at': self.specs_cached_at,
+                'no_specs': self.no_specs
+            })
+
+
+class ActionResult(NamedTuple):
+    """Outcome of a bulk action for one instance"""
+    region: str
+    instance_id: str
+    name: str
+    result: str  # ok, skipped or failed
+    detail: str
+    account: str = 'default'
+
+
+class TaskResult(NamedTuple):
+    """One result from a FanOut run"""
+    key: object
+    value: object = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+    final: bool = True  # False for intermediate items of a streaming task
+
+
+class FanOutCancelled(Exception):
+    """Raised inside a streaming task when its consumer has gone away"""
+
+
+class DaemonThreadPool:
+    """
+    Minimal thread pool whose workers are daemon threads
+    
+    concurrent.futures.ThreadPoolExecutor joins its workers at interpreter
+    exit, so calls a FanOut run abandoned would hold up the exit until their
+    client timeouts ran out; daemon workers are simply dropped instead.
+    """
+    
+    def __init__(self, max_workers: int):
+        """
+        Initialize thread pool
+        
+        Args:
+            max_workers: Maximum number of worker threads, started on demand
+        """
+        self.max_workers = max_workers
+        self._work = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._workers = 0
+    
+    def submit(self, func: Callable, *args):
+        """Run func(*args) on a worker thread and return its concurrent.futures.Future"""
+        from concurrent.futures import Future
+        
+        future = Future()
+        self._work.put((future, func, args))
+        if not self._idle.acquire(blocking=False):
+            with self._lock:
+                if self._workers < self.max_workers:
+                    self._workers += 1
+                    threading.Thread(target=self._worker, name='fanout-worker', daemon=True).start()
+        return future
+    
+    def _worker(self):
+        """Run queued calls forever"""
+        while True:
+            future, func, args = self._work.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            del future
+            self._idle.release()
+
+
+class FanOut:
+    """
+    asyncio engine for running blocking region x operation work concurrently
+    
+    Each task is a blocking function (typically boto3 calls for one region)
+    run on a bounded pool of daemon threads and driven by an event loop in a helper
+    thread, which enforces the global and per-group concurrency limits,
+    per-task timeouts and an overall deadline. Results are handed back to
+    the calling thread in completion order through a generator; closing the
+    generator cancels every task that has not started yet and abandons
+    those in flight (their client timeouts bound how long they linger).
+    """
+    
+    def __init__(self, concurrency: int = CONCURRENCY, timeout: Optional[float] = None):
+        """
+        Initialize fan-out engine
+        
+        Args:
+            concurrency: Maximum number of tasks running at once
+            timeout: Default time limit in seconds for each task
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._executor = DaemonThreadPool(self.concurrency)
+    
+    def run(self, func: Callable, keys, stream: bool = False, deadline: Optional[float] = None,
+            group_of: Optional[Callable] = None, group_limit: Optional[int] = None,
+            buffer: int = PAGE_BUFFER) -> Iterator[TaskResult]:
+        """
+        Run func(key) for every key and yield results as they complete
+        
+        Args:
+            func: Blocking function called with each key
+            keys: Unique, hashable task keys (e.g. region names)
+            stream: func returns an iterable whose items are yielded as
+                intermediate results as soon as they are produced
+            deadline: Seconds after which unfinished tasks are cancelled and
+                reported with a TimeoutError
+            group_of: Maps a key to its concurrency group (e.g. its region)
+            group_limit: Maximum number of tasks running at once per group
+            buffer: Maximum intermediate items waiting for the consumer
+            
+        Yields:
+            TaskResult per streamed item (final=False) and one final
+            TaskResult per key carrying its return value or exception
+        """
+        import asyncio
+        
+        keys = list(keys)
+        results = queue.Queue()
+        slots = threading.BoundedSemaphore(buffer)
+        cancelled = threading.Event()
+        settled = set()
+        settled_lock = threading.Lock()
+        finished = object()
+        loop = asyncio.new_event_loop()
+        
+        def settle(result: TaskResult):
+            """Queue the final result of a task, once"""
+            with settled_lock:
+                if result.key in settled:
+                    return
+                settled.add(result.key)
+            results.put(result)
+        
+        def emit(key, item):
+            """Queue an intermediate item, waiting while the consumer is behind"""
+            while not slots.acquire(timeout=0.1):
+                if cancelled.is_set():
+                    raise FanOutCancelled()
+            if cancelled.is_set() or key in settled:
+                slots.release()
+                raise FanOutCancelled()
+            results.put(TaskResult(key, item, final=False))
+        
+        def call(key):
+            """Run one task in a worker thread"""
+            if cancelled.is_set():
+                return
+            start = time.monotonic()
+            try:
+                if stream:
+                    for item in func(key):
+                        emit(key, item)
+                    value = None
+                else:
+                    value = func(key)
+                settle(TaskResult(key, value, None, time.monotonic() - start))
+            except FanOutCancelled:
+                pass
+            except BaseException as e:
+                # Includes SystemExit: the run must always settle every key
+                settle(TaskResult(key, None, e, time.monotonic() - start))
+        
+        def release_soon(semaphore: asyncio.Semaphore):
+            """Release a group slot from a worker thread"""
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # loop already closed
+        
+        async def run_task(key, limit: asyncio.Semaphore, group_limits: Dict):
+            """Start one task once a slot (and a slot in its group) is free"""
+            group = group_limits.get(group_of(key)) if group_of else None
+            async with limit:
+                if group:
+                    await group.acquire()
+                start = time.monotonic()
+                work = self._executor.submit(call, key)
+                if group:
+                    # A timed out or cancelled task keeps its group slot until
+                    # its worker is really done, so the group limit holds
+                    work.add_done_callback(lambda _: release_soon(group))
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(work), self.timeout)
+                except asyncio.TimeoutError:
+                    settle(TaskResult(key, None, TimeoutError(f"task timed out after {self.timeout}s"),
+                                      time.monotonic() - start))
+        
+        async def run_all():
+            """Run every task, then cancel whatever is left at the deadline"""
+            limit = asyncio.Semaphore(self.concurrency)
+            group_limits = {}
+            if group_of and group_limit:
+                group_limits = {group_of(key): asyncio.Semaphore(group_limit) for key in keys}
+            tasks = [loop.create_task(run_task(key, limit, group_limits)) for key in keys]
+            try:
+                if tasks:
+                    await asyncio.wait(tasks, timeout=deadline)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                for key in keys:
+                    settle(TaskResult(key, None, TimeoutError(f"deadline of {deadline}s reached")))
+                results.put(finished)
+        
+        def drive():
+            """Event loop thread"""
+            asyncio.set_event_loop(loop)
+            main_task = loop.create_task(run_all())
+            try:
+                loop.run_until_complete(main_task)
+            except asyncio.CancelledError:
+                results.put(finished)
+            finally:
+                loop.close()
+        
+        driver = threading.Thread(target=drive, name='fanout', daemon=True)
+        driver.start()
+        try:
+            while True:
+                result = results.get()
+                if result is finished:
+                    break
+                if not result.final:
+                    slots.release()
+                yield result
+        finally:
+            # Consumer is done (or gave up): stop everything still running
+            cancelled.set()
+            if driver.is_alive():
+                try:
+                    loop.call_soon_threadsafe(lambda: [task.cancel() for task in asyncio.all_tasks(loop)])
+                except RuntimeError:
+                    pass  # loop already closed
+    
+    def map(self, func: Callable, keys, **kwargs) -> List[TaskResult]:
+        """Run func(key) for every key and return all final results"""
+        return list(self.run(func, keys, **kwargs))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, block: bool = True) -> bool:
+        """
+        Take one token, sleeping until one is available if block is set
+        
+        Returns:
+            Whether a token was taken (always True when blocking)
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                if not block:
+                    return False
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class RequestLimiter:
+    """
+    Client-side rate limit and retry budget of one account/region client
+    
+    botocore's adaptive retry mode already backs off and slows a client
+    down once EC2 throttles it; this adds a fixed ceiling below the EC2
+    request quota, so a wide fan-out does not get throttled in the first
+    place, and a budget that stops a throttled region from retrying
+    indefinitely. Both apply to every HTTP attempt (hooked on before-send).
+    """
+    
+    def __init__(self, rate_limit: float = RATE_LIMIT, burst: int = RATE_BURST,
+                 retry_budget: int = RETRY_BUDGET):
+        """
+        Initialize limiter
+        
+        Args:
+            rate_limit: Requests per second (0 for no limit)
+            burst: Requests allowed at once above the rate
+            retry_budget: Retries allowed per minute
+        """
+        self.requests = TokenBucket(rate_limit, max(burst, 1)) if rate_limit > 0 else None
+        self.retries = TokenBucket(retry_budget / 60, retry_budget) if retry_budget > 0 else None
+    
+    def before_send(self, request, event_name: str = '', **kwargs):
+        """Wait for a request token; refuse a retry once the retry budget is spent"""
+        attempt = getattr(request, 'context', {}).get('retries', {}).get('attempt', 1)
+        if attempt > 1 and (self.retries is None or not self.retries.acquire(block=False)):
+            raise ClientError({'Error': {'Code': 'RetryBudgetExhausted',
+                                         'Message': 'Retry budget exhausted, giving up after throttling'}},
+                              event_name.rsplit('.', 1)[-1])
+        if self.requests:
+            self.requests.acquire()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values (0 if empty)"""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+class ApiMetrics:
+    """
+    Per account/region/operation statistics of every EC2 API call
+    
+    One DescribeInstances page is one call, so calls also count pages.
+    Each finished call is also passed to the hooks (see add_hook) as a dict
+    with account, region, operation, started (epoch), seconds, retries,
+    bytes and error (error code or None).
+    """
+    
+    def __init__(self, keep_calls: bool = False):
+        """
+        Initialize collector
+        
+        Args:
+            keep_calls: Also keep every call dict (for a --trace file)
+        """
+        self.keep_calls = keep_calls
+        self.calls = []
+        self.stats = {}
+        self.hooks = []
+        self.lock = threading.Lock()
+    
+    def add_hook(self, hook: Callable[[Dict], None]):
+        """Call hook(call) after every API call, from the calling thread"""
+        self.hooks.append(hook)
+    
+    def register(self, client, account: str):
+        """Instrument an EC2 client of an account"""
+        region = client.meta.region_name
+        
+        def before(context, **kwargs):
+            context['metrics_started'] = time.time()
+            context['metrics_start'] = time.perf_counter()
+        
+        def after(context, http_response=None, parsed=None, exception=None, event_name='', **kwargs):
+            if 'metrics_start' not in context:
+                return
+            error = None
+            if exception is not None:
+                error = error_summary(exception)[1]
+            elif http_response is not None and http_response.status_code >= 300:
+                error = (parsed or {}).get('Error', {}).get('Code') or str(http_response.status_code)
+            size = len(getattr(http_response, 'content', None) or b'') if http_response is not None else 0
+            self.record({
+                'account': account,
+                'region': region,
+                'operation': event_name.rsplit('.', 1)[-1],
+                'started': context['metrics_started'],
+                'seconds': time.perf_counter() - context.pop('metrics_start'),
+                'retries': context.get('retries', {}).get('attempt', 1) - 1,
+                'bytes': size,
+                'error': error
+            })
+        
+        # Parameter building is the first per-call event, so handlers that
+        # answer or delay a call in before-call are timed as well
+        client.meta.events.register('before-parameter-build.ec2', before)
+        client.meta.events.register('after-call.ec2', after)
+        client.meta.events.register('after-call-error.ec2', after)
+    
+    def record(self, call: Dict):
+        """Add one finished call"""
+        key = (call['account'], call['region'], call['operation'])
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = {'calls': 0, 'retries': 0, 'errors': 0, 'bytes': 0, 'seconds': []}
+            stats['calls'] += 1
+            stats['retries'] += call['retries']
+            stats['errors'] += call['error'] is not None
+            stats['bytes'] += call['bytes']
+            stats['seconds'].append(call['seconds'])
+            if self.keep_calls:
+                self.calls.append(call)
+        for hook in self.hooks:
+            hook(call)
+    
+    def summary(self) -> List[Dict]:
+        """
+        Aggregated statistics, one dict per account/region/operation, sorted
+        
+        Each has account, region, operation, calls, retries, errors, bytes,
+        total_seconds and p50/p90/p99/max_seconds.
+        """
+        with self.lock:
+            items = sorted((key, dict(stats), sorted(stats['seconds'])) for key, stats in self.stats.items())
+        rows = []
+        for (account, region, operation), stats, seconds in items:
+            rows.append({
+                'account': account,
+                'region': region,
+                'operation': operation,
+                'calls': stats['calls'],
+                'retries': stats['retries'],
+                'errors': stats['errors'],
+                'bytes': stats['bytes'],
+                'total_seconds': round(sum(seconds), 4),
+                'p50_seconds': round(percentile(seconds, 0.5), 4),
+                'p90_seconds': round(percentile(seconds, 0.9), 4),
+                'p99_seconds': round(percentile(seconds, 0.99), 4),
+                'max_seconds': round(seconds[-1], 4)
+            })
+        return rows
+
+
+class AWSAccount:
+    """Session, client pool, caches and regions of one AWS profile"""
+    
+    def __init__(self, session: 'boto3.Session', client_config: 'Config',
+                 use_cache: bool = True, cache_ttl: int = LOCATION_CACHE_TTL,
+                 rate_limit: float = RATE_LIMIT, retry_budget: int = RETRY_BUDGET,
+                 metrics: Optional[ApiMetrics] = None):
+        """
+        Initialize account
+        
+        Args:
+            session: boto3 session for the profile
+            client_config: botocore config for the account's EC2 clients
+            use_cache: Use the on-disk instance location cache
+            cache_ttl: Seconds a cached instance location stays valid
+            rate_limit: Requests per second per region client (0 for no limit)
+            retry_budget: Retries per minute per region client (see RequestLimiter)
+            metrics: Collector that instruments the account's clients
+        """
+        self.session = session
+        self.name = session.profile_name or 'default'
+        self.client_config = client_config
+        self.rate_limit = rate_limit
+        self.retry_budget = retry_budget
+        self.metrics = metrics
+        self.location_cache = LocationCache(self.name, cache_ttl) if use_cache else None
+        self.region_cache = RegionCache(self.name)
+        self.type_cache = TypeCache(self.name)
+        self._inventory_index = None
+        self.regions = []
+        self.pinned = False
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+    
+    def client(self, region: str):
+        """
+        Get the shared EC2 client for a region, creating it on first use
+        
+        Clients are thread-safe and keep their HTTPS connections alive, so one
+        client per region is reused for every call in the process. The boto3
+        session itself is not thread-safe, hence the lock around creation.
+        Each client gets its own RequestLimiter, and is instrumented by the
+        metrics collector if there is one.
+        """
+        client = self._clients.get(region)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(region)
+                if client is None:
+                    client = self.session.client('ec2', region_name=region, config=self.client_config)
+                    limiter = RequestLimiter(self.rate_limit, RATE_BURST, self.retry_budget)
+                    client.meta.events.register('before-send.ec2', limiter.before_send)
+                    if self.metrics:
+                        self.metrics.register(client, self.name)
+                    self._clients[region] = client
+        return client
+    
+    def inventory_index(self) -> InventoryIndex:
+        """
+        Index over the account's inventory snapshot, built on first use
+        
+        Snapshots up to LOCATION_CACHE_TTL old are used: like cached
+        locations, index hits are only hints and get revalidated.
+        """
+        if self._inventory_index is None:
+            self._inventory_index = InventoryIndex(InventoryCache(self.name, LOCATION_CACHE_TTL).load() or [])
+        return self._inventory_index
 
-# Optional packages with fallbacks
-try:
-    from tabulate import tabulate
-    HAS_TABULATE = True
-except ImportError:
-    HAS_TABULATE = False
 
-try:
-    from colorama import init, Fore, Style
-    init(autoreset=True)
-    HAS_COLORAMA = True
-except ImportError:
-    HAS_COLORAMA = False
-    # Define fallback color codes using ANSI escape sequences
-    class Fore:
-        RED = '\033[91m'
-        GREEN = '\033[92m'
-        YELLOW = '\033[93m'
-        BLUE = '\033[94m'
-        RESET = '\033[0m'
+class Console:
+    """Colored status messages shared by the cached and the AWS code paths"""
     
-    class Style:
-        RESET_ALL = '\033[0m'
+    def __init__(self, verbose: bool = False, message_file=None):
+        """
+        Initialize console
+        
+        Args:
+            verbose: Enable verbose output
+            message_file: Where messages go (stdout by default; stderr keeps
+                them out of machine-readable output)
+        """
+        self.verbose = verbose
+        self.message_file = message_file or sys.stdout
+    
+    def _info(self, message: str):
+        """Print info message"""
+        print(f"{Fore.BLUE}ℹ {message}{Style.RESET_ALL}", file=self.message_file)
+    
+    def _success(self, message: str):
+        """Print success message"""
+        print(f"{Fore.GREEN}✓ {message}{Style.RESET_ALL}", file=self.message_file)
+    
+    def _warning(self, message: str):
+        """Print warning message"""
+        print(f"{Fore.YELLOW}⚠ {message}{Style.RESET_ALL}", file=self.message_file)
+    
+    def _error(self, message: str):
+        """Print error message"""
+        print(f"{Fore.RED}✗ {message}{Style.RESET_ALL}", file=self.message_file)
 
 
-class EC2Controller:
-    """Controller for EC2 instance operations across all regions"""
+class EC2Controller(Console):
+    """Controller for EC2 instance operations across all regions of one or more accounts"""
     
-    def __init__(self, profile: Optional[str] = None, verbose: bool = False):
+    def __init__(self, profile: Optional[str] = None, verbose: bool = False,
+                 use_cache: bool = True, cache_ttl: int = LOCATION_CACHE_TTL,
+                 api_timeout: int = API_TIMEOUT, lookup_deadline: int = LOOKUP_DEADLINE,
+                 max_pool_connections: int = MAX_POOL_CONNECTIONS,
+                 regions: Optional[List[str]] = None, skip_cold_regions: bool = True,
+                 concurrency: int = CONCURRENCY, region_concurrency: int = REGION_CONCURRENCY,
+                 profiles: Optional[List[str]] = None, message_file=None,
+                 max_attempts: int = MAX_ATTEMPTS, rate_limit: float = RATE_LIMIT,
+                 retry_budget: int = RETRY_BUDGET, trace_calls: bool = False):
         """
         Initialize EC2 controller
         
         Args:
             profile: AWS profile name to use
             verbose: Enable verbose output
+            use_cache: Use the on-disk instance location cache
+            cache_ttl: Seconds a cached instance location stays valid
+            api_timeout: Connect/read timeout in seconds for each API call
+            lookup_deadline: Seconds before an all-region search gives up
+            max_pool_connections: HTTP connections kept open per region client
+            regions: Regions to use instead of discovering them (overrides config)
+            skip_cold_regions: Skip regions that have been empty for a while in listings
+            concurrency: Maximum concurrent API tasks across all regions
+            region_concurrency: Maximum concurrent API tasks per region
+            profiles: Several AWS profiles (accounts) to work across; overrides profile
+            message_file: Where status messages go (stdout by default)
+            max_attempts: Attempts per API call, first one included
+            rate_limit: Requests per second per account and region (0 for no limit)
+            retry_budget: Retries per minute per account and region
+            trace_calls: Keep every API call in metrics.calls, not only the statistics
         """
+        load_boto3()
+        super().__init__(verbose, message_file)
         self.profile = profile
-        self.verbose = verbose
-        self.session = self._create_session()
-        self.regions = self._get_all_regions()
-        
-    def _create_session(self) -> boto3.Session:
+        self.daemon_socket = None
+        # Account/region labels the last search, listing or resolution got no answer from
+        self.partial_regions = []
+        self.lookup_deadline = lookup_deadline
+        self.region_concurrency = region_concurrency
+        self.skip_cold_regions = skip_cold_regions
+        self.fanout = FanOut(concurrency)
+        self.metrics = ApiMetrics(keep_calls=trace_calls)
+        self.client_config = Config(
+            connect_timeout=api_timeout,
+            read_timeout=api_timeout,
+            retries={'mode': 'adaptive', 'max_attempts': max_attempts},
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=True
+        )
+        self.accounts = [
+            AWSAccount(self._create_session(name), self.client_config, use_cache, cache_ttl,
+                       rate_limit, retry_budget, self.metrics)
+            for name in (profiles or [profile])
+        ]
+        self._discover_regions(regions)
+    
+    def add_metrics_hook(self, hook: Callable[[Dict], None]):
+        """Call hook(call) after every EC2 API call (see ApiMetrics)"""
+        self.metrics.add_hook(hook)
+    
+    @property
+    def multi_account(self) -> bool:
+        """Whether the controller works across more than one account"""
+        return len(self.accounts) > 1
+    
+    @property
+    def regions(self) -> List[str]:
+        """All regions used by any account"""
+        return sorted({region for account in self.accounts for region in account.regions})
+    
+    def _create_session(self, profile: Optional[str] = None) -> 'boto3.Session':
         """Create boto3 session with specified profile"""
         try:
-            if self.profile:
-                return boto3.Session(profile_name=self.profile)
+            if profile:
+                return boto3.Session(profile_name=profile)
             return boto3.Session()
         except ProfileNotFound:
-            self._error(f"AWS profile '{self.profile}' not found")
+            self._error(f"AWS profile '{profile}' not found")
             sys.exit(1)
-            
-    def _get_all_regions(self) -> List[str]:
-        """Get all available AWS regions"""
+    
+    def _account(self, name: Optional[str] = None) -> AWSAccount:
+        """Look up an account by profile name (the first account by default)"""
+        for account in self.accounts:
+            if account.name == name:
+                return account
+        return self.accounts[0]
+    
+    def _client(self, region: str, account: Optional[AWSAccount] = None):
+        """Get the shared EC2 client for a region of an account (first account by default)"""
+        return (account or self.accounts[0]).client(region)
+    
+    def _label(self, account: AWSAccount, region: str) -> str:
+        """Human readable name of an account/region pair"""
+        return f"{account.name}/{region}" if self.multi_account else region
+    
+    def _report_partial(self, failures: List[Tuple[str, BaseException]], what: str = 'Results'):
+        """
+        Warn that some regions did not answer, throttled regions apart from failed ones
+        
+        Args:
+            failures: (region label, error) pairs
+            what: What is incomplete, e.g. "Listing"
+        """
+        self.partial_regions = sorted(label for label, _ in failures)
+        groups = {}
+        for label, error in failures:
+            kind, reason = error_summary(error)
+            groups.setdefault(kind, []).append(f"{label} ({reason})")
+        for kind in ('throttled', 'failed'):
+            if kind in groups:
+                self._warning(f"{what} incomplete, {len(groups[kind])} region(s) {kind}: "
+                              f"{', '.join(sorted(groups[kind]))}")
+    
+    def _discover_regions(self, pinned: Optional[List[str]] = None):
+        """
+        Find the regions of every account, in parallel across accounts
+        
+        Accounts without usable credentials, or whose regions cannot be
+        found (expired SSO token, unreachable endpoint, ...), are dropped
+        with a warning when working across several accounts; with a single
+        account it is fatal.
+        """
+        results = self.fanout.map(lambda account: self._get_all_regions(account, pinned), self.accounts)
+        usable = []
+        for result in results:
+            account = result.key
+            if isinstance(result.error, NoCredentialsError):
+                if not self.multi_account:
+                    self._error("AWS credentials not configured")
+                    self._warning("Please configure AWS CLI with: aws configure")
+                    self._warning("Or set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables")
+                    sys.exit(1)
+                self._warning(f"Skipping profile '{account.name}': AWS credentials not configured")
+                continue
+            if isinstance(result.error, (ClientError, BotoCoreError)):
+                if not self.multi_account:
+                    self._error(f"Failed to get regions for {account.name}: {result.error}")
+                    sys.exit(1)
+                self._warning(f"Skipping profile '{account.name}': {result.error}")
+                continue
+            if result.error:
+                raise result.error
+            account.regions = result.value
+            usable.append(account)
+        
+        if not usable:
+            self._error("No AWS profile with usable credentials")
+            sys.exit(1)
+        self.accounts = [account for account in self.accounts if account in usable]
+    
+    def _get_all_regions(self, account: AWSAccount, pinned: Optional[List[str]] = None) -> List[str]:
+        """
+        Get all available AWS regions of an account
+        
+        Pinned regions (--regions or the config file) are used as-is. Otherwise
+        the region list comes from the on-disk cache, or from DescribeRegions
+        with regions that are disabled or not opted in filtered out.
+        
+        Raises:
+            NoCredentialsError: The account has no usable credentials
+        """
+        pinned = pinned or load_config(account.name).get('regions')
+        if pinned:
+            account.pinned = True
+            if self.verbose:
+                self._info(f"Using {len(pinned)} pinned regions for {account.name}")
+            return list(pinned)
+        
+        regions = account.region_cache.get_regions()
+        if regions:
+            if self.verbose:
+                self._info(f"Using {len(regions)} cached AWS regions for {account.name}")
+            return regions
+        
         try:
-            ec2 = self.session.client('ec2', region_name='us-east-1')
-            response = ec2.describe_regions()
-            regions = [region['RegionName'] for region in response['Regions']]
+            ec2 = account.client('us-east-1')
+            response = ec2.describe_regions(AllRegions=True)
+            regions = [
+                region['RegionName'] for region in response['Regions']
+                if region.get('OptInStatus', 'opt-in-not-required') in ENABLED_OPT_IN_STATUSES
+            ]
             if self.verbose:
-                self._info(f"Found {len(regions)} AWS regions")
+                skipped = len(response['Regions']) - len(regions)
+                self._info(f"Found {len(regions)} enabled AWS regions for {account.name} "
+                           f"({skipped} not opted in)")
+            account.region_cache.put_regions(regions)
             return regions
-        except NoCredentialsError:
-            self._error("AWS credentials not configured")
-            self._warning("Please configure AWS CLI with: aws configure")
-            self._warning("Or set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables")
-            sys.exit(1)
         except ClientError as e:
-            self._error(f"Failed to get regions: {e}")
+            self._error(f"Failed to get regions for {account.name}: {e}")
             # Fallback to common regions
             return [
                 'us-east-1', 'us-east-2', 'us-west-1', 'us-west-2',
@@ -95,175 +1755,847 @@ class EC2Controller:
                 'ap-south-1', 'ap-northeast-1', 'ap-southeast-1', 'ap-southeast-2'
             ]
     
-    def _info(self, message: str):
-        """Print info message"""
-        print(f"{Fore.BLUE}ℹ {message}{Style.RESET_ALL}")
+    def scan_targets(self) -> List[Tuple[AWSAccount, str]]:
+        """
+        Account/region pairs to list, leaving out cold regions that are not
+        due for a rescan (pinned regions are always listed)
+        """
+        targets = []
+        cold = []
+        for account in self.accounts:
+            for region in account.regions:
+                if self.skip_cold_regions and not account.pinned and account.region_cache.is_cold(region):
+                    cold.append(self._label(account, region))
+                else:
+                    targets.append((account, region))
+        if self.verbose and cold:
+            self._info(f"Skipping {len(cold)} region(s) without instances: {', '.join(sorted(cold))}")
+        return targets
     
-    def _success(self, message: str):
-        """Print success message"""
-        print(f"{Fore.GREEN}✓ {message}{Style.RESET_ALL}")
+    def _search_region(self, region: str, identifier: str, account: Optional[AWSAccount] = None,
+                       filters: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Search for instance in a specific region
+        
+        Args:
+            region: AWS region to search
+            identifier: Instance ID, IP address, private DNS name or name tag
+            account: Account to search (first account by default)
+            filters: DescribeInstances filters to use instead of the identifier's
+            
+        Returns:
+            List of matching instance information dicts (empty if none)
+            
+        Raises:
+            ClientError, BotoCoreError: The region could not be searched
+                (throttled, not accessible, timed out)
+        """
+        account = account or self.accounts[0]
+        matches = []
+        ec2 = self._client(region, account)
+        
+        # Instance ID, IP address, private DNS name or Name tag
+        if filters is None:
+            filters = [{'Name': IDENTIFIER_FILTERS[identifier_kind(identifier)], 'Values': [identifier]}]
+        
+        response = ec2.describe_instances(Filters=filters)
+        
+        for reservation in response['Reservations']:
+            for instance in reservation['Instances']:
+                # Get instance name from tags
+                name = None
+                for tag in instance.get('Tags', []):
+                    if tag['Key'] == 'Name':
+                        name = tag['Value']
+                        break
+                
+                matches.append({
+                    'account': account.name,
+                    'region': region,
+                    'instance_id': instance['InstanceId'],
+                    'state': instance['State']['Name'],
+                    'name': name,
+                    'instance_type': instance.get('InstanceType'),
+                    'private_ip': instance.get('PrivateIpAddress'),
+                    'public_ip': instance.get('PublicIpAddress'),
+                    'private_dns': instance.get('PrivateDnsName'),
+                    'launch_time': instance.get('LaunchTime'),
+                    'platform': instance.get('Platform', 'Linux'),
+                    'architecture': instance.get('Architecture')
+                })
+        return matches
     
-    def _warning(self, message: str):
-        """Print warning message"""
-        print(f"{Fore.YELLOW}⚠ {message}{Style.RESET_ALL}")
+    def find_instance(self, identifier: str) -> Optional[Dict]:
+        """
+        Find instance across all regions
+        
+        Args:
+            identifier: Instance ID, IP address, private DNS name, name tag
+                or name pattern
+            
+        Returns:
+            Instance information dict, or None if nothing or more than one
+            instance matches
+        """
+        matches = self.find_instances(identifier)
+        return matches[0] if len(matches) == 1 else None
     
-    def _error(self, message: str):
-        """Print error message"""
-        print(f"{Fore.RED}✗ {message}{Style.RESET_ALL}")
+    def find_instances(self, identifier: str, all_matches: bool = False) -> List[Dict]:
+        """
+        Find instances across all regions of all accounts
+        
+        A running daemon, the inventory index and the location cache are
+        asked first; their hits are revalidated with one call to the region
+        they name, and only a miss searches every region. The daemon and the
+        index return every instance they know to match, so an ambiguous name
+        is reported as such whichever source answers.
+        
+        Args:
+            identifier: Instance ID, IP address, private DNS name or name tag
+            all_matches: Search every region and return every match instead
+                of stopping at the first one
+            
+        Returns:
+            List of instance information dicts (empty if not found)
+        """
+        self._info(f"Searching for instance: {identifier}")
+        
+        if not all_matches:
+            found = self._find_daemon_instances(identifier)
+            if found:
+                return found
+            for account in self.accounts:
+                indexed = self._find_indexed_instances(identifier, account)
+                if indexed:
+                    return indexed
+            for account in self.accounts:
+                cached = self._find_cached_instance(identifier, account)
+                if cached:
+                    return [cached]
+        
+        matches = self._search_all_regions(identifier, all_matches=all_matches)
+        if len(matches) == 1:
+            account = self._account(matches[0]['account'])
+            if account.location_cache:
+                account.location_cache.put(matches[0])
+        return matches
     
-    def _search_region(self, region: str, identifier: str) -> Optional[Dict]:
+    def _find_daemon_instances(self, identifier: str) -> List[Dict]:
         """
-        Search for instance in a specific region
+        Ask a running daemon where instances live and fetch them from there
+        
+        Args:
+            identifier: Instance ID, IP address, private DNS name or name tag
+            
+        Returns:
+            Instance information dicts of every match the daemon knows of, or
+            an empty list if no daemon is running, it does not know the
+            instance, its inventory is out of date or a match is stale
+        """
+        if not self.daemon_socket:
+            return []
+        response = query_daemon(self.daemon_socket, {'command': 'find', 'instances': [identifier]})
+        if not response or not response.get('ok') or not response['instances']:
+            return []
+        
+        matches = []
+        for record in (InstanceRecord(*fields) for fields in response['instances']):
+            account = self._account(record.account)
+            if self.verbose:
+                self._info(f"Daemon location: {record.instance_id} in {self._label(account, record.region)}")
+            try:
+                found = [result for result in self._search_region(record.region, record.instance_id, account)
+                         if InventoryIndex.identifies(result, identifier)]
+            except (ClientError, BotoCoreError):
+                return []
+            if not found:
+                # One stale answer makes the rest suspect: search instead
+                return []
+            matches.extend(found)
+        return matches
+    
+    def _find_indexed_instances(self, identifier: str, account: AWSAccount) -> List[Dict]:
+        """
+        Look up an instance in the index over an account's inventory snapshot
+        
+        Only the matched instances are revalidated, with one DescribeInstances
+        call per region they are in.
+        
+        Args:
+            identifier: Instance ID, IP address, private DNS name or name tag
+            account: Account whose inventory to use
+            
+        Returns:
+            Instance information dicts of the matches that are still valid,
+            or an empty list on an index miss
+        """
+        if not account.location_cache:
+            return []
+        
+        by_region = {}
+        for record in account.inventory_index().lookup(identifier):
+            by_region.setdefault(record.region, []).append(record.instance_id)
+        if not by_region:
+            return []
+        
+        if self.verbose:
+            self._info(f"Indexed location: {identifier} in "
+                       f"{', '.join(self._label(account, region) for region in sorted(by_region))}")
+        
+        matches = []
+        for region in sorted(by_region):
+            ids = by_region[region][:FILTER_VALUES_LIMIT]
+            try:
+                found = self._search_region(region, identifier, account,
+                                            filters=[{'Name': 'instance-id', 'Values': ids}])
+            except (ClientError, BotoCoreError):
+                return []
+            matches.extend(result for result in found if InventoryIndex.identifies(result, identifier))
+        if not matches and self.verbose:
+            self._warning(f"Indexed location for {identifier} is stale, searching all regions")
+        return matches
+    
+    def _find_cached_instance(self, identifier: str, account: AWSAccount) -> Optional[Dict]:
+        """
+        Look up an instance in the region recorded in an account's location cache
         
         Args:
-            region: AWS region to search
             identifier: Instance ID or name tag
+            account: Account whose cache to use
             
         Returns:
-            Instance information dict or None
+            Instance information dict, or None on a cache miss or stale entry
         """
+        if not account.location_cache:
+            return None
+        
+        location = account.location_cache.get(identifier)
+        if not location:
+            return None
+        
+        region, instance_id = location
+        if self.verbose:
+            self._info(f"Cached location: {instance_id} in {self._label(account, region)}")
+        
+        # Validate the entry: the instance must still exist there and carry the same name
         try:
-            ec2 = self.session.client('ec2', region_name=region)
+            for result in self._search_region(region, instance_id, account):
+                if InventoryIndex.identifies(result, identifier):
+                    return result
+        except (ClientError, BotoCoreError) as e:
+            # Unknown rather than stale: keep the entry and fall back to a full search
+            if self.verbose:
+                self._warning(f"Could not check cached location of {identifier}: {error_summary(e)[1]}")
+            return None
+        
+        if self.verbose:
+            self._warning(f"Cached location for {identifier} is stale, searching all regions")
+        account.location_cache.invalidate(identifier)
+        return None
+    
+    def _lookup_order(self) -> List[Tuple[AWSAccount, str]]:
+        """
+        Order account/region pairs for an instance search: regions known to
+        hold our instances first, cold regions last, and within those the
+        session's home area first and far regions last
+        """
+        def rank(target: Tuple[AWSAccount, str]) -> Tuple[int, int, str, str]:
+            account, region = target
+            home = account.session.region_name or 'us-east-1'
+            area = region.split('-')[0]
+            distance = 0 if region == home else 1 if area == home.split('-')[0] else 2 if area in NEAR_AREAS else 3
+            if region in known[account.name]:
+                likelihood = 0
+            elif account.region_cache.is_cold(region):
+                likelihood = 2
+            else:
+                likelihood = 1
+            return (likelihood, distance, region, account.name)
+        
+        known = {}
+        for account in self.accounts:
+            known[account.name] = set()
+            if account.location_cache:
+                known[account.name] = {entry.get('region') for entry in account.location_cache.entries.values()
+                                       if isinstance(entry, dict)}
+        
+        targets = [(account, region) for account in self.accounts for region in account.regions]
+        return sorted(targets, key=rank)
+    
+    def _search_all_regions(self, identifier: str, all_matches: bool = False) -> List[Dict]:
+        """
+        Search every region of every account in parallel
+        
+        Queued region searches are cancelled as soon as a region answers
+        with a match (unless all_matches is set); every match of that region
+        is returned, so callers can tell an ambiguous name from a unique one.
+        The whole search gives up after lookup_deadline seconds. Calls
+        already in flight are abandoned; the client timeouts in client_config
+        bound how long they can linger.
+        Cancellation is handled by the fan-out engine. Regions that could
+        not be searched (throttled, failed, past the deadline) are reported
+        unless a match was found anyway.
+        """
+        matches = []
+        failures = []
+        search = self.fanout.run(lambda target: self._search_region(target[1], identifier, target[0]),
+                                 self._lookup_order(), deadline=self.lookup_deadline)
+        with closing(search):
+            for result in search:
+                if isinstance(result.error, (TimeoutError, ClientError, BotoCoreError)):
+                    failures.append((self._label(*result.key), result.error))
+                    continue
+                if result.error:
+                    raise result.error
+                if self.verbose:
+                    self._info(f"Checked region: {self._label(*result.key)}")
+                
+                matches.extend(result.value)
+                if matches and not all_matches:
+                    break
+        
+        self.partial_regions = []
+        if failures and (all_matches or not matches):
+            self._report_partial(failures, 'Search')
+        return matches
+    
+    def list_instances(self, state_filter: Optional[str] = None,
+                       page_size: int = PAGE_SIZE, filters: Optional[List[Dict]] = None,
+                       fields: Optional[Tuple[str, ...]] = None) -> List[InstanceRecord]:
+        """
+        List all instances across all regions
+        
+        Args:
+            state_filter: Optional state filter (running, stopped, etc.)
+            page_size: MaxResults for each DescribeInstances page
+            filters: Additional DescribeInstances filters (see instance_filters)
+            fields: Record attributes to extract (all by default)
+            
+        Returns:
+            List of instance records
+        """
+        return list(self.iter_instances(state_filter=state_filter, page_size=page_size,
+                                        filters=filters, fields=fields))
+    
+    def iter_region_instances(self, region: str, state_filter: Optional[str] = None,
+                              page_size: int = PAGE_SIZE,
+                              filters: Optional[List[Dict]] = None,
+                              account: Optional[AWSAccount] = None,
+                              fields: Optional[Tuple[str, ...]] = None) -> Iterator[List[InstanceRecord]]:
+        """
+        Page through the instances of one region
+        
+        Args:
+            region: AWS region to list
+            state_filter: Optional state filter (running, stopped, etc.)
+            page_size: MaxResults for each DescribeInstances page
+            filters: Additional DescribeInstances filters
+            account: Account to list (first account by default)
+            fields: Record attributes to extract (all by default)
+            
+        Yields:
+            One list of instance records per API page
+        """
+        account = account or self.accounts[0]
+        ec2 = self._client(region, account)
+        
+        filters = list(filters or [])
+        if state_filter:
+            filters.append({'Name': 'instance-state-name', 'Values': [state_filter]})
+        
+        paginator = ec2.get_paginator('describe_instances')
+        pages = paginator.paginate(Filters=filters, PaginationConfig={'PageSize': page_size})
+        for page in pages:
+            yield [
+                InstanceRecord.from_instance(region, instance, account.name, fields)
+                for reservation in page['Reservations']
+                for instance in reservation['Instances']
+            ]
+    
+    def region_health(self, region: str, account: Optional[AWSAccount] = None,
+                      impaired: bool = False,
+                      instance_ids: Optional[List[str]] = None) -> Dict[str, Tuple[str, str, str]]:
+        """
+        Fetch the status checks and scheduled events of every instance in one region
+        
+        One paginated DescribeInstanceStatus call with IncludeAllInstances
+        covers stopped instances too (their checks are 'not-applicable').
+        With impaired, EC2 only returns instances whose instance or system
+        check is impaired; that takes one call per check, since filters on
+        different checks are ANDed.
+        
+        Args:
+            region: AWS region to check
+            account: Account to check (first account by default)
+            impaired: Only return impaired instances
+            instance_ids: Only check these instances (one call per
+                STATUS_IDS_LIMIT of them instead of paging through the region)
+            
+        Returns:
+            Dict mapping instance ID to (instance status, system status, events)
+        """
+        ec2 = self._client(region, account)
+        paginator = ec2.get_paginator('describe_instance_status')
+        filter_sets = [[]]
+        if impaired:
+            filter_sets = [[{'Name': f'{check}.status', 'Values': ['impaired']}]
+                           for check in ('instance-status', 'system-status')]
+        
+        # EC2 does not accept a page size together with instance IDs
+        selections = [{'PaginationConfig': {'PageSize': PAGE_SIZE}}]
+        if instance_ids is not None:
+            selections = [{'InstanceIds': instance_ids[start:start + STATUS_IDS_LIMIT]}
+                          for start in range(0, len(instance_ids), STATUS_IDS_LIMIT)]
+        
+        health = {}
+        for filters in filter_sets:
+            pages = chain.from_iterable(paginator.paginate(IncludeAllInstances=True, Filters=filters, **selection)
+                                        for selection in selections)
+            for page in pages:
+                for status in page['InstanceStatuses']:
+                    # Events that are over keep being reported with a [Completed] / [Canceled] prefix
+                    events = [
+                        f"{event['Code']} ({event['NotBefore']:%Y-%m-%d})" if event.get('NotBefore') else event['Code']
+                        for event in status.get('Events', [])
+                        if not event.get('Description', '').startswith(('[Completed]', '[Canceled]'))
+                    ]
+                    health[status['InstanceId']] = (
+                        status.get('InstanceStatus', {}).get('Status', 'N/A'),
+                        status.get('SystemStatus', {}).get('Status', 'N/A'),
+                        ', '.join(events) or 'N/A'
+                    )
+        return health
+    
+    def iter_instances(self, state_filter: Optional[str] = None,
+                       page_size: int = PAGE_SIZE, filters: Optional[List[Dict]] = None,
+                       fields: Optional[Tuple[str, ...]] = None, health: bool = False,
+                       impaired: bool = False) -> Iterator[InstanceRecord]:
+        """
+        Stream instances from all regions of all accounts as their pages arrive
+        
+        Account/region pairs are listed in parallel; records are yielded in
+        arrival order (not sorted). At most a few pages are buffered at any
+        time. Cold regions are skipped (see scan_targets). Unfiltered
+        listings update the region history and, when all fields were
+        extracted, record the regions that answered in the inventory
+        history and, when every region answered, replace the inventory
+        snapshot used by --cached.
+        
+        Args:
+            state_filter: Optional state filter (running, stopped, etc.)
+            page_size: MaxResults for each DescribeInstances page
+            filters: Additional DescribeInstances filters (see instance_filters)
+            fields: Record attributes to extract (all by default)
+            health: Join status checks and scheduled events onto the records
+                (see region_health)
+            impaired: Only list instances with an impaired status check
+            
+        Yields:
+            Instance records
+        """
+        unfiltered = not state_filter and not filters and not impaired
+        
+        def list_region_instances(target: Tuple[AWSAccount, str]) -> Iterator[List[InstanceRecord]]:
+            """List instances in a specific region, page by page"""
+            account, region = target
+            statuses = self.region_health(region, account, impaired) if health or impaired else {}
+            
+            filter_sets = [filters]
+            if impaired:
+                # Only fetch the impaired instances
+                ids = sorted(statuses)
+                filter_sets = [
+                    list(filters or []) + [{'Name': 'instance-id', 'Values': ids[start:start + FILTER_VALUES_LIMIT]}]
+                    for start in range(0, len(ids), FILTER_VALUES_LIMIT)
+                ]
+            
+            count = 0
+            for region_filters in filter_sets:
+                for page in self.iter_region_instances(region, state_filter, page_size, region_filters,
+                                                       account, fields):
+                    for record in page:
+                        status = statuses.get(record.instance_id)
+                        if status:
+                            record.instance_status, record.system_status, record.events = status
+                    count += len(page)
+                    yield page
+            if unfiltered:
+                account.region_cache.record_scan(region, count)
+        
+        inventory = {}
+        failures = []
+        
+        # Pages from all regions are streamed through the fan-out engine
+        listing = self.fanout.run(list_region_instances, self.scan_targets(), stream=True)
+        with closing(listing):
+            for result in listing:
+                if not result.final:
+                    if unfiltered and not fields:
+                        inventory.setdefault(result.key, []).extend(result.value)
+                    yield from result.value
+                    continue
+                if result.error and not isinstance(result.error, (ClientError, BotoCoreError)):
+                    raise result.error
+                if result.error:
+                    failures.append((self._label(*result.key), result.error))
+                    inventory.pop(result.key, None)
+                    continue
+                inventory.setdefault(result.key, [])
+                if self.verbose:
+                    self._info(f"Listed instances in region: {self._label(*result.key)}")
+        
+        # Throttled or failed regions are not "no instances"
+        self._report_partial(failures, 'Listing')
+        
+        if unfiltered:
+            for account in self.accounts:
+                account.region_cache.save()
+                if not failures and not fields:
+                    InventoryCache(account.name).save([record for (owner, _), records in inventory.items()
+                                                       if owner is account for record in records],
+                                                      [region for owner, region in inventory if owner is account])
+            if not fields:
+                with closing(InventoryHistory()) as history:
+                    history.record({(account.name, region): records
+                                    for (account, region), records in inventory.items()})
+    
+    def resolve_instances(self, identifiers: List[str], tags: Optional[List[Tuple[str, str]]] = None,
+                          health: bool = False) -> List[InstanceRecord]:
+        """
+        Resolve many identifiers in a single pass over all regions of all accounts
+        
+        Args:
+            identifiers: Instance IDs, IP addresses, private DNS names and/or
+                Name tags; Name tags may contain the wildcards * and ?
+                (matched server-side by EC2) and [...] sets (matched here,
+                on what EC2 returns for the set turned into ?)
+            tags: (key, value) tag selectors every instance must also match
+            health: Join status checks and scheduled events onto the records,
+                fetched for the matched instances only (see region_health)
             
-            # Determine if identifier is instance ID or name
-            if identifier.startswith('i-'):
-                filters = [{'Name': 'instance-id', 'Values': [identifier]}]
+        Returns:
+            Matching instance records, one per instance (regions that could
+            not be searched are reported as partial results)
+        """
+        import re
+        
+        tag_filters = [{'Name': f'tag:{key}', 'Values': [value]} for key, value in (tags or [])]
+        char_set = re.compile(r'\[!?\]?[^\]]*\]')  # as fnmatch reads sets
+        
+        # One DescribeInstances filter set per identifier kind and chunk, and
+        # one per name pattern with a [...] set, which EC2 filters do not know
+        by_filter = {}
+        set_patterns = []
+        for identifier in identifiers:
+            kind = identifier_kind(identifier)
+            if kind == 'name' and char_set.search(identifier):
+                set_patterns.append(identifier)
             else:
-                filters = [{'Name': 'tag:Name', 'Values': [identifier]}]
-            
-            response = ec2.describe_instances(Filters=filters)
-            
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    # Get instance name from tags
-                    name = None
-                    for tag in instance.get('Tags', []):
-                        if tag['Key'] == 'Name':
-                            name = tag['Value']
-                            break
-                    
-                    return {
-                        'region': region,
-                        'instance_id': instance['InstanceId'],
-                        'state': instance['State']['Name'],
-                        'name': name,
-                        'instance_type': instance.get('InstanceType'),
-                        'private_ip': instance.get('PrivateIpAddress'),
-                        'public_ip': instance.get('PublicIpAddress'),
-                        'launch_time': instance.get('LaunchTime'),
-                        'platform': instance.get('Platform', 'Linux'),
-                        'architecture': instance.get('Architecture')
-                    }
-        except ClientError:
-            # Region might not be accessible or instance not found
-            pass
-        return None
+                by_filter.setdefault(IDENTIFIER_FILTERS[kind], []).append(identifier)
+        filter_sets = []
+        for filter_name, values in by_filter.items():
+            for start in range(0, len(values), FILTER_VALUES_LIMIT):
+                chunk = values[start:start + FILTER_VALUES_LIMIT]
+                filter_sets.append(([{'Name': filter_name, 'Values': chunk}] + tag_filters, None))
+        for pattern in set_patterns:
+            loose = char_set.sub('?', pattern)
+            filter_sets.append(([{'Name': IDENTIFIER_FILTERS['name'], 'Values': [loose]}] + tag_filters, pattern))
+        if not identifiers and tag_filters:
+            filter_sets.append((tag_filters, None))
+        
+        def resolve_region(target: Tuple[AWSAccount, str]) -> List[InstanceRecord]:
+            """Run every filter set against one region"""
+            account, region = target
+            found = {}
+            for filters, pattern in filter_sets:
+                for page in self.iter_region_instances(region, filters=filters, account=account):
+                    for record in page:
+                        if pattern is None or fnmatch.fnmatchcase(record.name, pattern):
+                            found[record.instance_id] = record
+            if health and found:
+                statuses = self.region_health(region, account, instance_ids=sorted(found))
+                for instance_id, status in statuses.items():
+                    if instance_id in found:
+                        record = found[instance_id]
+                        record.instance_status, record.system_status, record.events = status
+            return list(found.values())
+        
+        targets = self._lookup_order()
+        self._info(f"Resolving {len(identifiers) or 'tagged'} instance selector(s) in {len(targets)} regions")
+        
+        instances = []
+        failures = []
+        for result in self.fanout.run(resolve_region, targets):
+            if isinstance(result.error, (ClientError, BotoCoreError)):
+                failures.append((self._label(*result.key), result.error))
+                continue
+            if result.error:
+                raise result.error
+            instances.extend(result.value)
+        self._report_partial(failures, 'Instance resolution')
+        
+        instances.sort(key=lambda x: (x.account, x.region, x.instance_id))
+        return instances
     
-    def find_instance(self, identifier: str) -> Optional[Dict]:
+    def bulk_action(self, action: str, instances: List[InstanceRecord],
+                    force: bool = False, dry_run: bool = False) -> List[ActionResult]:
         """
-        Find instance across all regions
+        Start, stop or reboot many instances with one API call per region batch
+        
+        Instances in the wrong state are skipped, using the same rules as
+        the single-instance methods. Regions are processed concurrently,
+        with at most region_concurrency batches in flight per region.
         
         Args:
-            identifier: Instance ID or name tag
+            action: 'start', 'stop' or 'reboot'
+            instances: Instance records to act on
+            force: Force stop (stop action only)
+            dry_run: Perform a dry run without making changes
             
         Returns:
-            Instance information dict or None
+            One ActionResult per instance
         """
-        self._info(f"Searching for instance: {identifier}")
+        allowed = {
+            'start': ('stopped',),
+            'stop': ('running', 'stopping') if force else ('running',),
+            'reboot': ('running',)
+        }[action]
         
-        # Use ThreadPoolExecutor for parallel region search
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {
-                executor.submit(self._search_region, region, identifier): region
-                for region in self.regions
-            }
+        results = []
+        by_region = {}
+        for record in instances:
+            if record.state in allowed:
+                by_region.setdefault((record.account, record.region), []).append(record)
+            else:
+                results.append(ActionResult(record.region, record.instance_id, record.name, 'skipped',
+                                            f"state is {record.state}", record.account))
+        
+        batches = [
+            (target, records[start:start + ACTION_BATCH_SIZE])
+            for target, records in by_region.items()
+            for start in range(0, len(records), ACTION_BATCH_SIZE)
+        ]
+        for result in self.fanout.run(
+                lambda index: self._run_action_batch(action, batches[index][0][1], batches[index][1],
+                                                     force, dry_run, self._account(batches[index][0][0])),
+                range(len(batches)),
+                group_of=lambda index: batches[index][0],
+                group_limit=self.region_concurrency):
+            if result.error:
+                # Unexpected errors (e.g. timeouts) fail the whole batch
+                results.extend(ActionResult(r.region, r.instance_id, r.name, 'failed', str(result.error), r.account)
+                               for r in batches[result.key][1])
+            else:
+                results.extend(result.value)
+        
+        results.sort(key=lambda x: (x.account, x.region, x.instance_id))
+        return results
+    
+    def _run_action_batch(self, action: str, region: str, batch: List[InstanceRecord],
+                          force: bool = False, dry_run: bool = False,
+                          account: Optional[AWSAccount] = None) -> List[ActionResult]:
+        """
+        Send one Start/Stop/RebootInstances call for a batch in one region
+        
+        A batch-level error (for example one instance changing state in the
+        meantime) fails the whole call, so the batch is then retried one
+        instance at a time to attribute the error to the right instance.
+        """
+        account = account or self.accounts[0]
+        ec2 = self._client(region, account)
+        ids = [record.instance_id for record in batch]
+        if self.verbose:
+            self._info(f"{action.capitalize()} {len(ids)} instance(s) in {self._label(account, region)}")
+        
+        try:
+            if action == 'start':
+                response = ec2.start_instances(InstanceIds=ids, DryRun=dry_run)
+                changes = response.get('StartingInstances', [])
+            elif action == 'stop':
+                response = ec2.stop_instances(InstanceIds=ids, Force=force, DryRun=dry_run)
+                changes = response.get('StoppingInstances', [])
+            else:
+                ec2.reboot_instances(InstanceIds=ids, DryRun=dry_run)
+                changes = []
+        except ClientError as e:
+            if 'DryRunOperation' in str(e):
+                return [ActionResult(r.region, r.instance_id, r.name, 'ok', 'dry run successful', r.account)
+                        for r in batch]
+            if len(batch) > 1:
+                results = []
+                for record in batch:
+                    results.extend(self._run_action_batch(action, region, [record], force, dry_run, account))
+                return results
+            return [ActionResult(r.region, r.instance_id, r.name, 'failed', str(e), r.account) for r in batch]
+        
+        states = {change['InstanceId']: change['CurrentState']['Name'] for change in changes}
+        return [
+            ActionResult(r.region, r.instance_id, r.name, 'ok',
+                         f"{r.state} -> {states.get(r.instance_id, 'rebooting')}", r.account)
+            for r in batch
+        ]
+    
+    def wait_for_instances(self, instances: List, target_state: str, status_ok: bool = False,
+                           instance_type: Optional[str] = None, require_change: bool = False,
+                           timeout: int = WAIT_TIMEOUT) -> Dict[str, str]:
+        """
+        Poll many instances until they reach a target state
+        
+        Each round sends one batched DescribeInstances (or, with status_ok,
+        DescribeInstanceStatus) call per account/region covering every
+        instance still pending there; regions are polled concurrently. The
+        poll interval backs off while nothing changes and resets when
+        instances settle.
+        
+        Args:
+            instances: Objects with account, region, instance_id and name attributes
+            target_state: State to wait for (running, stopped, ...)
+            status_ok: Also wait for instance and system status checks to pass
+            instance_type: Also wait for the instance to report this type
+            require_change: The instances start out in the target condition
+                (reboot): first wait for each to leave it, or for
+                REBOOT_SETTLE_TIME to pass
+            timeout: Overall time limit in seconds
+            
+        Returns:
+            Dict mapping instance ID to outcome: 'ok', 'timeout' or 'failed: <reason>'
+        """
+        outcomes = {}
+        pending = {}
+        names = {}
+        for instance in instances:
+            pending.setdefault((instance.account, instance.region), set()).add(instance.instance_id)
+            names[instance.instance_id] = instance.name
+        total = len(names)
+        
+        condition = target_state + (', status ok' if status_ok else '')
+        condition += f', type {instance_type}' if instance_type else ''
+        self._info(f"Waiting for {total} instance(s) to reach: {condition}")
+        
+        started = time.monotonic()
+        deadline = started + timeout
+        interval = WAIT_MIN_INTERVAL
+        left = set()
+        while pending:
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            
+            observed = {}
+            for result in self.fanout.run(
+                    lambda target: self._poll_region(target[1], sorted(pending[target]), status_ok,
+                                                     self._account(target[0])),
+                    list(pending)):
+                if result.error is None:
+                    observed.update(result.value)
+            
+            settled = 0
+            for target in list(pending):
+                for instance_id in list(pending[target]):
+                    current = observed.get(instance_id)
+                    if current is None:
+                        continue  # transient error, poll again
+                    outcome = None
+                    reached = current['state'] == target_state \
+                        and (not status_ok or current['status'] == 'ok') \
+                        and (not instance_type or current['instance_type'] == instance_type)
+                    if require_change and not reached:
+                        left.add(instance_id)
+                    if reached and (not require_change or instance_id in left
+                                    or time.monotonic() - started >= REBOOT_SETTLE_TIME):
+                        outcome = 'ok'
+                    elif current['state'] in ('shutting-down', 'terminated') and target_state != 'terminated':
+                        outcome = f"failed: instance is {current['state']}"
+                    elif current['state'] == 'not-found':
+                        outcome = 'failed: instance not found'
+                    if outcome is None:
+                        continue
+                    
+                    outcomes[instance_id] = outcome
+                    pending[target].discard(instance_id)
+                    settled += 1
+                    label = f"{instance_id} ({names[instance_id]})"
+                    if outcome == 'ok':
+                        self._success(f"{label} reached {target_state} [{len(outcomes)}/{total}]")
+                    else:
+                        self._error(f"{label} {outcome} [{len(outcomes)}/{total}]")
+                if not pending[target]:
+                    del pending[target]
             
-            for future in as_completed(futures):
-                region = futures[future]
-                if self.verbose:
-                    self._info(f"Checking region: {region}")
-                
-                result = future.result()
-                if result:
-                    return result
+            if pending and time.monotonic() >= deadline:
+                for ids in pending.values():
+                    for instance_id in ids:
+                        outcomes[instance_id] = 'timeout'
+                        self._warning(f"{instance_id} ({names[instance_id]}) timed out")
+                break
+            
+            # Poll quickly while instances are settling, back off while nothing changes
+            interval = WAIT_MIN_INTERVAL if settled else min(interval * WAIT_BACKOFF, WAIT_MAX_INTERVAL)
+            if self.verbose and pending:
+                waiting = sum(len(ids) for ids in pending.values())
+                self._info(f"{waiting} instance(s) still pending, next poll in {interval:.0f}s")
         
-        return None
+        return outcomes
     
-    def list_instances(self, state_filter: Optional[str] = None) -> List[Dict]:
+    def _poll_region(self, region: str, instance_ids: List[str], status_ok: bool = False,
+                     account: Optional[AWSAccount] = None) -> Dict[str, Dict]:
         """
-        List all instances across all regions
+        Fetch the current state of many instances in one region
         
-        Args:
-            state_filter: Optional state filter (running, stopped, etc.)
-            
         Returns:
-            List of instance information dicts
+            Dict mapping instance ID to {'state', 'instance_type', 'status'};
+            instances that no longer exist get state 'not-found'. Instances
+            are left out entirely if the call failed.
         """
-        instances = []
-        
-        def list_region_instances(region: str) -> List[Dict]:
-            """List instances in a specific region"""
-            region_instances = []
+        observed = {}
+        ec2 = self._client(region, account)
+        for start in range(0, len(instance_ids), POLL_BATCH_SIZE):
+            chunk = instance_ids[start:start + POLL_BATCH_SIZE]
             try:
-                ec2 = self.session.client('ec2', region_name=region)
-                
-                filters = []
-                if state_filter:
-                    filters.append({'Name': 'instance-state-name', 'Values': [state_filter]})
-                
-                response = ec2.describe_instances(Filters=filters)
-                
-                for reservation in response['Reservations']:
-                    for instance in reservation['Instances']:
-                        # Get instance name from tags
-                        name = None
-                        for tag in instance.get('Tags', []):
-                            if tag['Key'] == 'Name':
-                                name = tag['Value']
-                                break
-                        
-                        region_instances.append({
-                            'region': region,
-                            'instance_id': instance['InstanceId'],
-                            'state': instance['State']['Name'],
-                            'name': name or 'N/A',
-                            'instance_type': instance.get('InstanceType', 'N/A'),
-                            'private_ip': instance.get('PrivateIpAddress', 'N/A'),
-                            'public_ip': instance.get('PublicIpAddress', 'N/A')
-                        })
-            except ClientError:
-                pass
-            return region_instances
-        
-        # Use ThreadPoolExecutor for parallel region listing
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {
-                executor.submit(list_region_instances, region): region
-                for region in self.regions
-            }
-            
-            for future in as_completed(futures):
-                region = futures[future]
+                if status_ok:
+                    response = ec2.describe_instance_status(InstanceIds=chunk, IncludeAllInstances=True)
+                    for status in response['InstanceStatuses']:
+                        checks = (status.get('InstanceStatus', {}).get('Status'),
+                                  status.get('SystemStatus', {}).get('Status'))
+                        observed[status['InstanceId']] = {
+                            'state': status['InstanceState']['Name'],
+                            'instance_type': None,
+                            'status': 'ok' if checks == ('ok', 'ok') else checks[0]
+                        }
+                else:
+                    response = ec2.describe_instances(InstanceIds=chunk)
+                    for reservation in response['Reservations']:
+                        for instance in reservation['Instances']:
+                            observed[instance['InstanceId']] = {
+                                'state': instance['State']['Name'],
+                                'instance_type': instance.get('InstanceType'),
+                                'status': None
+                            }
+            except ClientError as e:
+                if 'InvalidInstanceID' in str(e) and len(chunk) == 1:
+                    observed[chunk[0]] = {'state': 'not-found', 'instance_type': None, 'status': None}
+                elif 'InvalidInstanceID' in str(e):
+                    # Find out which instance is gone by polling them one at a time
+                    for instance_id in chunk:
+                        observed.update(self._poll_region(region, [instance_id], status_ok, account))
+                elif self.verbose:
+                    self._warning(f"Polling {region} failed: {e}")
+            except BotoCoreError as e:
                 if self.verbose:
-                    self._info(f"Listing instances in region: {region}")
-                
-                region_instances = future.result()
-                instances.extend(region_instances)
-        
-        return instances
+                    self._warning(f"Polling {region} failed: {e}")
+        return observed
     
     def start_instance(self, instance_info: Dict, dry_run: bool = False) -> bool:
         """Start a stopped instance"""
         instance_id = instance_info['instance_id']
         region = instance_info['region']
         state = instance_info['state']
+        account = self._account(instance_info.get('account'))
         
         if state != 'stopped':
             self._warning(f"Instance is not in stopped state (current: {state})")
             return False
         
         try:
-            ec2 = self.session.client('ec2', region_name=region)
+            ec2 = self._client(region, account)
             self._info(f"Starting instance {instance_id}...")
             ec2.start_instances(InstanceIds=[instance_id], DryRun=dry_run)
             if not dry_run:
@@ -281,6 +2613,7 @@ class EC2Controller:
         instance_id = instance_info['instance_id']
         region = instance_info['region']
         state = instance_info['state']
+        account = self._account(instance_info.get('account'))
         
         if not force and state != 'running':
             self._warning(f"Instance is not in running state (current: {state})")
@@ -291,7 +2624,7 @@ class EC2Controller:
             return False
         
         try:
-            ec2 = self.session.client('ec2', region_name=region)
+            ec2 = self._client(region, account)
             action = "Force stopping" if force else "Stopping"
             self._info(f"{action} instance {instance_id}...")
             ec2.stop_instances(InstanceIds=[instance_id], Force=force, DryRun=dry_run)
@@ -310,13 +2643,14 @@ class EC2Controller:
         instance_id = instance_info['instance_id']
         region = instance_info['region']
         state = instance_info['state']
+        account = self._account(instance_info.get('account'))
         
         if state != 'running':
             self._warning(f"Instance must be running to reboot (current: {state})")
             return False
         
         try:
-            ec2 = self.session.client('ec2', region_name=region)
+            ec2 = self._client(region, account)
             self._info(f"Rebooting instance {instance_id}...")
             ec2.reboot_instances(InstanceIds=[instance_id], DryRun=dry_run)
             if not dry_run:
@@ -329,113 +2663,1119 @@ class EC2Controller:
             self._error(f"Failed to reboot instance: {e}")
             return False
     
-    def get_instance_status(self, instance_info: Dict) -> Dict:
-        """Get detailed instance status"""
-        instance_id = instance_info['instance_id']
-        region = instance_info['region']
+    def get_instance_status(self, instance_info: Dict) -> Dict:
+        """Get detailed instance status"""
+        instance_id = instance_info['instance_id']
+        region = instance_info['region']
+        account = self._account(instance_info.get('account'))
+        
+        try:
+            ec2 = self._client(region, account)
+            
+            # Get instance status checks
+            status_response = ec2.describe_instance_status(InstanceIds=[instance_id])
+            
+            status_info = {}
+            if status_response['InstanceStatuses']:
+                status = status_response['InstanceStatuses'][0]
+                status_info['instance_status'] = status.get('InstanceStatus', {}).get('Status', 'N/A')
+                status_info['system_status'] = status.get('SystemStatus', {}).get('Status', 'N/A')
+            else:
+                status_info['instance_status'] = 'N/A'
+                status_info['system_status'] = 'N/A'
+            
+            return {**instance_info, **status_info}
+        except ClientError as e:
+            self._error(f"Failed to get instance status: {e}")
+            return instance_info
+    
+    def change_instance_type(self, instance_info: Dict, new_type: str, dry_run: bool = False) -> bool:
+        """Change instance type (instance must be stopped)"""
+        instance_id = instance_info['instance_id']
+        region = instance_info['region']
+        state = instance_info['state']
+        current_type = instance_info.get('instance_type', 'Unknown')
+        account = self._account(instance_info.get('account'))
+        
+        if state != 'stopped':
+            self._error(f"Instance must be stopped to change type (current state: {state})")
+            self._warning("Stop the instance first with: stop command")
+            return False
+        
+        if current_type == new_type:
+            self._warning(f"Instance is already of type {new_type}")
+            return True
+        
+        try:
+            ec2 = self._client(region, account)
+            self._info(f"Changing instance type from {current_type} to {new_type}...")
+            
+            ec2.modify_instance_attribute(
+                InstanceId=instance_id,
+                InstanceType={'Value': new_type},
+                DryRun=dry_run
+            )
+            
+            if not dry_run:
+                self._success(f"Instance type changed successfully from {current_type} to {new_type}")
+                self._info("You can now start the instance with the new type")
+            return True
+        except ClientError as e:
+            if 'DryRunOperation' in str(e):
+                self._success(f"Dry run successful - instance type would be changed from {current_type} to {new_type}")
+                return True
+            elif 'InvalidInstanceType' in str(e):
+                self._error(f"Invalid instance type: {new_type}")
+                self._warning("Please check AWS documentation for valid instance types")
+                return False
+            elif 'InsufficientInstanceCapacity' in str(e):
+                self._error(f"Insufficient capacity for instance type {new_type} in this region")
+                self._warning("Try a different instance type or wait and retry")
+                return False
+            else:
+                self._error(f"Failed to change instance type: {e}")
+                return False
+    
+    def get_available_instance_types(self, region: str, account: Optional[AWSAccount] = None) -> List[str]:
+        """
+        Get list of available instance types in a region
+        
+        Offerings are paginated and cached on disk for TYPE_CACHE_TTL. If
+        the API fails, an expired cache entry is used before falling back to
+        a list of common types.
+        """
+        account = account or self.accounts[0]
+        cached = account.type_cache.get_offerings(region)
+        if cached is not None:
+            return cached
+        
+        try:
+            ec2 = self._client(region, account)
+            # Get instance type offerings
+            paginator = ec2.get_paginator('describe_instance_type_offerings')
+            pages = paginator.paginate(
+                LocationType='region',
+                Filters=[
+                    {'Name': 'location', 'Values': [region]}
+                ],
+                PaginationConfig={'PageSize': PAGE_SIZE}
+            )
+            types = sorted({offering['InstanceType'] for page in pages for offering in page['InstanceTypeOfferings']})
+            account.type_cache.put_offerings(region, types)
+            account.type_cache.save()
+            return types
+        except (ClientError, BotoCoreError):
+            stale = account.type_cache.get_offerings(region, allow_stale=True)
+            if stale is not None:
+                return stale
+            # Fallback to common instance types
+            return [
+                't3.nano', 't3.micro', 't3.small', 't3.medium', 't3.large', 't3.xlarge', 't3.2xlarge',
+                't3a.nano', 't3a.micro', 't3a.small', 't3a.medium', 't3a.large', 't3a.xlarge', 't3a.2xlarge',
+                'c5.large', 'c5.xlarge', 'c5.2xlarge', 'c5.4xlarge', 'c5.9xlarge',
+                'c6i.large', 'c6i.xlarge', 'c6i.2xlarge', 'c6i.4xlarge', 'c6i.8xlarge',
+                'm5.large', 'm5.xlarge', 'm5.2xlarge', 'm5.4xlarge', 'm5.8xlarge',
+                'r5.large', 'r5.xlarge', 'r5.2xlarge', 'r5.4xlarge'
+            ]
+    
+    def describe_instance_types(self, region: str, account: AWSAccount,
+                                types: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Describe the instance types offered in a region (all, or only `types`)
+        
+        Returns:
+            Instance type -> {'vcpus', 'memory_mib', 'network', 'architectures'}
+        """
+        ec2 = self._client(region, account)
+        paginator = ec2.get_paginator('describe_instance_types')
+        fetched = {}
+        # At most 100 types can be named in one request
+        batches = [types[start:start + 100] for start in range(0, len(types), 100)] if types else [None]
+        for batch in batches:
+            params = {'InstanceTypes': batch} if batch else {'PaginationConfig': {'PageSize': 100}}
+            for page in paginator.paginate(**params):
+                for info in page['InstanceTypes']:
+                    fetched[info['InstanceType']] = {
+                        'vcpus': info.get('VCpuInfo', {}).get('DefaultVCpus', 0),
+                        'memory_mib': info.get('MemoryInfo', {}).get('SizeInMiB', 0),
+                        'network': info.get('NetworkInfo', {}).get('NetworkPerformance', 'N/A'),
+                        'architectures': info.get('ProcessorInfo', {}).get('SupportedArchitectures', [])
+                    }
+        return fetched
+    
+    def get_instance_type_specs(self, offered: Dict[str, List[str]],
+                                account: Optional[AWSAccount] = None) -> Dict[str, Dict]:
+        """
+        Get the spec index for the instance types offered in some regions
+        
+        The index is built from a paginated DescribeInstanceTypes in the
+        first region and cached on disk for TYPE_CACHE_TTL. DescribeInstanceTypes
+        only knows the types offered where it is called, so types the index
+        lacks are then described in a region that offers them; types that
+        turn out to have no spec are cached as such too.
+        
+        Args:
+            offered: Region -> instance types offered there
+            account: Account whose credentials and cache to use (first account by default)
+            
+        Returns:
+            Instance type -> {'vcpus', 'memory_mib', 'network', 'architectures'}
+        """
+        account = account or self.accounts[0]
+        cache = account.type_cache
+        changed = False
+        
+        if cache.get_specs() is None and offered:
+            region = next(iter(offered))
+            try:
+                cache.put_specs(self.describe_instance_types(region, account), rebuilt=True)
+                changed = True
+            except (ClientError, BotoCoreError) as e:
+                self._warning(f"Failed to get instance type specs in {region}: {e}")
+        
+        specs = cache.get_specs(allow_stale=True) or {}
+        missing = {t for types in offered.values() for t in types if t not in specs and not cache.lacks_spec(t)}
+        for region, types in offered.items():
+            batch = sorted(missing.intersection(types))
+            if not batch:
+                continue
+            try:
+                fetched = self.describe_instance_types(region, account, batch)
+            except (ClientError, BotoCoreError) as e:
+                # Another region offering these types may still answer
+                self._warning(f"Failed to get instance type specs in {region}: {e}")
+                continue
+            cache.put_specs(fetched, missing=[t for t in batch if t not in fetched])
+            missing.difference_update(batch)
+            changed = True
+        
+        if changed:
+            cache.save()
+        return cache.get_specs(allow_stale=True) or {}
+    
+    def find_instance_types(self, regions: List[str], patterns: Optional[List[str]] = None,
+                            min_vcpus: int = 0, min_memory_gib: float = 0,
+                            architecture: Optional[str] = None) -> List[Dict]:
+        """
+        Query the instance types offered in some regions by spec
+        
+        Args:
+            regions: Regions whose offerings to search (first account)
+            patterns: Instance type globs, e.g. "c6*"
+            min_vcpus: Minimum default vCPU count
+            min_memory_gib: Minimum memory in GiB
+            architecture: Required architecture (x86_64, arm64, ...)
+            
+        Returns:
+            One dict per matching type: its spec plus 'type' and 'regions',
+            ordered by vCPUs, memory and name
+        """
+        offered = {}
+        for result in self.fanout.run(self.get_available_instance_types, regions):
+            for instance_type in result.value or []:
+                offered.setdefault(instance_type, []).append(result.key)
+        specs = self.get_instance_type_specs({region: [t for t, where in offered.items() if region in where]
+                                              for region in regions})
+        
+        matches = []
+        for instance_type, where in offered.items():
+            spec = specs.get(instance_type)
+            if spec is None:
+                continue
+            if patterns and not any(fnmatch.fnmatchcase(instance_type, p) for p in patterns):
+                continue
+            if spec['vcpus'] < min_vcpus or spec['memory_mib'] < min_memory_gib * 1024:
+                continue
+            if architecture and architecture not in spec['architectures']:
+                continue
+            matches.append({'type': instance_type, 'regions': sorted(where), **spec})
+        
+        matches.sort(key=lambda x: (x['vcpus'], x['memory_mib'], x['type']))
+        return matches
+
+
+class ResizePipeline:
+    """
+    Resize many instances: stop, wait, modify, start, wait, per instance
+    
+    Instances move through the pipeline independently, at most
+    `concurrency` at a time overall and `region_concurrency` per
+    account/region. If starting (or modifying) fails for lack of capacity
+    or support, the next fallback type is tried; once every candidate has
+    failed, the original type is restored and the instance is started again
+    if it was running. Every step is recorded in a state file, so an
+    interrupted run can be resumed where each instance left off.
+    """
+    
+    # Errors that make the pipeline move on to the next candidate type
+    FALLBACK_ERRORS = ('InsufficientInstanceCapacity', 'Unsupported', 'InvalidInstanceType',
+                       'InsufficientCapacity')
+    
+    def __init__(self, controller: EC2Controller, state_path: str = RESIZE_STATE_PATH,
+                 wait_timeout: int = WAIT_TIMEOUT):
+        """
+        Initialize resize pipeline
+        
+        Args:
+            controller: Controller used for the API calls
+            state_path: JSON file recording the progress of every instance
+            wait_timeout: Time limit in seconds for each stop/start to complete
+        """
+        self.controller = controller
+        self.state_path = state_path
+        self.wait_timeout = wait_timeout
+        self.state = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+    
+    def plan(self, instances: List[InstanceRecord], instance_type: str,
+             fallback_types: Optional[List[str]] = None) -> List[ActionResult]:
+        """
+        Validate the target types against each region's offerings and queue the instances
+        
+        Types not offered in an instance's region are dropped from its
+        candidates; instances left without candidates, already of the target
+        type, or not running/stopped are not queued.
+        
+        Returns:
+            ActionResult for every instance that is not queued
+        """
+        candidates = list(dict.fromkeys([instance_type] + list(fallback_types or [])))
+        targets = sorted({(record.account, record.region) for record in instances})
+        offered = {}
+        for result in self.controller.fanout.run(
+                lambda target: set(self.controller.get_available_instance_types(
+                    target[1], self.controller._account(target[0]))), targets):
+            offered[result.key] = result.value or set()
+        
+        rejected = []
+        self.state = {}
+        for record in instances:
+            usable = [t for t in candidates if t in offered[(record.account, record.region)]]
+            outcome = None
+            if record.instance_type == instance_type:
+                outcome = ('skipped', f"already {instance_type}")
+            elif record.state not in ('running', 'stopped'):
+                outcome = ('skipped', f"state is {record.state}")
+            elif not usable:
+                outcome = ('failed', f"{', '.join(candidates)} not offered in {record.region}")
+            if outcome:
+                rejected.append(ActionResult(record.region, record.instance_id, record.name, *outcome,
+                                             record.account))
+                continue
+            if usable != candidates:
+                self.controller._warning(f"{record.instance_id}: not offered in {record.region}: "
+                                         f"{', '.join(t for t in candidates if t not in usable)}")
+            self.state[record.instance_id] = {
+                'account': record.account,
+                'region': record.region,
+                'name': record.name,
+                'original_type': record.instance_type,
+                'original_state': record.state,
+                'candidates': usable,
+                'attempt': 0,
+                'modified': False,
+                'step': 'stop' if record.state == 'running' else 'modify',
+                'detail': ''
+            }
+        return rejected
+    
+    def load(self) -> bool:
+        """Load the state of an interrupted run, returning False if there is nothing to resume"""
+        data = load_json_file(self.state_path, {})
+        instances = data.get('instances') if isinstance(data, dict) else None
+        if not isinstance(instances, dict):
+            return False
+        # The instance may have been stopped or started by hand in the meantime;
+        # issuing the stop/start again is harmless and avoids waiting forever
+        for entry in instances.values():
+            entry['step'] = {'wait-stopped': 'stop', 'wait-running': 'start'}.get(entry.get('step'), entry.get('step'))
+        self.state = instances
+        return any(entry.get('step') not in ('done', 'failed') for entry in instances.values())
+    
+    def save(self):
+        """Write the progress of every instance to the state file"""
+        with self.lock:
+            save_json_file(self.state_path, {'updated_at': time.time(), 'instances': self.state})
+    
+    def run(self) -> List[ActionResult]:
+        """
+        Run every unfinished instance through the pipeline
+        
+        Returns:
+            One ActionResult per instance in the state
+        """
+        pending = [instance_id for instance_id, entry in self.state.items()
+                   if entry['step'] not in ('done', 'failed')]
+        self.save()
+        self.controller._info(f"Resizing {len(pending)} instance(s)")
+        resizing = self.controller.fanout.run(
+            self.resize_instance, pending,
+            group_of=lambda instance_id: (self.state[instance_id]['account'], self.state[instance_id]['region']),
+            group_limit=self.controller.region_concurrency)
+        try:
+            with closing(resizing):
+                for result in resizing:
+                    if result.error:
+                        self._advance(result.key, 'failed', str(result.error))
+        finally:
+            # On interruption, instances stop at their next step; the state file tells where
+            self.stopping.set()
+        
+        return sorted((
+            ActionResult(entry['region'], instance_id, entry['name'],
+                         'ok' if entry['step'] == 'done' else 'failed', entry['detail'], entry['account'])
+            for instance_id, entry in self.state.items()
+        ), key=lambda x: (x.account, x.region, x.instance_id))
+    
+    def _advance(self, instance_id: str, step: str, detail: str = ''):
+        """Move an instance to its next step and record it"""
+        entry = self.state[instance_id]
+        with self.lock:
+            entry['step'] = step
+            entry['detail'] = detail
+        self.save()
+        label = f"{instance_id} ({entry['name']})"
+        if step == 'done':
+            self.controller._success(f"{label}: {detail}")
+        elif step == 'failed':
+            self.controller._error(f"{label}: {detail}")
+        elif self.controller.verbose:
+            self.controller._info(f"{label}: {step}")
+    
+    def _wait_state(self, instance_id: str, target_state: str) -> Optional[str]:
+        """Poll one instance until it reaches a state; returns an error message on failure"""
+        entry = self.state[instance_id]
+        account = self.controller._account(entry['account'])
+        deadline = time.monotonic() + self.wait_timeout
+        interval = WAIT_MIN_INTERVAL
+        while time.monotonic() < deadline:
+            observed = self.controller._poll_region(entry['region'], [instance_id], account=account)
+            state = observed.get(instance_id, {}).get('state')
+            if state == target_state:
+                return None
+            if state in ('shutting-down', 'terminated', 'not-found'):
+                return f"instance is {state}"
+            if self.stopping.wait(min(interval, max(deadline - time.monotonic(), 0))):
+                raise FanOutCancelled()
+            interval = min(interval * WAIT_BACKOFF, WAIT_MAX_INTERVAL)
+        return f"timed out waiting for {target_state}"
+    
+    def resize_instance(self, instance_id: str):
+        """Drive one instance through the pipeline from its recorded step (runs in a worker)"""
+        entry = self.state[instance_id]
+        account = self.controller._account(entry['account'])
+        ec2 = self.controller._client(entry['region'], account)
+        was_running = entry['original_state'] == 'running'
+        
+        while entry['step'] not in ('done', 'failed'):
+            if self.stopping.is_set():
+                raise FanOutCancelled()
+            step = entry['step']
+            try:
+                if step == 'stop':
+                    ec2.stop_instances(InstanceIds=[instance_id])
+                    self._advance(instance_id, 'wait-stopped')
+                
+                elif step == 'wait-stopped':
+                    error = self._wait_state(instance_id, 'stopped')
+                    if error:
+                        self._advance(instance_id, 'failed', f"stopping: {error}")
+                    else:
+                        self._advance(instance_id, 'modify')
+                
+                elif step == 'modify':
+                    new_type = entry['candidates'][entry['attempt']]
+                    ec2.modify_instance_attribute(InstanceId=instance_id, InstanceType={'Value': new_type})
+                    with self.lock:
+                        entry['modified'] = True
+                    self._advance(instance_id, 'start' if was_running else 'done',
+                                  '' if was_running else f"{entry['original_type']} -> {new_type}")
+                
+                elif step == 'start':
+                    ec2.start_instances(InstanceIds=[instance_id])
+                    self._advance(instance_id, 'wait-running')
+                
+                elif step == 'wait-running':
+                    error = self._wait_state(instance_id, 'running')
+                    new_type = entry['candidates'][entry['attempt']]
+                    if error:
+                        self._advance(instance_id, 'failed', f"starting as {new_type}: {error}")
+                    else:
+                        self._advance(instance_id, 'done', f"{entry['original_type']} -> {new_type}")
+                
+                elif step == 'restore':
+                    # State files of older runs do not record whether the type was changed
+                    if entry.get('modified', True):
+                        ec2.modify_instance_attribute(InstanceId=instance_id,
+                                                      InstanceType={'Value': entry['original_type']})
+                    if was_running:
+                        ec2.start_instances(InstanceIds=[instance_id])
+                    self._advance(instance_id, 'failed', f"{entry['detail']}; "
+                                  f"{'restored' if entry.get('modified', True) else 'kept'} {entry['original_type']}")
+                
+                else:
+                    self._advance(instance_id, 'failed', f"unknown step {step}")
+            
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code', '')
+                if step in ('modify', 'start') and code.startswith(self.FALLBACK_ERRORS):
+                    tried = entry['candidates'][entry['attempt']]
+                    with self.lock:
+                        entry['attempt'] += 1
+                    if entry['attempt'] < len(entry['candidates']):
+                        self.controller._warning(f"{instance_id}: {tried} failed ({code}), "
+                                                 f"trying {entry['candidates'][entry['attempt']]}")
+                        self._advance(instance_id, 'modify')
+                    else:
+                        self._advance(instance_id, 'restore', f"no capacity for {', '.join(entry['candidates'])}")
+                elif step == 'restore':
+                    self._advance(instance_id, 'failed', f"{entry['detail']}; restoring failed: {e}")
+                elif step in ('modify', 'start'):
+                    self._advance(instance_id, 'restore', str(e))
+                else:
+                    self._advance(instance_id, 'failed', str(e))
+
+
+class InventoryDaemon:
+    """
+    Resident inventory of every account/region, served over a Unix socket
+    
+    The inventory is refreshed in the background: every region each
+    DAEMON_REFRESH_INTERVAL, and regions whose instances changed recently
+    every DAEMON_FAST_REFRESH_INTERVAL. Requests are one JSON line each way:
+    {"command": "list"|"find"|"status", "instances": [...], "state": ..., "regions": [...]}
+    is answered with {"ok": true, "refreshed_at": ..., "instances": [...]},
+    where each instance is the InstanceRecord values in slot order, or
+    {"ok": false} when a find/status identifier is unknown or some region
+    has not been listed yet.
+    {"command": "metrics"} returns the API call statistics of the refreshes
+    as {"ok": true, "metrics": [...]} (see ApiMetrics.summary).
+    """
+    
+    def __init__(self, controller: EC2Controller, socket_path: str,
+                 refresh_interval: int = DAEMON_REFRESH_INTERVAL,
+                 fast_refresh_interval: int = DAEMON_FAST_REFRESH_INTERVAL):
+        """
+        Initialize daemon
+        
+        Args:
+            controller: Controller whose accounts and regions are inventoried
+            socket_path: Unix socket to serve requests on
+            refresh_interval: Seconds between refreshes of every region
+            fast_refresh_interval: Seconds between refreshes of recently changed regions
+        """
+        self.controller = controller
+        self.socket_path = socket_path
+        self.refresh_interval = refresh_interval
+        self.fast_refresh_interval = fast_refresh_interval
+        self.targets = [(account, region) for account in controller.accounts for region in account.regions]
+        self.inventory = {}
+        self.index = InventoryIndex([])
+        self.signatures = {}
+        self.refreshed_at = {}
+        self.changed_at = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+    
+    def refresh(self, targets: List[Tuple[AWSAccount, str]]):
+        """List the given account/region pairs and update the inventory"""
+        def list_region(target: Tuple[AWSAccount, str]) -> List[InstanceRecord]:
+            """List every instance of one region"""
+            account, region = target
+            return [record for page in self.controller.iter_region_instances(region, account=account)
+                    for record in page]
+        
+        listed = {}
+        for result in self.controller.fanout.run(list_region, targets):
+            now = time.monotonic()
+            if result.error:
+                self.controller._warning(f"Refreshing {self.controller._label(*result.key)} failed: {result.error}")
+                continue
+            signature = sorted(tuple(record.as_row()) for record in result.value)
+            with self.lock:
+                if self.signatures.get(result.key, signature) != signature:
+                    self.changed_at[result.key] = now
+                    if self.controller.verbose:
+                        self.controller._info(f"Instances changed in {self.controller._label(*result.key)}")
+                self.signatures[result.key] = signature
+                self.inventory[result.key] = result.value
+                self.refreshed_at[result.key] = now
+            listed[result.key[0].name, result.key[1]] = result.value
+        self.index = InventoryIndex(self.records())
+        
+        with closing(InventoryHistory()) as history:
+            history.record(listed)
+        
+        # Keep the --cached snapshot fresh as well
+        if len(self.inventory) == len(self.targets):
+            for account in self.controller.accounts:
+                InventoryCache(account.name).save(self.records(account),
+                                                  [region for owner, region in self.targets if owner is account])
+    
+    def due_targets(self) -> List[Tuple[AWSAccount, str]]:
+        """Account/region pairs whose refresh interval has passed"""
+        now = time.monotonic()
+        due = []
+        for target in self.targets:
+            hot = now - self.changed_at.get(target, float('-inf')) < DAEMON_HOT_WINDOW
+            interval = self.fast_refresh_interval if hot else self.refresh_interval
+            if now - self.refreshed_at.get(target, float('-inf')) >= interval:
+                due.append(target)
+        return due
+    
+    def refresh_loop(self):
+        """Background thread refreshing whatever is due"""
+        while not self.stopping.wait(min(self.fast_refresh_interval, self.refresh_interval) / 3):
+            due = self.due_targets()
+            if due:
+                try:
+                    self.refresh(due)
+                except Exception as e:
+                    self.controller._error(f"Inventory refresh failed: {e}")
+    
+    def records(self, account: Optional[AWSAccount] = None) -> List[InstanceRecord]:
+        """Current inventory, optionally of one account only"""
+        with self.lock:
+            return [record for (owner, _), records in self.inventory.items()
+                    if account is None or owner is account for record in records]
+    
+    def handle(self, request: Dict) -> Dict:
+        """Answer one request"""
+        query = argparse.Namespace(command='list', instances=[], state=None, instance_type=None,
+                                   vpc=None, subnet=None, az=None, regions=None)
+        query.__dict__.update({key: value for key, value in request.items() if key in vars(query)})
+        if query.command == 'metrics':
+            return {'ok': True, 'metrics': self.controller.metrics.summary()}
+        if query.command not in ('list', 'find', 'status'):
+            return {'ok': False, 'error': f"unknown command '{query.command}'"}
+        if query.regions and not set(query.regions) <= {region for _, region in self.targets}:
+            # Regions the daemon does not inventory cannot be answered
+            return {'ok': False}
+        
+        with self.lock:
+            if len(self.refreshed_at) < len(self.targets):
+                # Not every region has been listed yet
+                return {'ok': False}
+            refreshed_at = time.time() - (time.monotonic() - min(self.refreshed_at.values()))
+        records = select_records(query, self.records(), self.index)
+        if records is None:
+            return {'ok': False}
+        return {
+            'ok': True,
+            'refreshed_at': refreshed_at,
+            'multi_account': self.controller.multi_account,
+            'instances': [record.to_list() for record in records]
+        }
+    
+    def serve(self):
+        """Load the inventory, then serve requests until interrupted"""
+        import socketserver
+        import signal
+        
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    response = daemon.handle(json.loads(self.rfile.readline()))
+                except ValueError:
+                    response = {'ok': False, 'error': 'invalid request'}
+                self.wfile.write(json.dumps(response, default=str).encode() + b'\n')
+        
+        if query_daemon(self.socket_path, {'command': 'find'}) is not None:
+            self.controller._error(f"A daemon is already listening on {self.socket_path}")
+            sys.exit(1)
+        
+        self.controller._info(f"Loading inventory of {len(self.targets)} regions")
+        self.refresh(self.targets)
+        self.controller._success(f"Inventory loaded: {len(self.records())} instance(s)")
+        
+        # Other users must not be able to reach the socket, or replace it
+        problem = private_dir_problem(os.path.dirname(self.socket_path))
+        if problem:
+            self.controller._error(f"Refusing to serve on {self.socket_path}: {problem}")
+            sys.exit(1)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket of a daemon that died
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(umask)
+        server.daemon_threads = True
+        
+        # Stop cleanly on SIGTERM as well as on Ctrl-C
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        refresher = threading.Thread(target=self.refresh_loop, name='refresh', daemon=True)
+        refresher.start()
+        self.controller._success(f"Serving on {self.socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            self.stopping.set()
+            server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            self.controller._info("Daemon stopped")
+
+
+class InventoryWatch:
+    """
+    Live view of the instances matching a listing, redrawn as they change
+    
+    Every region is listed once, then again every refresh_interval; in
+    between, only instances in TRANSITIONAL_STATES are polled (by ID, every
+    interval), so a quiet fleet costs one call per region per refresh. On a
+    terminal the table is drawn once and only changed rows are rewritten in
+    place, highlighted for WATCH_HIGHLIGHT seconds, with a status line
+    below; when piped, or if the table is taller than the terminal, the
+    table is printed once and then each change as one line.
+    """
+    
+    def __init__(self, controller: EC2Controller, fields: List[str], filters: Optional[List[Dict]] = None,
+                 state_filter: Optional[str] = None, interval: int = WATCH_INTERVAL,
+                 refresh_interval: int = WATCH_REFRESH_INTERVAL):
+        """
+        Initialize watch
+        
+        Args:
+            controller: Controller whose accounts and regions are watched
+            fields: LIST_FIELDS names of the columns
+            filters: DescribeInstances filters of the listing (see instance_filters)
+            state_filter: Only show instances in this state
+            interval: Seconds between polls of transitional instances
+            refresh_interval: Seconds between listings of every region
+        """
+        self.controller = controller
+        self.fields = fields
+        self.attributes = [LIST_FIELDS[field][0] for field in fields]
+        self.headers = [LIST_FIELDS[field][1] for field in fields]
+        self.filters = filters
+        self.state_filter = state_filter
+        self.interval = interval
+        self.refresh_interval = refresh_interval
+        self.targets = controller.scan_targets()
+        self.records = {}
+        self.listed_at = {}
+        self.highlight = {}
+        self.failures = []
+        self.last_change = ''
+        self.terminal = sys.stdout.isatty()
+        self.lines = []
+        self.widths = []
+        self.row_index = {}
+    
+    def fetch(self, task: Tuple) -> List[InstanceRecord]:
+        """Run one poll task: ('list', account, region) or ('poll', account, region, ids)"""
+        kind, account, region = task[:3]
+        if kind == 'list':
+            return [record for page in self.controller.iter_region_instances(
+                        region, self.state_filter, filters=self.filters, account=account)
+                    for record in page]
+        records = []
+        ids = task[3]
+        for start in range(0, len(ids), FILTER_VALUES_LIMIT):
+            filters = [{'Name': 'instance-id', 'Values': list(ids[start:start + FILTER_VALUES_LIMIT])}]
+            for page in self.controller.iter_region_instances(region, filters=filters, account=account):
+                records.extend(page)
+        return records
+    
+    def poll(self) -> List[Tuple[str, Optional[InstanceRecord], Optional[InstanceRecord]]]:
+        """
+        List the regions that are due and poll transitional instances elsewhere
+        
+        Returns:
+            Changes as (key, old record, new record); old is None for new
+            instances and new is None for instances that are gone
+        """
+        now = time.monotonic()
+        tasks = []
+        for account, region in self.targets:
+            target = (account.name, region)
+            if now - self.listed_at.get(target, float('-inf')) >= self.refresh_interval:
+                tasks.append(('list', account, region))
+                continue
+            ids = tuple(instance_id for instance_id, record in self.records.get(target, {}).items()
+                        if record.state in TRANSITIONAL_STATES)
+            if ids:
+                tasks.append(('poll', account, region, ids))
+        
+        changes = []
+        self.failures = []
+        for result in self.controller.fanout.run(self.fetch, tasks):
+            kind, account, region = result.key[:3]
+            if isinstance(result.error, (ClientError, BotoCoreError)):
+                self.failures.append((self.controller._label(account, region), result.error))
+                continue
+            if result.error:
+                raise result.error
+            
+            target = (account.name, region)
+            current = self.records.setdefault(target, {})
+            fresh = {record.instance_id: record for record in result.value
+                     if not self.state_filter or record.state == self.state_filter}
+            if kind == 'list':
+                self.listed_at[target] = now
+                gone = set(current) - set(fresh)
+            else:
+                gone = set(result.key[3]) - set(fresh)
+            for instance_id in gone:
+                changes.append(((account.name, region, instance_id), current.pop(instance_id), None))
+            for instance_id, record in fresh.items():
+                old = current.get(instance_id)
+                if old is None or old.project(self.attributes + ['state']) != \
+                        record.project(self.attributes + ['state']):
+                    changes.append(((account.name, region, instance_id), old, record))
+                current[instance_id] = record
+        return changes
+    
+    def rows(self) -> List[Tuple[Tuple[str, str, str], List[str]]]:
+        """Current (key, row) pairs sorted by account, region and instance ID"""
+        return sorted(((target + (instance_id,), [str(cell) for cell in record.project(self.attributes)])
+                       for target, records in self.records.items() for instance_id, record in records.items()),
+                      key=lambda item: item[0])
+    
+    def render_row(self, key: Tuple[str, str, str], row: List[str]) -> str:
+        """One table line, colored while the row is highlighted"""
+        line = '| ' + ' | '.join(cell.ljust(width) for cell, width in zip(row, self.widths)) + ' |'
+        color = self.highlight.get(key, (0, None))[1]
+        if color and self.highlight[key][0] > time.monotonic():
+            return f"{color}{line}{Style.RESET_ALL}"
+        return line
+    
+    def status(self) -> str:
+        """Status line shown below the table"""
+        count = sum(len(records) for records in self.records.values())
+        moving = sum(1 for records in self.records.values() for record in records.values()
+                     if record.state in TRANSITIONAL_STATES)
+        parts = [time.strftime('%H:%M:%S'), f"{count} instance(s)", f"{moving} in transition"]
+        if self.failures:
+            parts.append(f"{len(self.failures)} region(s) not answering")
+        if self.last_change:
+            parts.append(f"last: {self.last_change}")
+        return ' | '.join(parts)
+    
+    def redraw(self):
+        """Clear the screen and draw the whole table"""
+        rows = self.rows()
+        self.widths = [len(header) for header in self.headers]
+        for _, row in rows:
+            for i, cell in enumerate(row):
+                self.widths[i] = max(self.widths[i], len(cell))
+        separator = '+' + '+'.join('-' * (width + 2) for width in self.widths) + '+'
+        header = '| ' + ' | '.join(h.ljust(width) for h, width in zip(self.headers, self.widths)) + ' |'
+        self.row_index = {key: i for i, (key, _) in enumerate(rows)}
+        self.lines = [row for _, row in rows]
+        body = [self.render_row(key, row) for key, row in rows]
+        sys.stdout.write('\033[H\033[2J' + '\n'.join([separator, header, separator] + body + [separator]) + '\n')
+        sys.stdout.write(self.status() + '\033[K\n')
+    
+    def in_place(self) -> bool:
+        """Whether the table fits the terminal, so rows can be rewritten in place"""
+        import shutil
+        count = sum(len(records) for records in self.records.values())
+        return self.terminal and count + 5 <= shutil.get_terminal_size((80, 24)).lines
+    
+    def update(self, changes: List[Tuple]):
+        """Rewrite the changed (or no longer highlighted) rows and the status line in place"""
+        rows = dict(self.rows())
+        if set(rows) != set(self.row_index) or any(
+                len(cell) > width for row in rows.values() for cell, width in zip(row, self.widths)):
+            self.redraw()
+            return
+        
+        now = time.monotonic()
+        dirty = {key for key, _, _ in changes}
+        dirty.update(key for key, (until, _) in list(self.highlight.items()) if until <= now)
+        for key in list(self.highlight):
+            if self.highlight[key][0] <= now:
+                del self.highlight[key]
+        
+        write = sys.stdout.write
+        bottom = len(self.row_index) + 5  # separators, header and status line
+        for key in dirty:
+            if key not in self.row_index:
+                continue
+            up = bottom - (self.row_index[key] + 3)
+            write(f"\033[{up}F{self.render_row(key, rows[key])}\033[K\033[{up}E")
+        write(f"\033[1F{self.status()}\033[K\n")
+        sys.stdout.flush()
+    
+    def announce(self, changes: List[Tuple], print_lines: bool = False):
+        """Record transitions for highlighting, optionally printing them one per line"""
+        until = time.monotonic() + WATCH_HIGHLIGHT
+        for key, old, new in changes:
+            record = new or old
+            label = f"{self.controller._label(self.controller._account(key[0]), key[1])} {key[2]} ({record.name})"
+            if old is None:
+                change = f"{label}: new, {new.state}"
+            elif new is None:
+                change = f"{label}: gone"
+            elif old.state != new.state:
+                change = f"{label}: {old.state} -> {new.state}"
+            else:
+                change = f"{label}: changed"
+            self.last_change = change
+            state = record.state if new is not None else None
+            color = Fore.YELLOW if state in TRANSITIONAL_STATES else Fore.GREEN if state == 'running' else Fore.RED
+            self.highlight[key] = (until, color)
+            if print_lines:
+                print(f"{time.strftime('%H:%M:%S')} {change}", flush=True)
+    
+    def run(self):
+        """Watch until interrupted"""
+        self.controller._info(f"Watching {len(self.targets)} region(s); polling transitional instances every "
+                              f"{self.interval}s, listing every region every {self.refresh_interval}s")
+        self.poll()
+        if self.in_place():
+            self.redraw()
+        else:
+            print_table((row for _, row in self.rows()), self.headers)
+            sys.stdout.flush()
+        
+        try:
+            while True:
+                time.sleep(self.interval)
+                changes = self.poll()
+                in_place = self.in_place()
+                self.announce(changes, print_lines=not in_place)
+                if in_place:
+                    self.update(changes)
+                elif self.failures:
+                    self.controller._report_partial(self.failures, 'Refresh')
+        except KeyboardInterrupt:
+            pass
+
+
+def ssh_config_hosts(path: str = SSH_CONFIG_PATH, seen: Optional[set] = None) -> Dict[str, str]:
+    """
+    Read the host aliases of an OpenSSH client configuration
+    
+    Include directives are followed (relative paths are looked up in
+    ~/.ssh); Host patterns with wildcards or negations are not aliases.
+    
+    Returns:
+        Dict mapping alias to its Hostname (the alias itself if none is set)
+    """
+    import glob
+    
+    seen = seen if seen is not None else set()
+    path = os.path.realpath(os.path.expanduser(path))
+    if path in seen:
+        return {}
+    seen.add(path)
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+    
+    hosts = {}
+    current = []
+    for line in lines:
+        parts = line.strip().replace('=', ' ', 1).split(None, 1)
+        if len(parts) < 2 or parts[0].startswith('#'):
+            continue
+        keyword, value = parts[0].lower(), parts[1].strip()
+        if keyword == 'host':
+            current = [alias for alias in value.split() if not any(c in alias for c in '*?!')]
+            for alias in current:
+                hosts.setdefault(alias, alias)
+        elif keyword == 'match':
+            current = []
+        elif keyword == 'hostname':
+            for alias in current:
+                if hosts[alias] == alias:
+                    hosts[alias] = value
+        elif keyword == 'include':
+            for pattern in value.split():
+                pattern = os.path.expanduser(pattern)
+                if not os.path.isabs(pattern):
+                    pattern = os.path.join(os.path.expanduser('~/.ssh'), pattern)
+                for included in sorted(glob.glob(pattern)):
+                    for alias, hostname in ssh_config_hosts(included, seen).items():
+                        hosts.setdefault(alias, hostname)
+    return hosts
+
+
+class RemoteStepFailed(Exception):
+    """An upload, command or health check failed on a host"""
+
+
+class FleetRunner(Console):
+    """
+    Run uploads, a command and a health gate on many hosts over SSH
+    
+    Hosts are worked on concurrently (at most `parallel` at once), in
+    rolling batches: the next batch only starts once every host of the
+    current one passed, so a bad deploy stops after one batch. All steps
+    on a host share one multiplexed connection (ControlMaster=auto, kept
+    for SSH_CONTROL_PERSIST seconds), so only the first step pays for the
+    handshake and any ProxyJump. Output streams back line by line,
+    prefixed with the host.
+    """
+    
+    def __init__(self, hosts: List[Tuple[str, str]], parallel: int = SSH_PARALLEL,
+                 batch_size: Optional[int] = None, ssh_options: Optional[List[str]] = None,
+                 ssh_config: Optional[str] = None, verbose: bool = False):
+        """
+        Initialize runner
+        
+        Args:
+            hosts: (label, SSH destination) pairs
+            parallel: Maximum hosts worked on at once
+            batch_size: Hosts per rolling batch (all hosts in one batch by default)
+            ssh_options: Extra ssh -o options, e.g. "Port=2222"
+            ssh_config: ssh -F configuration file
+            verbose: Enable verbose output
+        """
+        super().__init__(verbose)
+        # Labels are the fan-out keys, so each host may only appear once
+        self.hosts = list(dict.fromkeys(hosts))
+        self.parallel = parallel
+        self.batch_size = batch_size or len(self.hosts) or 1
+        self.options = ['-o', 'BatchMode=yes', '-o', f'ConnectTimeout={SSH_CONNECT_TIMEOUT}']
+        # Connection sharing sockets live next to the daemon sockets, as privately
+        control_dir = os.path.join(DAEMON_DIR, 'ssh')
+        problem = private_dir_problem(DAEMON_DIR) or private_dir_problem(control_dir)
+        if problem:
+            self._warning(f"Not sharing ssh connections: {problem}")
+        else:
+            self.options += ['-o', 'ControlMaster=auto', '-o', f'ControlPath={os.path.join(control_dir, "%C")}',
+                             '-o', f'ControlPersist={SSH_CONTROL_PERSIST}']
+        if ssh_config:
+            self.options[:0] = ['-F', ssh_config]
+        for option in ssh_options or []:
+            self.options += ['-o', option]
+        self.width = max((len(label) for label, _ in self.hosts), default=0)
+    
+    def run_step(self, argv: List[str]) -> Iterator[str]:
+        """
+        Run one local ssh/scp process, yielding its output lines
         
+        Raises:
+            RemoteStepFailed: The process exited with a non-zero status
+        """
+        import subprocess
+        
+        process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, errors='replace')
         try:
-            ec2 = self.session.client('ec2', region_name=region)
-            
-            # Get instance status checks
-            status_response = ec2.describe_instance_status(InstanceIds=[instance_id])
-            
-            status_info = {}
-            if status_response['InstanceStatuses']:
-                status = status_response['InstanceStatuses'][0]
-                status_info['instance_status'] = status.get('InstanceStatus', {}).get('Status', 'N/A')
-                status_info['system_status'] = status.get('SystemStatus', {}).get('Status', 'N/A')
-            else:
-                status_info['instance_status'] = 'N/A'
-                status_info['system_status'] = 'N/A'
-            
-            return {**instance_info, **status_info}
-        except ClientError as e:
-            self._error(f"Failed to get instance status: {e}")
-            return instance_info
+            for line in process.stdout:
+                yield line.rstrip('\n')
+            status = process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if status:
+            raise RemoteStepFailed(f"{argv[0]} exited with status {status}")
     
-    def change_instance_type(self, instance_info: Dict, new_type: str, dry_run: bool = False) -> bool:
-        """Change instance type (instance must be stopped)"""
-        instance_id = instance_info['instance_id']
-        region = instance_info['region']
-        state = instance_info['state']
-        current_type = instance_info.get('instance_type', 'Unknown')
-        
-        if state != 'stopped':
-            self._error(f"Instance must be stopped to change type (current state: {state})")
-            self._warning("Stop the instance first with: stop command")
-            return False
+    def host_steps(self, destination: str, uploads: List[Tuple[str, str]], command: Optional[str],
+                   health_command: Optional[str], health_timeout: int) -> Iterator[str]:
+        """Upload, run the command and wait for the health check on one host, yielding output lines"""
+        for local, remote in uploads:
+            try:
+                yield from self.run_step(['scp', '-q'] + self.options + [local, f"{destination}:{remote}"])
+            except RemoteStepFailed as e:
+                raise RemoteStepFailed(f"uploading {local}: {e}")
+        if command:
+            try:
+                yield from self.run_step(['ssh'] + self.options + [destination, command])
+            except RemoteStepFailed as e:
+                raise RemoteStepFailed(f"command: {e}")
+        if health_command:
+            deadline = time.monotonic() + health_timeout
+            while True:
+                output = []
+                try:
+                    # Only the output of the last attempt is shown
+                    output.extend(self.run_step(['ssh'] + self.options + [destination, health_command]))
+                    yield from output
+                    break
+                except RemoteStepFailed as e:
+                    if time.monotonic() + HEALTH_INTERVAL > deadline:
+                        yield from output
+                        raise RemoteStepFailed(f"health check still failing after {health_timeout}s: {e}")
+                time.sleep(HEALTH_INTERVAL)
+    
+    def run(self, uploads: List[Tuple[str, str]], command: Optional[str] = None,
+            health_command: Optional[str] = None, health_timeout: int = HEALTH_TIMEOUT,
+            dry_run: bool = False) -> Dict[str, Tuple[str, str]]:
+        """
+        Work through every host, batch by batch
         
-        if current_type == new_type:
-            self._warning(f"Instance is already of type {new_type}")
-            return True
+        Args:
+            uploads: (local path, remote path) files to copy first
+            command: Remote command to run after the uploads
+            health_command: Remote command that must succeed (retried for
+                up to health_timeout seconds) before a host counts as done
+            health_timeout: Seconds to wait for a host to become healthy
+            dry_run: Only show what would be run
+            
+        Returns:
+            Dict mapping host label to (result, detail), result being ok,
+            failed or skipped (never started because an earlier batch failed)
+        """
+        outcomes = {}
+        destinations = dict(self.hosts)
+        labels = [label for label, _ in self.hosts]
+        batches = [labels[start:start + self.batch_size] for start in range(0, len(labels), self.batch_size)]
+        fanout = FanOut(self.parallel)
         
-        try:
-            ec2 = self.session.client('ec2', region_name=region)
-            self._info(f"Changing instance type from {current_type} to {new_type}...")
+        for number, batch in enumerate(batches, 1):
+            if len(batches) > 1:
+                self._info(f"Batch {number}/{len(batches)}: {', '.join(batch)}")
+            if dry_run:
+                for label in batch:
+                    steps = [f"scp {local} {destinations[label]}:{remote}" for local, remote in uploads]
+                    steps += [f"ssh {destinations[label]} {c}" for c in (command, health_command) if c]
+                    print(f"{label.ljust(self.width)} | would run: {'; '.join(steps)}")
+                    outcomes[label] = ('ok', 'dry run')
+                continue
             
-            ec2.modify_instance_attribute(
-                InstanceId=instance_id,
-                InstanceType={'Value': new_type},
-                DryRun=dry_run
-            )
+            run = fanout.run(lambda label: self.host_steps(destinations[label], uploads, command,
+                                                           health_command, health_timeout),
+                             batch, stream=True)
+            with closing(run):
+                for result in run:
+                    if not result.final:
+                        print(f"{result.key.ljust(self.width)} | {result.value}", flush=True)
+                    elif result.error:
+                        outcomes[result.key] = ('failed', str(result.error))
+                        self._error(f"{result.key}: {result.error}")
+                    else:
+                        outcomes[result.key] = ('ok', f"done in {result.elapsed:.1f}s")
+                        self._success(f"{result.key}: done in {result.elapsed:.1f}s")
             
-            if not dry_run:
-                self._success(f"Instance type changed successfully from {current_type} to {new_type}")
-                self._info("You can now start the instance with the new type")
-            return True
-        except ClientError as e:
-            if 'DryRunOperation' in str(e):
-                self._success(f"Dry run successful - instance type would be changed from {current_type} to {new_type}")
-                return True
-            elif 'InvalidInstanceType' in str(e):
-                self._error(f"Invalid instance type: {new_type}")
-                self._warning("Please check AWS documentation for valid instance types")
-                return False
-            elif 'InsufficientInstanceCapacity' in str(e):
-                self._error(f"Insufficient capacity for instance type {new_type} in this region")
-                self._warning("Try a different instance type or wait and retry")
-                return False
-            else:
-                self._error(f"Failed to change instance type: {e}")
-                return False
-    
-    def get_available_instance_types(self, region: str) -> List[str]:
-        """Get list of available instance types in a region"""
-        try:
-            ec2 = self.session.client('ec2', region_name=region)
-            # Get instance type offerings
-            response = ec2.describe_instance_type_offerings(
-                LocationType='region',
-                Filters=[
-                    {'Name': 'location', 'Values': [region]}
-                ]
-            )
-            types = sorted(set([offering['InstanceType'] for offering in response['InstanceTypeOfferings']]))
-            return types
-        except ClientError:
-            # Fallback to common instance types
-            return [
-                't3.nano', 't3.micro', 't3.small', 't3.medium', 't3.large', 't3.xlarge', 't3.2xlarge',
-                't3a.nano', 't3a.micro', 't3a.small', 't3a.medium', 't3a.large', 't3a.xlarge', 't3a.2xlarge',
-                'c5.large', 'c5.xlarge', 'c5.2xlarge', 'c5.4xlarge', 'c5.9xlarge',
-                'c6i.large', 'c6i.xlarge', 'c6i.2xlarge', 'c6i.4xlarge', 'c6i.8xlarge',
-                'm5.large', 'm5.xlarge', 'm5.2xlarge', 'm5.4xlarge', 'm5.8xlarge',
-                'r5.large', 'r5.xlarge', 'r5.2xlarge', 'r5.4xlarge'
-            ]
+            if any(outcomes[label][0] == 'failed' for label in batch):
+                remaining = labels[len(outcomes):]
+                if remaining:
+                    self._warning(f"Stopping the rollout, {len(remaining)} host(s) not started")
+                for label in remaining:
+                    outcomes[label] = ('skipped', 'earlier batch failed')
+                break
+        return outcomes
 
 
 def format_table(rows: List[List], headers: List[str]) -> str:
     """Format data as a table (fallback for when tabulate is not available)"""
-    if HAS_TABULATE:
+    try:
+        from tabulate import tabulate
         return tabulate(rows, headers=headers, tablefmt='grid')
+    except ImportError:
+        pass
     
     # Simple table formatting without tabulate
-    # Calculate column widths
+    # Convert every cell once, then calculate column widths
+    rows = [[str(cell) for cell in row] for row in rows]
     col_widths = [len(h) for h in headers]
     for row in rows:
         for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(str(cell)))
+            col_widths[i] = max(col_widths[i], len(cell))
     
     # Create separator line
     separator = '+' + '+'.join(['-' * (w + 2) for w in col_widths]) + '+'
@@ -446,7 +3786,7 @@ def format_table(rows: List[List], headers: List[str]) -> str:
     # Format rows
     formatted_rows = []
     for row in rows:
-        row_line = '| ' + ' | '.join([str(cell).ljust(w) for cell, w in zip(row, col_widths)]) + ' |'
+        row_line = '| ' + ' | '.join([cell.ljust(w) for cell, w in zip(row, col_widths)]) + ' |'
         formatted_rows.append(row_line)
     
     # Combine all parts
@@ -457,6 +3797,633 @@ def format_table(rows: List[List], headers: List[str]) -> str:
     return '\n'.join(result)
 
 
+def print_table(rows: Iterable[List], headers: List[str], widths: Optional[List[int]] = None,
+                sample: int = TABLE_SAMPLE_ROWS) -> int:
+    """
+    Print rows as a grid table in a single pass
+    
+    Column widths are either given, in which case each row is printed as
+    soon as it arrives, or sized from the headers and the first `sample`
+    rows, which are buffered for that. Later cells longer than their
+    column are not truncated, they just push the rest of the line out.
+    Every cell is converted to a string once, and memory stays bounded no
+    matter how many rows follow. Nothing is printed for an empty iterator.
+    
+    Returns:
+        Number of rows printed
+    """
+    rows = iter(rows)
+    head = []
+    if widths is None:
+        head = [[str(cell) for cell in row] for row in islice(rows, sample)]
+        widths = [len(h) for h in headers]
+        for row in head:
+            for i, cell in enumerate(row):
+                widths[i] = max(widths[i], len(cell))
+    
+    write = sys.stdout.write
+    separator = '+' + '+'.join(['-' * (w + 2) for w in widths]) + '+\n'
+    count = 0
+    for row in chain(head, rows):
+        if not count:
+            write(separator)
+            write('| ' + ' | '.join([str(h).ljust(w) for h, w in zip(headers, widths)]) + ' |\n')
+            write(separator)
+        write('| ' + ' | '.join([str(cell).ljust(w) for cell, w in zip(row, widths)]) + ' |\n')
+        count += 1
+    if count:
+        write(separator)
+    return count
+
+
+def write_rows(rows: Iterable[List], keys: List[str], headers: List[str], output: str = 'table',
+               widths: Optional[List[int]] = None) -> int:
+    """
+    Write rows to stdout in an --output format
+    
+    jsonl and csv write each row as soon as it is produced and json
+    streams the elements of one array, so nothing is buffered; table uses
+    print_table. Missing values ('N/A') become null in JSON and empty in CSV.
+    
+    Args:
+        rows: Rows to write, in output order
+        keys: JSON keys / CSV header of the columns
+        headers: Table headers of the columns
+        output: table, json, jsonl or csv
+        widths: Fixed table column widths (sized from the first rows by default)
+        
+    Returns:
+        Number of rows written
+    """
+    if output == 'table':
+        return print_table(rows, headers, widths)
+    
+    count = 0
+    if output == 'csv':
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(keys)
+        for row in rows:
+            writer.writerow(['' if value == 'N/A' else value for value in row])
+            count += 1
+        return count
+    
+    write = sys.stdout.write
+    for row in rows:
+        line = json.dumps({key: None if value == 'N/A' else value for key, value in zip(keys, row)})
+        if output == 'jsonl':
+            write(line + '\n')
+        else:
+            write(('[\n  ' if not count else ',\n  ') + line)
+        count += 1
+    if output == 'json':
+        write('\n]\n' if count else '[]\n')
+    return count
+
+
+def write_records(records: Iterable[InstanceRecord], fields: List[str], output: str = 'table',
+                  fixed_widths: bool = False) -> int:
+    """
+    Write instance records to stdout in an --output format (see write_rows)
+    
+    Args:
+        records: Records to write, in output order
+        fields: LIST_FIELDS names of the columns / keys to write
+        output: table, json, jsonl or csv
+        fixed_widths: Use the LIST_FIELDS column widths for tables instead
+            of sizing them from the first rows
+        
+    Returns:
+        Number of records written
+    """
+    attributes = [LIST_FIELDS[field][0] for field in fields]
+    headers = [LIST_FIELDS[field][1] for field in fields]
+    widths = [LIST_FIELDS[field][2] for field in fields] if fixed_widths else None
+    return write_rows((record.project(attributes) for record in records), fields, headers, output, widths)
+
+
+def run_instance_command(controller: EC2Controller, args: argparse.Namespace, instance_info: Dict) -> bool:
+    """Display a found instance and execute the requested command on it"""
+    # Display instance information
+    controller._success("Instance found:")
+    if controller.multi_account:
+        print(f"  Account: {instance_info.get('account', 'default')}")
+    print(f"  Region: {instance_info['region']}")
+    print(f"  Instance ID: {instance_info['instance_id']}")
+    print(f"  Name: {instance_info.get('name', 'N/A')}")
+    print(f"  Current State: {instance_info['state']}")
+    print(f"  Instance Type: {instance_info.get('instance_type', 'N/A')}")
+    print(f"  Private IP: {instance_info.get('private_ip', 'N/A')}")
+    print(f"  Public IP: {instance_info.get('public_ip', 'N/A')}")
+    print()
+    
+    # Execute the command
+    success = False
+    if args.command == 'start':
+        success = controller.start_instance(instance_info, dry_run=args.dry_run)
+    elif args.command == 'stop':
+        success = controller.stop_instance(instance_info, dry_run=args.dry_run)
+    elif args.command == 'force-stop':
+        success = controller.stop_instance(instance_info, force=True, dry_run=args.dry_run)
+    elif args.command == 'reboot':
+        success = controller.reboot_instance(instance_info, dry_run=args.dry_run)
+    elif args.command == 'status':
+        detailed_info = controller.get_instance_status(instance_info)
+        print(f"  Platform: {detailed_info.get('platform', 'N/A')}")
+        print(f"  Architecture: {detailed_info.get('architecture', 'N/A')}")
+        print(f"  Launch Time: {detailed_info.get('launch_time', 'N/A')}")
+        print(f"  Instance Status: {detailed_info.get('instance_status', 'N/A')}")
+        print(f"  System Status: {detailed_info.get('system_status', 'N/A')}")
+        success = True
+    elif args.command == 'resize':
+        success = controller.change_instance_type(instance_info, args.type, dry_run=args.dry_run)
+    
+    return success
+
+
+def wait_for_command(controller: EC2Controller, args: argparse.Namespace, instances: List) -> Dict[str, str]:
+    """Wait for instances acted on by a command to reach the command's target state"""
+    if args.command == 'start':
+        return controller.wait_for_instances(instances, 'running', timeout=args.wait_timeout)
+    if args.command in ('stop', 'force-stop'):
+        return controller.wait_for_instances(instances, 'stopped', timeout=args.wait_timeout)
+    if args.command == 'reboot':
+        return controller.wait_for_instances(instances, 'running', status_ok=True, require_change=True,
+                                             timeout=args.wait_timeout)
+    if args.command == 'resize':
+        return controller.wait_for_instances(instances, 'stopped', instance_type=args.type,
+                                             timeout=args.wait_timeout)
+    return {}
+
+
+def upload_spec(value: str) -> Tuple[str, str]:
+    """argparse type for --upload LOCAL[:REMOTE] (the remote path defaults to the file name)"""
+    local, _, remote = value.partition(':')
+    if not os.path.isfile(os.path.expanduser(local)):
+        raise argparse.ArgumentTypeError(f"no such file: {local}")
+    return os.path.expanduser(local), remote or os.path.basename(local)
+
+
+def run_fleet_command(args: argparse.Namespace, controller: Optional[EC2Controller] = None) -> bool:
+    """
+    Run the exec/deploy commands
+    
+    Targets are either SSH host aliases matching --hosts, or the running
+    instances selected by identifiers/tags, reached at their --address
+    (through the SSH alias whose Hostname is that address, if there is one,
+    so per-host settings such as ProxyJump apply).
+    
+    Returns:
+        True if every host succeeded
+    """
+    console = controller or Console(args.verbose)
+    aliases = ssh_config_hosts(args.ssh_config or SSH_CONFIG_PATH)
+    user = f"{args.ssh_user}@" if args.ssh_user else ''
+    skipped = []
+    
+    if args.hosts:
+        # Hosts run in the order given, a pattern's matches in configuration
+        # order; plain host names not in the configuration are used as they are
+        matched = []
+        for pattern in args.hosts:
+            if any(c in pattern for c in '*?['):
+                matched += [alias for alias in aliases if fnmatch.fnmatchcase(alias, pattern)]
+            else:
+                matched.append(pattern)
+        # A host given twice is still run on once
+        matched = list(dict.fromkeys(matched))
+        targets = [(alias, user + alias) for alias in matched]
+        details = {alias: [alias, aliases.get(alias, alias)] for alias in matched}
+        headers = ['Host', 'Hostname']
+    else:
+        instances = controller.resolve_instances(args.instances, tags=args.tag)
+        by_address = {hostname: alias for alias, hostname in aliases.items()}
+        names = [r.name for r in instances]
+        targets, details = [], {}
+        for r in sorted(instances, key=lambda x: (x.account, x.region, x.name, x.instance_id)):
+            label = r.name if r.name != 'N/A' and names.count(r.name) == 1 else r.instance_id
+            address = getattr(r, args.address.replace('-', '_'))
+            details[label] = ([r.account] if controller.multi_account else []) + [r.region, r.instance_id, r.name]
+            if r.state != 'running' or address in ('N/A', '', None):
+                skipped.append((label, f"no {args.address}" if r.state == 'running' else r.state))
+                continue
+            targets.append((label, user + by_address.get(address, address)))
+        headers = (['Account'] if controller.multi_account else []) + ['Region', 'Instance ID', 'Name']
+    
+    if not targets:
+        console._error("No reachable hosts matched" + (f" ({len(skipped)} skipped)" if skipped else ''))
+        return False
+    console._success(f"Matched {len(targets)} host(s)" + (f", skipping {len(skipped)}" if skipped else ''))
+    
+    batch_size = args.batch_size or (args.parallel if args.command == 'deploy' else None)
+    runner = FleetRunner(targets, parallel=args.parallel, batch_size=batch_size, ssh_options=args.ssh_option,
+                         ssh_config=args.ssh_config, verbose=args.verbose)
+    outcomes = runner.run(args.upload, command=args.cmd, health_command=args.health_cmd,
+                          health_timeout=args.health_timeout, dry_run=args.dry_run)
+    outcomes.update((label, ('skipped', detail)) for label, detail in skipped)
+    
+    print(format_table([details[label] + list(outcomes[label]) for label in details if label in outcomes],
+                       headers + ['Result', 'Detail']))
+    counts = {outcome: sum(1 for r, _ in outcomes.values() if r == outcome) for outcome in ('ok', 'skipped', 'failed')}
+    summary = f"{counts['ok']} succeeded, {counts['skipped']} skipped, {counts['failed']} failed"
+    if counts['failed']:
+        console._warning(summary)
+    else:
+        console._success(summary)
+    if args.dry_run:
+        console._warning("DRY RUN COMPLETE - No actual changes were made")
+    return not counts['failed']
+
+
+def comma_list(value: str) -> List[str]:
+    """argparse type for comma separated values"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def field_list(value: str) -> List[str]:
+    """argparse type for --fields"""
+    fields = comma_list(value)
+    unknown = [field for field in fields if field not in LIST_FIELDS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown field(s) {', '.join(unknown)}; "
+                                         f"choose from {', '.join(LIST_FIELDS)}")
+    return fields
+
+
+def history_field_list(value: str) -> List[str]:
+    """argparse type for --changed (LIST_FIELDS names of attributes kept in the history)"""
+    tracked = [name for name, (attribute, _, _) in LIST_FIELDS.items() if attribute in HISTORY_FIELDS]
+    fields = comma_list(value)
+    unknown = [field for field in fields if field not in tracked]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown field(s) {', '.join(unknown)}; choose from {', '.join(tracked)}")
+    return fields
+
+
+def time_window(value: str) -> Tuple[float, float]:
+    """
+    argparse type for --at/--since/--until
+    
+    A point in time ("now", "3d" / "12h" / "30m" / "2w" ago, or an ISO
+    date and time) is a zero-length window; "today", "yesterday", a weekday
+    (its latest occurrence before today, "last" is optional), an ISO date
+    or a YYYY-MM month cover the whole day or month.
+    
+    Returns:
+        (start, end) epoch seconds
+    """
+    import datetime
+    import re
+    
+    text = value.strip().lower()
+    now = datetime.datetime.now()
+    today = datetime.datetime.combine(now.date(), datetime.time())
+    day = datetime.timedelta(days=1)
+    weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    relative = re.fullmatch(r'(\d+)\s*([mhdw])', text)
+    weekday = text[5:].strip() if text.startswith('last ') else text
+    
+    if text == 'now':
+        start = end = now
+    elif relative:
+        unit = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}[relative.group(2)]
+        start = end = now - datetime.timedelta(**{unit: int(relative.group(1))})
+    elif text in ('today', 'yesterday'):
+        start = today - (day if text == 'yesterday' else datetime.timedelta())
+        end = start + day
+    elif weekday in weekdays:
+        start = today - day * ((today.weekday() - weekdays.index(weekday) - 1) % 7 + 1)
+        end = start + day
+    elif re.fullmatch(r'\d{4}-\d{2}', text):
+        start = datetime.datetime.strptime(text, '%Y-%m')
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        try:
+            start = datetime.datetime.fromisoformat(value.strip())
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"unrecognized time '{value}'; use e.g. 2026-10-13, "
+                                             f"'2026-10-13 14:00', 2026-10, tuesday, yesterday or 3d")
+        end = start + day if re.fullmatch(r'\d{4}-\d{2}-\d{2}', text) else start
+    # Windows end just before the next day/month starts
+    return start.timestamp(), end.timestamp() - (0.001 if end > start else 0)
+
+
+def format_time(timestamp: float) -> str:
+    """Local time of a history entry"""
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def list_fields(fields: Optional[List[str]], with_account: bool = False) -> List[str]:
+    """
+    Resolve --fields into the LIST_FIELDS names to write
+    
+    The Account column is added in front when working across several accounts.
+    """
+    fields = list(fields or DEFAULT_LIST_FIELDS)
+    if with_account and 'account' not in fields:
+        fields.insert(0, 'account')
+    return fields
+
+
+def select_records(query: argparse.Namespace, records: List[InstanceRecord],
+                   index: Optional[InventoryIndex] = None) -> Optional[List[InstanceRecord]]:
+    """
+    Apply list selectors or status identifiers to locally held records
+    
+    Args:
+        query: Parsed arguments (or a daemon request) with command, instances,
+            state, instance_type, vpc, subnet, az and regions
+        records: Records to select from
+        index: Index over the records for status identifiers (built if not given)
+        
+    Returns:
+        Selected records, or None if a status identifier matches none of them
+    """
+    if getattr(query, 'regions', None):
+        records = [r for r in records if r.region in query.regions]
+        index = None
+    if query.command in ('list', 'history'):
+        # Same selectors as the server-side filters of a live listing
+        for attribute, patterns in (('name', query.instances), ('instance_type', query.instance_type),
+                                    ('vpc_id', query.vpc), ('subnet_id', query.subnet),
+                                    ('availability_zone', query.az)):
+            if patterns:
+                records = [r for r in records
+                           if any(fnmatch.fnmatchcase(getattr(r, attribute), p) for p in patterns)]
+        if query.state:
+            records = [r for r in records if r.state == query.state]
+        return records
+    
+    index = index or InventoryIndex(records)
+    matched = {}
+    for identifier in query.instances:
+        found = index.lookup(identifier)
+        if not found:
+            return None
+        matched.update((r.instance_id, r) for r in found)
+    return list(matched.values())
+
+
+def print_records(console: Console, args: argparse.Namespace, records: List[InstanceRecord],
+                  with_account: bool = False):
+    """Write locally held records in the --output format"""
+    records.sort(key=lambda x: (x.account, x.region, x.instance_id))
+    if write_records(records, list_fields(args.fields, with_account), args.output):
+        console._success(f"Found {len(records)} instance(s)")
+    else:
+        console._warning("No instances found")
+
+
+def default_profiles(args: argparse.Namespace) -> List[str]:
+    """Profiles selected on the command line, or the environment's default profile"""
+    profiles = list(dict.fromkeys(name for names in args.profile for name in names))
+    return profiles or [os.environ.get('AWS_PROFILE') or os.environ.get('AWS_DEFAULT_PROFILE') or 'default']
+
+
+def run_cached_command(args: argparse.Namespace) -> bool:
+    """
+    Answer list/status from the cached inventory, without importing boto3
+    
+    Returns:
+        False on a cache miss (a profile has no fresh snapshot or one that
+        does not cover --regions, --tag or --all-regions was given, or an
+        identifier matches no cached instance); the caller then falls back
+        to querying AWS
+    """
+    console = Console(args.verbose, sys.stdout if args.output == 'table' else sys.stderr)
+    if args.tag or args.health or args.impaired or args.all_regions:
+        return False
+    profiles = InventoryCache.cached_profiles() if args.all_profiles else default_profiles(args)
+    if not profiles:
+        return False
+    
+    records = []
+    oldest = time.time()
+    for profile in profiles:
+        cache = InventoryCache(profile)
+        cached = cache.load()
+        if cached is None:
+            if args.verbose:
+                console._info(f"No fresh cached inventory for profile '{profile}', querying AWS")
+            return False
+        if args.regions and not set(args.regions) <= set(cache.regions):
+            if args.verbose:
+                console._info(f"Cached inventory for profile '{profile}' does not cover the selected regions, "
+                              f"querying AWS")
+            return False
+        records.extend(cached)
+        oldest = min(oldest, cache.saved_at)
+    
+    records = select_records(args, records)
+    if records is None:
+        if args.verbose:
+            console._info("Not all instances are in the cached inventory, querying AWS")
+        return False
+    
+    console._warning(f"Using cached inventory from {int(time.time() - oldest) // 60} minute(s) ago")
+    print_records(console, args, records, len(profiles) > 1)
+    return True
+
+
+def run_history_command(args: argparse.Namespace) -> bool:
+    """
+    Answer the history command from the local history store, without AWS
+    
+    Without --since/--until/--changed the inventory at --at (now by default)
+    is listed like the list command; a day or month given to --at lists
+    every instance that existed (or was in --state) at any time during it.
+    Otherwise the recorded changes are listed.
+    
+    Returns:
+        False if nothing has been recorded yet
+    """
+    console = Console(args.verbose, sys.stdout if args.output == 'table' else sys.stderr)
+    history = InventoryHistory(retention_days=args.retention)
+    if not history.exists():
+        console._warning(f"No inventory history recorded yet; unfiltered list runs and the daemon record it "
+                         f"in {history.path}")
+        return False
+    accounts = None if args.all_profiles else list(dict.fromkeys(name for names in args.profile for name in names))
+    
+    with closing(history):
+        if args.compact:
+            removed = history.compact(vacuum=True)
+            console._success(f"Compacted history older than {args.retention:g} day(s), removed {removed} row(s)")
+            return True
+        
+        first, last = history.coverage()
+        if first is None:
+            console._warning("No inventory history recorded yet")
+            return False
+        if args.verbose:
+            console._info(f"History from {format_time(first)} to {format_time(last)} in {history.path}")
+        
+        def selected(name: str, instance_id: str) -> bool:
+            return not args.instances or any(instance_id == p or fnmatch.fnmatchcase(name, p)
+                                             for p in args.instances)
+        
+        if args.since or args.until or args.changed:
+            since = args.since[0] if args.since else 0
+            until = args.until[1] if args.until else time.time()
+            attributes = [LIST_FIELDS[field][0] for field in args.changed] if args.changed else HISTORY_FIELDS
+            names = {attribute: name for name, (attribute, _, _) in LIST_FIELDS.items()}
+            changes = sorted(change for change in history.changes(since, until, accounts, args.regions, attributes)
+                             if selected(change[4], change[3]))
+            with_account = len({change[1] for change in changes}) > 1
+            keys = ['time'] + (['account'] if with_account else []) + ['region', 'id', 'name', 'field', 'old', 'new']
+            headers = ['Time'] + (['Account'] if with_account else []) + ['Region', 'Instance ID', 'Name',
+                                                                          'Field', 'Old', 'New']
+            rows = ([format_time(observed_at)] + ([account] if with_account else []) +
+                    [region, instance_id, name, names[field], old, new]
+                    for observed_at, account, region, instance_id, name, field, old, new in changes)
+            if write_rows(rows, keys, headers, args.output):
+                console._success(f"Found {len(changes)} change(s) between {format_time(max(since, first))} "
+                                 f"and {format_time(min(until, last))}")
+            else:
+                console._warning("No changes recorded")
+            return True
+        
+        start, end = args.at or (time.time(), time.time())
+        if end < first:
+            console._warning(f"History only starts at {format_time(first)}")
+            return True
+        records = [r for r in history.snapshot(start, end, accounts, args.regions, args.state)
+                   if selected(r.name, r.instance_id)]
+        records = select_records(argparse.Namespace(**{**vars(args), 'instances': []}), records)
+        if not args.at:
+            console._info(f"Inventory as last recorded at {format_time(last)}")
+        elif start > last:
+            console._warning(f"Last recorded listing was at {format_time(last)}")
+        else:
+            console._info(f"Inventory {'at ' if start == end else 'between '}{format_time(start)}"
+                          f"{'' if start == end else ' and ' + format_time(end)}")
+        print_records(console, args, records, len({r.account for r in records}) > 1)
+    return True
+
+
+def private_dir_problem(path: str) -> Optional[str]:
+    """
+    Create a directory only the current user can use, or check an existing one
+    
+    Returns:
+        None if the directory is private, otherwise why it must not be used
+    """
+    import stat
+    
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        return f"{path} is not a directory"
+    if info.st_uid != os.getuid():
+        return f"{path} is owned by another user"
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        return f"{path} has mode {stat.S_IMODE(info.st_mode):o}, not 700"
+    return None
+
+
+def daemon_socket_path(args: argparse.Namespace) -> str:
+    """Socket of the daemon serving the profiles selected on the command line"""
+    key = 'all-profiles' if args.all_profiles else '+'.join(default_profiles(args))
+    return os.path.join(DAEMON_DIR, f"daemon-{key}.sock")
+
+
+def query_daemon(path: str, request: Dict, timeout: float = DAEMON_TIMEOUT) -> Optional[Dict]:
+    """
+    Send one request to a running daemon
+    
+    Returns:
+        The decoded response, or None if no daemon answers on the socket
+    """
+    import socket
+    
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode() + b'\n')
+            with sock.makefile('rb') as reader:
+                return json.loads(reader.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def run_daemon_command(args: argparse.Namespace) -> bool:
+    """
+    Answer list from a running daemon's in-memory inventory
+    
+    status is always answered live: its output includes status checks and
+    attributes the daemon's inventory does not hold.
+    
+    Returns:
+        False if no daemon is running for the selected profiles, --tag or
+        --all-regions was given, a --regions region is not inventoried by
+        the daemon, or an identifier is not in its inventory; the caller
+        then falls back to querying AWS
+    """
+    if args.tag or args.health or args.impaired or args.all_regions:
+        return False
+    console = Console(args.verbose, sys.stdout if args.output == 'table' else sys.stderr)
+    response = query_daemon(daemon_socket_path(args), {
+        'command': args.command, 'instances': args.instances, 'state': args.state,
+        'instance_type': args.instance_type, 'vpc': args.vpc, 'subnet': args.subnet, 'az': args.az,
+        'regions': args.regions
+    })
+    if not response or not response.get('ok'):
+        if args.verbose:
+            console._info("Daemon not running or instance not in its inventory, querying AWS")
+        return False
+    
+    if args.verbose:
+        console._info(f"Inventory from daemon, refreshed {int(time.time() - response['refreshed_at'])}s ago")
+    records = [InstanceRecord(*values) for values in response['instances']]
+    print_records(console, args, records, response.get('multi_account', False))
+    return True
+
+
+def report_metrics(controller: EC2Controller, args: argparse.Namespace, started: float):
+    """
+    Print the --timings summary and write the --trace file at exit
+    
+    Args:
+        controller: Controller whose API calls were collected
+        args: Parsed command line arguments
+        started: time.time() when the command started
+    """
+    wall = time.time() - started
+    summary = controller.metrics.summary()
+    totals = {key: sum(row[key] for row in summary) for key in ('calls', 'retries', 'errors', 'bytes')}
+    
+    if args.timings:
+        rows = [
+            [controller._label(controller._account(row['account']), row['region']), row['operation'],
+             row['calls'], row['retries'], row['errors'], f"{row['bytes'] / 1024:.1f}",
+             f"{row['total_seconds']:.3f}", *(f"{row[f'{p}_seconds'] * 1000:.0f}" for p in ('p50', 'p90', 'max'))]
+            for row in summary
+        ]
+        headers = ['Region', 'Operation', 'Calls', 'Retries', 'Errors', 'KiB', 'Total s', 'p50 ms', 'p90 ms',
+                   'Max ms']
+        if rows:
+            print(format_table(rows, headers), file=sys.stderr)
+        print(f"{totals['calls']} API call(s), {totals['retries']} retries, {totals['errors']} error(s), "
+              f"{totals['bytes'] / 1024:.1f} KiB in {wall:.2f}s", file=sys.stderr)
+    
+    if args.trace:
+        trace = {
+            'argv': sys.argv[1:],
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(started)),
+            'wall_seconds': round(wall, 4),
+            'totals': totals,
+            'metrics': summary,
+            'calls': controller.metrics.calls
+        }
+        try:
+            with open(args.trace, 'w') as f:
+                json.dump(trace, f, indent=1, sort_keys=True)
+                f.write('\n')
+        except OSError as e:
+            controller._error(f"Could not write trace file {args.trace}: {e}")
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -469,100 +4436,443 @@ Examples:
   %(prog)s status production-db
   %(prog)s list
   %(prog)s list --state running
+  %(prog)s list 'web-*' --tag env=prod --az eu-west-1a --fields id,name,private-ip
+  %(prog)s list --cached
+  %(prog)s health --impaired
+  %(prog)s watch 'web-*' --tag env=prod
+  %(prog)s list -o jsonl | jq -r 'select(.state == "running") | .id'
+  %(prog)s -p prod,staging daemon &
+  %(prog)s --regions eu-west-1,us-east-1 list
   %(prog)s resize my-server --type t3.large
+  %(prog)s resize 'batch-*' --type c6i.xlarge --fallback-types c5.xlarge,m6i.xlarge
+  %(prog)s resize --resume
+  %(prog)s types --min-vcpu 4 --min-mem 16 --arch arm64
+  %(prog)s --regions eu-west-1,us-east-1 types 'c6*'
   %(prog)s -p prod-account reboot webserver
+  %(prog)s -p prod,staging list --state running
+  %(prog)s --all-profiles status 'web-*'
   %(prog)s --dry-run stop test-instance
+  %(prog)s --all-matches status webserver
+  %(prog)s stop web-1 web-2 i-0123456789abcdef0
+  %(prog)s stop 'web-*' --tag env=staging
+  %(prog)s start --wait web-1 web-2
+  %(prog)s --timings --trace list-trace.json list
+  %(prog)s --regions eu-west-1 history --at 'last tuesday' --state running
+  %(prog)s history --since 2026-10 --changed type
+  %(prog)s history 'web-*' --since 7d
+  %(prog)s exec 'web-*' --tag env=staging -c 'uptime'
+  %(prog)s exec --hosts 'bastion-*' -c 'df -h /' --parallel 20
+  %(prog)s deploy 'api-*' --upload app.tar.gz:/tmp/ -c 'sudo /opt/app/install /tmp/app.tar.gz' \\
+      --batch-size 2 --health-cmd 'curl -fsS localhost:8080/health'
         """
     )
     
     parser.add_argument('command',
-                       choices=['start', 'stop', 'force-stop', 'reboot', 'status', 'list', 'resize'],
+                       choices=['start', 'stop', 'force-stop', 'reboot', 'status', 'list', 'health', 'watch',
+                                'resize', 'types', 'exec', 'deploy', 'history', 'daemon'],
                        help='Command to execute')
-    parser.add_argument('instance', nargs='?',
-                       help='Instance ID or name tag (not required for list command)')
-    parser.add_argument('-p', '--profile',
-                       help='AWS CLI profile to use')
+    parser.add_argument('instances', nargs='*', metavar='instance',
+                       help='Instance ID or name tag; several IDs/names or a name glob such as '
+                            '"web-*" act on many instances (optional name globs for list/watch commands, '
+                            'name globs or IDs for history, instance type globs for types command)')
+    parser.add_argument('--tag', action='append', default=[], metavar='KEY=VALUE',
+                       type=lambda value: tuple(value.split('=', 1)) if '=' in value else value,
+                       help='Select instances by tag, repeatable (for list and bulk start/stop/reboot/status)')
+    parser.add_argument('-p', '--profile', action='append', default=[], metavar='PROFILE[,PROFILE...]',
+                       type=comma_list,
+                       help='AWS CLI profile to use; several profiles (repeated or comma separated) '
+                            'work across all of their accounts at once')
+    parser.add_argument('--all-profiles', action='store_true',
+                       help='Work across every profile in the AWS CLI configuration')
     parser.add_argument('-n', '--dry-run', action='store_true',
                        help='Perform a dry run without making changes')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='Enable verbose output')
     parser.add_argument('--state',
-                       help='Filter instances by state (for list command)')
+                       help='Filter instances by state (for list and watch commands)')
+    parser.add_argument('--instance-type', type=comma_list, metavar='TYPE[,TYPE...]',
+                       help='Filter instances by instance type, e.g. "t3.*" (for list and watch commands)')
+    parser.add_argument('--vpc', type=comma_list, metavar='VPC_ID[,VPC_ID...]',
+                       help='Filter instances by VPC (for list and watch commands)')
+    parser.add_argument('--subnet', type=comma_list, metavar='SUBNET_ID[,SUBNET_ID...]',
+                       help='Filter instances by subnet (for list and watch commands)')
+    parser.add_argument('--az', type=comma_list, metavar='ZONE[,ZONE...]',
+                       help='Filter instances by availability zone (for list and watch commands)')
+    parser.add_argument('--fields', type=field_list, metavar='FIELD[,FIELD...]',
+                       help=f'Columns to show, only these are extracted (for list, watch and status): '
+                            f'{", ".join(LIST_FIELDS)}')
+    parser.add_argument('--health', action='store_true',
+                       help='Add status checks and scheduled events to the listing (for list command)')
+    parser.add_argument('--impaired', action='store_true',
+                       help='Only list instances with an impaired status check (for list/health commands)')
+    parser.add_argument('-o', '--output', choices=OUTPUT_FORMATS, default='table',
+                       help='Output format for list, health, status and types (default: table); jsonl and csv '
+                            'stream records as regions respond, unsorted; messages go to stderr')
+    parser.add_argument('-j', '--concurrency', type=int, default=CONCURRENCY, metavar='N',
+                       help=f'Maximum concurrent AWS API tasks (default: {CONCURRENCY})')
+    parser.add_argument('--region-concurrency', type=int, default=REGION_CONCURRENCY, metavar='N',
+                       help=f'Maximum concurrent AWS API tasks per region (default: {REGION_CONCURRENCY})')
+    parser.add_argument('--max-pool-connections', type=int, default=MAX_POOL_CONNECTIONS, metavar='N',
+                       help=f'HTTP connections kept open per region (default: {MAX_POOL_CONNECTIONS})')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, metavar='N',
+                       help=f'Instances per DescribeInstances page, 5-1000 (default: {PAGE_SIZE})')
+    parser.add_argument('--no-sort', action='store_true',
+                       help='Print instances as regions respond instead of sorting (for list command)')
     parser.add_argument('--type',
                        help='New instance type (for resize command, e.g., t3.medium, c5.xlarge)')
+    parser.add_argument('--fallback-types', type=comma_list, default=[], metavar='TYPE[,TYPE...]',
+                       help='Types to try in order when --type has no capacity (for multi-instance resize)')
+    parser.add_argument('--min-vcpu', type=int, default=0, metavar='N',
+                       help='Only show instance types with at least N vCPUs (for types command)')
+    parser.add_argument('--min-mem', type=float, default=0, metavar='GIB',
+                       help='Only show instance types with at least this much memory in GiB (for types command)')
+    parser.add_argument('--arch', choices=['x86_64', 'arm64', 'i386', 'x86_64_mac', 'arm64_mac'],
+                       help='Only show instance types supporting this architecture (for types command)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted multi-instance resize from its state file')
+    parser.add_argument('--state-file', default=RESIZE_STATE_PATH, metavar='FILE',
+                       help=f'Progress file of a multi-instance resize (default: {RESIZE_STATE_PATH})')
+    parser.add_argument('--regions', type=comma_list,
+                       metavar='REGION[,REGION...]',
+                       help='Only use these regions (overrides region discovery and the config file)')
+    parser.add_argument('--all-regions', action='store_true',
+                       help='Also list regions that have had no instances recently')
+    parser.add_argument('-w', '--wait', action='store_true',
+                       help='Wait until instances reach the target state (start/stop/reboot/resize)')
+    parser.add_argument('--wait-timeout', type=int, default=WAIT_TIMEOUT, metavar='SECONDS',
+                       help=f'Give up waiting after this long (default: {WAIT_TIMEOUT})')
+    parser.add_argument('--cached', action='store_true',
+                       help='Answer list/status from the inventory saved by the last full listing '
+                            f'if it is fresh (under {INVENTORY_CACHE_TTL}s old), without calling AWS')
+    parser.add_argument('--no-daemon', action='store_true',
+                       help='Query AWS directly even if a daemon is running')
+    parser.add_argument('--refresh-interval', type=int, metavar='SECONDS',
+                       help=f'How often the daemon / watch lists every region '
+                            f'(default: {DAEMON_REFRESH_INTERVAL} / {WATCH_REFRESH_INTERVAL})')
+    parser.add_argument('--interval', type=int, default=WATCH_INTERVAL, metavar='SECONDS',
+                       help=f'How often watch polls instances in transitional states (default: {WATCH_INTERVAL})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ignore the instance location cache and search all regions')
+    parser.add_argument('--cache-ttl', type=int, default=LOCATION_CACHE_TTL, metavar='SECONDS',
+                       help=f'Maximum age of cached instance locations (default: {LOCATION_CACHE_TTL})')
+    match_group = parser.add_mutually_exclusive_group()
+    match_group.add_argument('--first', dest='all_matches', action='store_false',
+                             help='Stop searching at the first matching instance (default)')
+    match_group.add_argument('--all-matches', dest='all_matches', action='store_true',
+                             help='Search every region and act on every matching instance')
+    parser.set_defaults(all_matches=False)
+    parser.add_argument('--timeout', type=int, default=API_TIMEOUT, metavar='SECONDS',
+                       help=f'Connect/read timeout for each AWS API call (default: {API_TIMEOUT})')
+    parser.add_argument('--lookup-deadline', type=int, default=LOOKUP_DEADLINE, metavar='SECONDS',
+                       help=f'Give up searching regions for an instance after this long (default: {LOOKUP_DEADLINE})')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, metavar='N',
+                       help=f'Attempts per AWS API call with adaptive backoff (default: {MAX_ATTEMPTS})')
+    parser.add_argument('--rate-limit', type=float, default=RATE_LIMIT, metavar='PER_SECOND',
+                       help=f'Maximum AWS API requests per second per account and region, 0 for no limit '
+                            f'(default: {RATE_LIMIT})')
+    parser.add_argument('--timings', action='store_true',
+                       help='Print API call counts, retries, bytes and latency percentiles per region and '
+                            'operation to stderr at exit')
+    parser.add_argument('--trace', metavar='FILE',
+                       help='Write the per region/operation API statistics and every call as JSON to FILE at exit')
+    parser.add_argument('--at', type=time_window, metavar='WHEN',
+                       help='Show the recorded inventory at this time, or during this day/month (for history '
+                            'command): e.g. "2026-10-13 14:00", 2026-10-13, 2026-10, tuesday, yesterday, 3d')
+    parser.add_argument('--since', type=time_window, metavar='WHEN',
+                       help='Show the changes recorded since this time (for history command)')
+    parser.add_argument('--until', type=time_window, metavar='WHEN',
+                       help='Show the changes recorded until this time (for history command)')
+    parser.add_argument('--changed', type=history_field_list, metavar='FIELD[,FIELD...]',
+                       help='Only show changes of these fields, e.g. type or state (for history command)')
+    parser.add_argument('--retention', type=float, default=HISTORY_RETENTION_DAYS, metavar='DAYS',
+                       help=f'Full history kept by --compact (default: {HISTORY_RETENTION_DAYS})')
+    parser.add_argument('--compact', action='store_true',
+                       help='Drop history older than --retention days and shrink the store (for history command)')
+    parser.add_argument('--hosts', type=comma_list, metavar='PATTERN[,PATTERN...]',
+                       help='Run exec/deploy on the SSH host aliases matching these globs instead of on instances')
+    parser.add_argument('-c', '--cmd', metavar='COMMAND',
+                       help='Remote shell command to run (for exec and deploy commands)')
+    parser.add_argument('--upload', type=upload_spec, action='append', default=[], metavar='LOCAL[:REMOTE]',
+                       help='Copy a file to each host before the command, repeatable (for exec and deploy commands)')
+    parser.add_argument('--parallel', type=int, default=SSH_PARALLEL, metavar='N',
+                       help=f'Hosts worked on at once by exec/deploy (default: {SSH_PARALLEL})')
+    parser.add_argument('--batch-size', type=int, metavar='N',
+                       help='Roll out in batches of N hosts, stopping after a batch with a failure '
+                            '(default: all hosts for exec, --parallel for deploy)')
+    parser.add_argument('--health-cmd', metavar='COMMAND',
+                       help='Remote command that must succeed before a host counts as done (for deploy command)')
+    parser.add_argument('--health-timeout', type=int, default=HEALTH_TIMEOUT, metavar='SECONDS',
+                       help=f'How long to retry the health command (default: {HEALTH_TIMEOUT})')
+    parser.add_argument('--address', choices=['private-ip', 'public-ip', 'private-dns'], default='private-ip',
+                       help='Instance address exec/deploy connect to (default: private-ip)')
+    parser.add_argument('--ssh-user', metavar='USER',
+                       help='Remote user for exec/deploy (default: from the SSH configuration)')
+    parser.add_argument('--ssh-option', action='append', default=[], metavar='OPTION=VALUE',
+                       help='Extra ssh -o option for exec/deploy, repeatable (e.g. Port=2222)')
+    parser.add_argument('--ssh-config', metavar='FILE',
+                       help=f'SSH client configuration for exec/deploy (default: {SSH_CONFIG_PATH})')
+    parser.add_argument('--retry-budget', type=int, default=RETRY_BUDGET, metavar='N',
+                       help=f'Retries allowed per account and region per minute; throttled regions beyond it '
+                            f'are reported as incomplete (default: {RETRY_BUDGET})')
     
-    args = parser.parse_args()
+    args = parser.parse_intermixed_args()
+    started = time.time()
     
     # Validate arguments
-    if args.command != 'list' and not args.instance:
+    for tag in args.tag:
+        if not isinstance(tag, tuple):
+            parser.error(f"--tag expects KEY=VALUE, got '{tag}'")
+    
+    if args.command not in ('list', 'health', 'watch', 'types', 'history', 'daemon') \
+            and not args.instances and not args.tag and not (args.command == 'resize' and args.resume) \
+            and not (args.command in FLEET_COMMANDS and args.hosts):
         parser.error(f"'{args.command}' command requires an instance identifier")
     
-    if args.command == 'resize' and not args.type:
+    bulk = args.command not in ('list', 'health', 'watch', 'types', 'history', 'daemon') + FLEET_COMMANDS and (
+        len(args.instances) > 1 or bool(args.tag)
+        or any(c in identifier for identifier in args.instances for c in '*?['))
+    if bulk and args.command not in BULK_COMMANDS:
+        parser.error(f"'{args.command}' command accepts a single instance identifier")
+    
+    if args.command == 'resize' and not args.type and not args.resume:
         parser.error("'resize' command requires --type argument specifying the new instance type")
     
+    if args.command in FLEET_COMMANDS:
+        if args.hosts and (args.instances or args.tag):
+            parser.error("--hosts cannot be combined with instance identifiers or --tag")
+        if args.command == 'exec' and not args.cmd:
+            parser.error("'exec' command requires --cmd")
+        if args.command == 'deploy' and not (args.upload or args.cmd):
+            parser.error("'deploy' command requires --upload and/or --cmd")
+    
+    if args.command == 'history':
+        if args.tag:
+            parser.error("--tag does not apply to the history command")
+        if args.at and (args.since or args.until or args.changed):
+            parser.error("--at lists the inventory at one time; --since/--until/--changed list changes")
+    
+    if args.cached and args.command not in ('list', 'status'):
+        parser.error("--cached only applies to the list and status commands")
+    
+    if args.output != 'table':
+        if args.command not in ('list', 'health', 'status', 'types', 'history'):
+            parser.error("--output only applies to the list, health, status, types and history commands")
+        # Machine-readable status always goes through the record listing path
+        bulk = args.command == 'status'
+    
+    if args.command in ('list', 'status'):
+        if args.command == 'list' and not args.no_daemon and run_daemon_command(args):
+            sys.exit(0)
+        if args.cached and run_cached_command(args):
+            sys.exit(0)
+    
+    if args.command == 'history':
+        # Answered from the local history store only
+        sys.exit(0 if run_history_command(args) else 1)
+    
+    if args.command in FLEET_COMMANDS and args.hosts:
+        # SSH aliases need no AWS access at all
+        sys.exit(0 if run_fleet_command(args) else 1)
+    
+    profiles = list(dict.fromkeys(name for names in args.profile for name in names))
+    
+    if args.all_profiles:
+        load_boto3()
+        profiles = boto3.Session().available_profiles
+        if not profiles:
+            parser.error("--all-profiles: no profiles found in the AWS CLI configuration")
+    
     # Create controller
-    controller = EC2Controller(profile=args.profile, verbose=args.verbose)
+    controller = EC2Controller(profile=profiles[0] if profiles else None, verbose=args.verbose,
+                               use_cache=not args.no_cache, cache_ttl=args.cache_ttl,
+                               api_timeout=args.timeout, lookup_deadline=args.lookup_deadline,
+                               max_pool_connections=args.max_pool_connections,
+                               regions=args.regions, skip_cold_regions=not args.all_regions,
+                               concurrency=args.concurrency, region_concurrency=args.region_concurrency,
+                               profiles=profiles if len(profiles) > 1 else None,
+                               message_file=sys.stdout if args.output == 'table' else sys.stderr,
+                               max_attempts=args.max_attempts, rate_limit=args.rate_limit,
+                               retry_budget=args.retry_budget, trace_calls=bool(args.trace))
+    
+    if args.timings or args.trace:
+        # Report at exit, however the command ends (sys.exit, Ctrl-C, daemon shutdown)
+        import atexit
+        atexit.register(report_metrics, controller, args, started)
+    
+    if not args.no_daemon and args.command != 'daemon':
+        controller.daemon_socket = daemon_socket_path(args)
+    
+    # With several accounts every table gets an Account column
+    with_account = controller.multi_account
+    account_headers = ['Account'] if with_account else []
     
     if args.dry_run:
         controller._warning("DRY RUN MODE - No changes will be made")
     
     # Execute command
-    if args.command == 'list':
-        instances = controller.list_instances(state_filter=args.state)
-        if instances:
-            # Sort by region and instance ID
-            instances.sort(key=lambda x: (x['region'], x['instance_id']))
-            
-            # Display as table
-            headers = ['Region', 'Instance ID', 'State', 'Name', 'Type', 'Private IP', 'Public IP']
-            rows = [
-                [i['region'], i['instance_id'], i['state'], i['name'], 
-                 i['instance_type'], i['private_ip'], i['public_ip']]
-                for i in instances
-            ]
-            print(format_table(rows, headers))
-            controller._success(f"Found {len(instances)} instance(s)")
+    if args.command == 'daemon':
+        InventoryDaemon(controller, daemon_socket_path(args),
+                        refresh_interval=args.refresh_interval or DAEMON_REFRESH_INTERVAL).serve()
+    
+    elif args.command == 'watch':
+        filters = instance_filters(names=args.instances, tags=args.tag, instance_types=args.instance_type,
+                                   vpc_ids=args.vpc, subnet_ids=args.subnet, zones=args.az)
+        InventoryWatch(controller, list_fields(args.fields, with_account), filters=filters, state_filter=args.state,
+                       interval=args.interval,
+                       refresh_interval=args.refresh_interval or WATCH_REFRESH_INTERVAL).run()
+    
+    elif args.command in ('list', 'health'):
+        health = args.command == 'health' or args.health or args.impaired
+        fields = list_fields(args.fields or (HEALTH_LIST_FIELDS if health else None), with_account)
+        filters = instance_filters(names=args.instances, tags=args.tag, instance_types=args.instance_type,
+                                   vpc_ids=args.vpc, subnet_ids=args.subnet, zones=args.az)
+        instances = controller.iter_instances(state_filter=args.state, page_size=args.page_size,
+                                              filters=filters,
+                                              fields=tuple(LIST_FIELDS[f][0] for f in fields) if args.fields else None,
+                                              health=health, impaired=args.impaired)
+        
+        if args.no_sort or args.output in ('jsonl', 'csv'):
+            # Write records as regions respond
+            with closing(instances):
+                count = write_records(instances, fields, args.output, fixed_widths=True)
+        else:
+            # Sort by account, region and instance ID
+            instances = sorted(instances, key=lambda x: (x.account, x.region, x.instance_id))
+            count = write_records(instances, fields, args.output)
+        
+        if count:
+            controller._success(f"Found {count} instance(s)")
+        elif controller.partial_regions:
+            controller._warning("No instances found in the regions that answered")
         else:
             controller._warning("No instances found")
     
+    elif args.command == 'types':
+        account = controller.accounts[0]
+        regions = args.regions or [account.session.region_name or 'us-east-1']
+        types = controller.find_instance_types(regions, patterns=args.instances, min_vcpus=args.min_vcpu,
+                                               min_memory_gib=args.min_mem, architecture=args.arch)
+        keys = ['type', 'vcpus', 'memory_gib', 'network', 'architectures']
+        headers = ['Type', 'vCPUs', 'Memory (GiB)', 'Network', 'Architectures']
+        if len(regions) > 1:
+            keys.append('regions')
+            headers.append('Regions')
+        rows = ([t['type'], t['vcpus'], round(t['memory_mib'] / 1024, 3), t['network'],
+                 ','.join(t['architectures']), ','.join(t['regions'])][:len(keys)] for t in types)
+        if write_rows(rows, keys, headers, args.output):
+            controller._success(f"Found {len(types)} instance type(s) in {', '.join(regions)}")
+        else:
+            controller._warning("No matching instance types found")
+    
+    elif args.command in FLEET_COMMANDS:
+        sys.exit(0 if run_fleet_command(args, controller) else 1)
+    
+    elif args.command == 'resize' and (bulk or args.resume):
+        pipeline = ResizePipeline(controller, args.state_file, wait_timeout=args.wait_timeout)
+        rejected = []
+        if args.resume:
+            if not pipeline.load():
+                controller._error(f"Nothing to resume in {args.state_file}")
+                sys.exit(1)
+        else:
+            instances = controller.resolve_instances(args.instances, tags=args.tag)
+            if not instances:
+                controller._error("No matching instances found in any AWS region")
+                sys.exit(1)
+            controller._success(f"Matched {len(instances)} instance(s)")
+            rejected = pipeline.plan(instances, args.type, args.fallback_types)
+        
+        if args.dry_run:
+            print(format_table([([account] if with_account else []) +
+                                [entry['region'], instance_id, entry['name'], entry['original_type'],
+                                 ' -> '.join(entry['candidates'])]
+                                for instance_id, entry in sorted(pipeline.state.items())],
+                               account_headers + ['Region', 'Instance ID', 'Name', 'Type', 'New Type (fallbacks)']))
+            controller._warning("DRY RUN COMPLETE - No actual changes were made")
+            sys.exit(0)
+        
+        controller._info(f"Progress is saved to {args.state_file}; "
+                         f"if interrupted, continue with: resize --resume")
+        results = sorted(pipeline.run() + rejected, key=lambda x: (x.account, x.region, x.instance_id))
+        print(format_table([([r.account] if with_account else []) + list(r[:5]) for r in results],
+                           account_headers + ['Region', 'Instance ID', 'Name', 'Result', 'Detail']))
+        
+        counts = {outcome: sum(1 for r in results if r.result == outcome) for outcome in ('ok', 'skipped', 'failed')}
+        summary = f"{counts['ok']} resized, {counts['skipped']} skipped, {counts['failed']} failed"
+        if counts['failed']:
+            controller._warning(summary)
+        else:
+            controller._success(summary)
+        sys.exit(1 if counts['failed'] else 0)
+    
+    elif bulk:
+        instances = controller.resolve_instances(args.instances, tags=args.tag, health=args.command == 'status')
+        if not instances:
+            controller._error("No matching instances found in any AWS region")
+            sys.exit(1)
+        controller._success(f"Matched {len(instances)} instance(s)")
+        
+        if args.command == 'status':
+            write_records(instances, list_fields(args.fields or STATUS_LIST_FIELDS, with_account), args.output)
+            sys.exit(0)
+        
+        action = 'stop' if args.command == 'force-stop' else args.command
+        results = controller.bulk_action(action, instances, force=args.command == 'force-stop',
+                                         dry_run=args.dry_run)
+        print(format_table([([r.account] if with_account else []) + list(r[:5]) for r in results],
+                           account_headers + ['Region', 'Instance ID', 'Name', 'Result', 'Detail']))
+        
+        if args.wait and not args.dry_run:
+            outcomes = wait_for_command(controller, args, [r for r in results if r.result == 'ok'])
+            results = [
+                r._replace(result='failed', detail=outcomes[r.instance_id])
+                if outcomes.get(r.instance_id, 'ok') != 'ok' else r
+                for r in results
+            ]
+        
+        counts = {outcome: sum(1 for r in results if r.result == outcome) for outcome in ('ok', 'skipped', 'failed')}
+        summary = f"{counts['ok']} succeeded, {counts['skipped']} skipped, {counts['failed']} failed"
+        if counts['ok'] == len(results):
+            controller._success(summary)
+        else:
+            controller._warning(summary)
+        
+        if args.dry_run:
+            controller._warning("DRY RUN COMPLETE - No actual changes were made")
+        
+        sys.exit(0 if counts['ok'] == len(results) else 1)
+    
     else:
-        # Find the instance
-        instance_info = controller.find_instance(args.instance)
-        if not instance_info:
-            controller._error(f"Instance '{args.instance}' not found in any AWS region")
+        # Find the instance(s)
+        matches = controller.find_instances(args.instances[0], all_matches=args.all_matches)
+        if not matches:
+            where = 'in the regions that answered' if controller.partial_regions else 'in any AWS region'
+            controller._error(f"Instance '{args.instances[0]}' not found {where}")
+            sys.exit(1)
+        
+        if len(matches) > 1 and not args.all_matches:
+            # Never act on several instances unless asked to
+            controller._error(f"'{args.instances[0]}' is ambiguous, it matches "
+                              f"{', '.join(sorted(m['instance_id'] for m in matches))}; "
+                              f"use an instance ID, or --all-matches to act on all of them")
             sys.exit(1)
         
-        # Display instance information
-        controller._success("Instance found:")
-        print(f"  Region: {instance_info['region']}")
-        print(f"  Instance ID: {instance_info['instance_id']}")
-        print(f"  Name: {instance_info.get('name', 'N/A')}")
-        print(f"  Current State: {instance_info['state']}")
-        print(f"  Instance Type: {instance_info.get('instance_type', 'N/A')}")
-        print(f"  Private IP: {instance_info.get('private_ip', 'N/A')}")
-        print(f"  Public IP: {instance_info.get('public_ip', 'N/A')}")
-        print()
-        
-        # Execute the command
-        success = False
-        if args.command == 'start':
-            success = controller.start_instance(instance_info, dry_run=args.dry_run)
-        elif args.command == 'stop':
-            success = controller.stop_instance(instance_info, dry_run=args.dry_run)
-        elif args.command == 'force-stop':
-            success = controller.stop_instance(instance_info, force=True, dry_run=args.dry_run)
-        elif args.command == 'reboot':
-            success = controller.reboot_instance(instance_info, dry_run=args.dry_run)
-        elif args.command == 'status':
-            detailed_info = controller.get_instance_status(instance_info)
-            print(f"  Platform: {detailed_info.get('platform', 'N/A')}")
-            print(f"  Architecture: {detailed_info.get('architecture', 'N/A')}")
-            print(f"  Launch Time: {detailed_info.get('launch_time', 'N/A')}")
-            print(f"  Instance Status: {detailed_info.get('instance_status', 'N/A')}")
-            print(f"  System Status: {detailed_info.get('system_status', 'N/A')}")
-            success = True
-        elif args.command == 'resize':
-            success = controller.change_instance_type(instance_info, args.type, dry_run=args.dry_run)
+        if len(matches) > 1:
+            controller._warning(f"{len(matches)} instances match '{args.instances[0]}'")
+        
+        success = True
+        acted_on = []
+        for instance_info in matches:
+            if run_instance_command(controller, args, instance_info):
+                acted_on.append(InstanceRecord(instance_info['region'], instance_info['instance_id'],
+                                               instance_info['state'], instance_info.get('name') or 'N/A',
+                                               account=instance_info.get('account', 'default')))
+            else:
+                success = False
+        
+        if args.wait and not args.dry_run and acted_on:
+            outcomes = wait_for_command(controller, args, acted_on)
+            success = success and all(outcome == 'ok' for outcome in outcomes.values())
         
         if args.dry_run:
             controller._warning("DRY RUN COMPLETE - No actual changes were made")
@@ -576,6 +4886,11 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print("\nOperation cancelled by user")
         sys.exit(1)
+    except BrokenPipeError:
+        # Output was piped into a command that exited early (head, jq ...);
+        # point stdout at /dev/null so the final flush does not fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
     except Exception as e:
         print(f"{Fore.RED}Unexpected error: {e}{Style.RESET_ALL}")
         sys.exit(1)
\ No newline at end of file
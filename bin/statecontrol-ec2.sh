@@ -1,7 +1,9 @@
 #!/usr/bin/env bash
 
 # EC2 Instance State Control Script - Wrapper for Python implementation
-# This script checks for Python and boto3 dependency
+# This script checks for Python 3; the Python script checks its version and
+# the boto3 dependency itself (boto3 only when a command needs AWS), with the
+# same error messages this wrapper used to print
 
 set -euo pipefail
 
@@ -25,28 +27,7 @@ print_color() {
 # Check if Python 3 is installed
 if ! command -v python3 &> /dev/null; then
     print_color "$RED" "Error: Python 3 is not installed or not in PATH"
-    print_color "$YELLOW" "Please install Python 3.6 or later"
-    exit 1
-fi
-
-# Check Python version
-PYTHON_VERSION=$(python3 -c 'import sys; print(".".join(map(str, sys.version_info[:2])))')
-REQUIRED_VERSION="3.6"
-
-if [ "$(printf '%s\n' "$REQUIRED_VERSION" "$PYTHON_VERSION" | sort -V | head -n1)" != "$REQUIRED_VERSION" ]; then
-    print_color "$RED" "Error: Python $PYTHON_VERSION is too old"
-    print_color "$YELLOW" "Please install Python $REQUIRED_VERSION or later"
-    exit 1
-fi
-
-# Check if boto3 is installed (required)
-if ! python3 -c "import boto3" 2>/dev/null; then
-    print_color "$RED" "Error: boto3 Python package is not installed"
-    print_color "$YELLOW" "Please install boto3 using one of these methods:"
-    print_color "$YELLOW" "  1. System package manager: pacman -S python-boto3"
-    print_color "$YELLOW" "  2. Using pipx: pipx install boto3"
-    print_color "$YELLOW" "  3. In a virtual environment: python3 -m venv venv && venv/bin/pip install boto3"
-    print_color "$YELLOW" "  4. User install (may require --break-system-packages): pip3 install --user boto3"
+    print_color "$YELLOW" "Please install Python 3.7 or later"
     exit 1
 fi
 